@@ -168,6 +168,9 @@ DATABASES = {
         ssl_require=True
     )
 }
+# The Supabase pooler runs in transaction mode, so a server-side cursor's later
+# FETCHes can land on another backend; let .iterator() fetch client-side instead
+DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -226,6 +229,26 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/images/'
 MEDIA_ROOT = BASE_DIR / 'images'
 
+# Rendered invoice PDFs, stored per bill and content hash (see milk_agency/invoice_pdfs.py).
+# Kept outside MEDIA_ROOT, which is publicly served.
+INVOICE_PDF_CACHE_DIR = Path(os.environ.get("INVOICE_PDF_CACHE_DIR", BASE_DIR / 'invoice_cache'))
+INVOICE_PDF_CACHE_MAX_AGE_DAYS = int(os.environ.get("INVOICE_PDF_CACHE_MAX_AGE_DAYS", "60"))
+# Internal nginx location aliased to INVOICE_PDF_CACHE_DIR; empty serves files from Django
+INVOICE_PDF_X_ACCEL_PREFIX = os.environ.get("INVOICE_PDF_X_ACCEL_PREFIX", "").strip()
+# Statements and other PDFs rendered by run_pdf_worker (see milk_agency/pdf_jobs.py)
+PDF_JOB_OUTPUT_DIR = Path(os.environ.get("PDF_JOB_OUTPUT_DIR", BASE_DIR / 'pdf_jobs'))
+# Month-end statement archives written by generate_monthly_statements
+MONTHLY_STATEMENT_ARCHIVE_DIR = Path(os.environ.get("MONTHLY_STATEMENT_ARCHIVE_DIR", BASE_DIR / 'statements'))
+
+# Customer portal home snapshots (see customer_portal/home_snapshot.py). File-based
+# by default so every worker process on the host sees the same invalidations.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get("CACHE_BACKEND", 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get("CACHE_LOCATION", str(BASE_DIR / 'django_cache')),
+    }
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -6,6 +6,7 @@ from django.conf.urls.static import static
 from django.contrib.staticfiles.urls import staticfiles_urlpatterns
 from django.shortcuts import render
 from django.http import FileResponse, Http404
+from milk_agency.media_index import resolve_image_urls
 from milk_agency.models import Item, Company
 from pathlib import Path
 from .firebase_views import firebase_messaging_sw
@@ -20,6 +21,7 @@ def index_view(request):
 
     # Active products only
     products = Item.objects.filter(frozen=False).select_related('company')
+    resolve_image_urls(products)
 
     # All companies
     companies = Company.objects.all()
@@ -2,22 +2,39 @@ from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from django.core.paginator import Paginator
 from django.db import transaction
-from django.db.models import Q, Sum
+from django.db.models import Count, Q, Sum
 from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from decimal import Decimal
 from datetime import datetime
 
-from api.user_bill_pdf_utils import UserPDFGenerator, DELIVERY_ITEM_CODE
-from milk_agency.order_pricing import DELIVERY_CHARGE_AMOUNT
+from api.pdf_jobs import pdf_job_accepted, wants_background_pdf
+from api.user_bill_pdf_utils import UserPDFGenerator
+from milk_agency.bill_builder import (
+    create_route_bills,
+    delivery_charge_line,
+    parse_bill_rows,
+    price_bill_lines,
+    refresh_cached_due,
+    save_bill_lines,
+)
+from milk_agency.order_pricing import DELIVERY_CHARGE_AMOUNT, get_or_create_delivery_charge_item
+from milk_agency.invoice_numbers import allocate_invoice_number
+from milk_agency.keyset_pagination import BILL_ORDERING, InvalidCursor, keyset_page, page_size
 from milk_agency.models import Bill, BillItem, Customer, Item
+from milk_agency.pdf_jobs import enqueue_invoice_pdf
+from milk_agency.stock_ledger import restore_bill_stock
 from customer_portal.models import CustomerOrder
 
 
+def _is_user(customer):
+    return bool(customer) and getattr(customer, "user_type", "").lower() == "user"
+
+
 def _unit_price(item, customer):
     """Use selling price for retailers and MRP for direct users."""
-    if customer and getattr(customer, "user_type", "").lower() == "user":
+    if _is_user(customer):
         return Decimal(item.mrp or item.selling_price)
     return Decimal(item.selling_price)
 
@@ -36,7 +53,7 @@ def _is_delivery_mode(request_data):
 # ------------------------------------------
 @api_view(['GET'])
 def api_get_customers(request):
-    customers = Customer.objects.filter(frozen=False).order_by("name")
+    customers = Customer.objects.filter(frozen=False).with_actual_due().order_by("name")
 
     return Response([
         {
@@ -44,7 +61,7 @@ def api_get_customers(request):
             "name": c.name,
             "phone": c.phone,
             "area": c.area or "",
-            "due": str(c.get_actual_due() or 0)
+            "due": str(c.actual_due or 0)
         }
         for c in customers
     ])
@@ -60,9 +77,11 @@ def api_list_bills(request):
     start_date = request.GET.get("start_date")
     end_date = request.GET.get("end_date")
     q = (request.GET.get("q") or "").strip()
-    page = request.GET.get("page", 1)
+    page = request.GET.get("page")
+    cursor = request.GET.get("cursor")
+    per_page = page_size(request.GET.get("limit"), 25)
 
-    bills = Bill.objects.filter(is_deleted=False).select_related("customer").order_by('-invoice_date', '-id')
+    bills = Bill.objects.filter(is_deleted=False).select_related("customer").order_by(*BILL_ORDERING)
 
     if customer_id:
         bills = bills.filter(customer_id=customer_id)
@@ -80,12 +99,32 @@ def api_list_bills(request):
             | Q(customer__phone__icontains=q)
         )
 
-    total_amount = bills.aggregate(
-        total=Coalesce(Sum("total_amount"), Decimal("0.00"))
-    )["total"]
-
-    paginator = Paginator(bills, 25)
-    page_obj = paginator.get_page(page)
+    totals = bills.aggregate(
+        total=Coalesce(Sum("total_amount"), Decimal("0.00")),
+        count=Count("id"),
+    )
+    total_amount = totals["total"]
+
+    if page and not cursor:
+        # Page numbers are kept for app builds that predate cursors
+        paginator = Paginator(bills, per_page)
+        paginator.count = totals["count"]
+        page_obj = paginator.get_page(page)
+        current_page = page_obj.number
+        cursors = {"next_cursor": None, "previous_cursor": None, "has_next": page_obj.has_next()}
+    else:
+        try:
+            page_obj = keyset_page(bills, cursor, ordering=BILL_ORDERING, per_page=per_page)
+        except InvalidCursor:
+            return Response({"error": "Invalid cursor"}, status=400)
+        current_page = None if cursor else 1
+        cursors = page_obj.cursor_data()
+
+    current_dues = dict(
+        Customer.objects.filter(pk__in={b.customer_id for b in page_obj if b.customer_id})
+        .with_actual_due()
+        .values_list("pk", "actual_due")
+    )
 
     data = []
     for b in page_obj:
@@ -97,7 +136,7 @@ def api_list_bills(request):
             "customer_id": b.customer_id,
             "total_amount": str(b.total_amount),
             "op_due": str(b.op_due_amount),
-            "current_due": str(b.customer.get_actual_due()) if b.customer else "0",
+            "current_due": str(current_dues.get(b.customer_id, 0)) if b.customer else "0",
             "last_paid": str(b.last_paid),
             "profit": str(b.profit),
         })
@@ -105,12 +144,13 @@ def api_list_bills(request):
     return Response({
         "summary": {
             "total_amount": float(total_amount),
-            "bill_count": paginator.count,
+            "bill_count": totals["count"],
         },
         "results": data,
-        "current_page": page_obj.number,
-        "total_pages": paginator.num_pages,
-        "total_records": paginator.count
+        **cursors,
+        "current_page": current_page,
+        "total_pages": max(-(-totals["count"] // per_page), 1),
+        "total_records": totals["count"]
     })
 
 
@@ -185,78 +225,33 @@ def api_create_bill(request):
     except ValueError:
         return Response({"success": False, "message": "Invalid invoice_date"}, status=400)
 
+    try:
+        lines = price_bill_lines(
+            parse_bill_rows(item_ids, quantities, discounts), customer=customer, unit_price=_unit_price
+        )
+    except (ValueError, Item.DoesNotExist) as e:
+        return Response({"success": False, "message": str(e)}, status=400)
+
     with transaction.atomic():
 
+        if is_delivery and _is_user(customer):
+            lines.append(delivery_charge_line(get_or_create_delivery_charge_item(), DELIVERY_CHARGE_AMOUNT))
+
         bill = Bill.objects.create(
             customer=customer,
-            invoice_number=f"INV-{timezone.now().strftime('%Y%m%d%H%M%S')}",
+            invoice_number=allocate_invoice_number(),
             invoice_date=bill_date,
             total_amount=Decimal(0),
-            op_due_amount=customer.get_actual_due() if customer else 0,
+            op_due_amount=customer.due if customer else Decimal(0),
             last_paid=Decimal(0),
             profit=Decimal(0)
         )
 
-        total = Decimal(0)
-        total_profit = Decimal(0)
-
-        for i, item_id in enumerate(item_ids):
-            item = Item.objects.get(id=item_id)
-
-            qty = int(quantities[i]) if i < len(quantities) and quantities[i] else 0
-            discount = Decimal(discounts[i]) if (discounts and i < len(discounts) and discounts[i]) else Decimal(0)
-            if qty <= 0:
-                continue
-
-            unit_price = _unit_price(item, customer)
-
-            line_total = (unit_price * qty) - (discount * qty)
-            profit = ((unit_price - item.buying_price) * qty) - (discount * qty)
-
-            BillItem.objects.create(
-                bill=bill,
-                item=item,
-                price_per_unit=unit_price,
-                discount=discount,
-                quantity=qty,
-                total_amount=line_total
-            )
-
-            item.stock_quantity -= qty
-            item.save()
-
-            total += line_total
-            total_profit += profit
-
-        if is_delivery and customer and getattr(customer, "user_type", "").lower() == "user":
-            delivery_item, _ = Item.objects.get_or_create(
-                code=DELIVERY_ITEM_CODE,
-                defaults={
-                    "name": "Delivery Charge",
-                    "selling_price": DELIVERY_CHARGE_AMOUNT,
-                    "buying_price": Decimal(0),
-                    "mrp": DELIVERY_CHARGE_AMOUNT,
-                    "stock_quantity": 0,
-                },
-            )
-            BillItem.objects.create(
-                bill=bill,
-                item=delivery_item,
-                price_per_unit=DELIVERY_CHARGE_AMOUNT,
-                discount=Decimal(0),
-                quantity=1,
-                total_amount=DELIVERY_CHARGE_AMOUNT,
-            )
-            total += DELIVERY_CHARGE_AMOUNT
-            total_profit += DELIVERY_CHARGE_AMOUNT
-
-        bill.total_amount = total
-        bill.profit = total_profit
+        bill.total_amount, bill.profit = save_bill_lines(bill, lines)
         bill.save()
 
         if customer:
-            customer.due = customer.get_actual_due()
-            customer.save()
+            refresh_cached_due([customer.pk])
 
     return Response({"success": True, "bill_id": bill.id, "invoice_number": bill.invoice_number})
 
@@ -268,7 +263,6 @@ def api_create_bill(request):
 def api_edit_bill(request, bill_id):
 
     bill = get_object_or_404(Bill, id=bill_id)
-    old_total = bill.total_amount  # store before changes
 
     new_customer_id = request.data.get("customer")
     new_customer = Customer.objects.filter(id=new_customer_id).first() if new_customer_id else None
@@ -278,7 +272,14 @@ def api_edit_bill(request, bill_id):
     invoice_date = request.data.get("invoice_date")
     is_delivery = _is_delivery_mode(request.data)
 
-    bill_items = BillItem.objects.filter(bill=bill)
+    try:
+        lines = price_bill_lines(
+            parse_bill_rows(item_ids, quantities, discounts),
+            customer=new_customer or bill.customer,
+            unit_price=_unit_price,
+        )
+    except (ValueError, Item.DoesNotExist) as e:
+        return Response({"success": False, "message": str(e)}, status=400)
 
     with transaction.atomic():
 
@@ -286,85 +287,107 @@ def api_edit_bill(request, bill_id):
             bill.invoice_date = datetime.strptime(invoice_date, "%Y-%m-%d").date()
 
         # restore stock
-        for bi in bill_items:
-            bi.item.stock_quantity += bi.quantity
-            bi.item.save()
+        restore_bill_stock(bill)
+        BillItem.objects.filter(bill=bill).delete()
 
-        bill_items.delete()
+        if is_delivery and _is_user(new_customer):
+            lines.append(delivery_charge_line(get_or_create_delivery_charge_item(), DELIVERY_CHARGE_AMOUNT))
 
-        total = Decimal(0)
-        total_profit = Decimal(0)
-
-        for i, item_id in enumerate(item_ids):
-            item = Item.objects.get(id=item_id)
-            qty = int(quantities[i]) if i < len(quantities) and quantities[i] else 0
-            discount = Decimal(discounts[i]) if (discounts and i < len(discounts) and discounts[i]) else Decimal(0)
-
-            if qty <= 0:
-                continue
-
-            unit_price = _unit_price(item, new_customer or bill.customer)
-
-            line_total = (unit_price * qty) - (discount * qty)
-            profit = ((unit_price - item.buying_price) * qty) - (discount * qty)
-
-            BillItem.objects.create(
-                bill=bill,
-                item=item,
-                price_per_unit=unit_price,
-                discount=discount,
-                quantity=qty,
-                total_amount=line_total
-            )
-
-            item.stock_quantity -= qty
-            item.save()
-
-            total += line_total
-            total_profit += profit
-
-        if is_delivery and new_customer and getattr(new_customer, "user_type", "").lower() == "user":
-            delivery_item, _ = Item.objects.get_or_create(
-                code=DELIVERY_ITEM_CODE,
-                defaults={
-                    "name": "Delivery Charge",
-                    "selling_price": DELIVERY_CHARGE_AMOUNT,
-                    "buying_price": Decimal(0),
-                    "mrp": DELIVERY_CHARGE_AMOUNT,
-                    "stock_quantity": 0,
-                },
-            )
-            BillItem.objects.create(
-                bill=bill,
-                item=delivery_item,
-                price_per_unit=DELIVERY_CHARGE_AMOUNT,
-                discount=Decimal(0),
-                quantity=1,
-                total_amount=DELIVERY_CHARGE_AMOUNT,
-            )
-            total += DELIVERY_CHARGE_AMOUNT
-            total_profit += DELIVERY_CHARGE_AMOUNT
+        total, total_profit = save_bill_lines(bill, lines)
 
         old_customer = bill.customer
 
+        # The cached due already includes this bill, so keep its opening due when the customer is unchanged
+        if not new_customer:
+            bill.op_due_amount = Decimal(0)
+        elif not old_customer or old_customer.pk != new_customer.pk:
+            bill.op_due_amount = new_customer.due
         bill.customer = new_customer
-        bill.op_due_amount = new_customer.get_actual_due() if new_customer else Decimal(0)
         bill.total_amount = total
         bill.profit = total_profit
         bill.save()
 
-        # refresh due cache safely
-        if old_customer:
-            old_customer.due = old_customer.get_actual_due()
-            old_customer.save()
-
-        if new_customer and new_customer != old_customer:
-            new_customer.due = new_customer.get_actual_due()
-            new_customer.save()
+        # refresh due cache for both customers in one statement
+        refresh_cached_due([old_customer.pk if old_customer else None, new_customer.pk if new_customer else None])
 
     return Response({"success": True, "bill_id": bill.id, "invoice_number": bill.invoice_number})
 
 
+# ------------------------------------------
+# 6️⃣b ROUTE / AREA BATCH BILLING
+# ------------------------------------------
+@api_view(['GET', 'POST'])
+def api_route_bills(request):
+    """
+    GET  ?area=...  -> the area's billable customers and items for the billing sheet.
+    POST {"invoice_date", "bills": [{"customer", "items", "quantities", "discounts"}]}
+         -> creates every bill in one transaction and returns a result per bill.
+    """
+    if request.method == 'GET':
+        area = (request.GET.get("area") or "").strip()
+        customers = Customer.objects.filter(frozen=False, is_superuser=False, is_staff=False)
+        if area:
+            customers = customers.filter(area=area)
+
+        return Response({
+            "area": area,
+            "areas": list(
+                Customer.objects.exclude(area__exact="").exclude(area__isnull=True)
+                .values_list("area", flat=True).distinct().order_by("area")
+            ),
+            "customers": [
+                {"id": c.id, "name": c.name, "shop_name": c.shop_name or "", "due": str(c.due)}
+                for c in customers.order_by("name")
+            ],
+            "items": [
+                {
+                    "id": item.id,
+                    "code": item.code,
+                    "name": item.name,
+                    "category": item.category,
+                    "selling_price": str(item.selling_price),
+                    "mrp": str(item.mrp),
+                    "stock_quantity": item.stock_quantity,
+                }
+                for item in Item.objects.filter(frozen=False).order_by("category", "name")
+            ],
+        })
+
+    invoice_date = request.data.get("invoice_date")
+    try:
+        bill_date = datetime.strptime(invoice_date, "%Y-%m-%d").date() if invoice_date else timezone.localdate()
+    except ValueError:
+        return Response({"success": False, "message": "Invalid invoice_date"}, status=400)
+
+    entries = []
+    for index, entry in enumerate(request.data.get("bills") or []):
+        try:
+            entries.append({
+                "customer_id": int(entry.get("customer")),
+                "rows": parse_bill_rows(entry.get("items", []), entry.get("quantities", []), entry.get("discounts", [])),
+            })
+        except (TypeError, ValueError, AttributeError) as e:
+            return Response({"success": False, "message": f"bills[{index}]: {e}"}, status=400)
+
+    if not entries:
+        return Response({"success": False, "message": "bills is required"}, status=400)
+
+    results = create_route_bills(entries, invoice_date=bill_date, unit_price=_unit_price)
+    created = sum(1 for result in results if result["success"])
+
+    for result in results:
+        if result["total_amount"] is not None:
+            result["total_amount"] = str(result["total_amount"])
+
+    return Response({
+        "success": created > 0,
+        "invoice_date": str(bill_date),
+        "created": created,
+        "failed": len(results) - created,
+        "results": results,
+    }, status=200 if created else 400)
+
+
 # ------------------------------------------
 # 7️⃣ DELETE BILL (soft delete + rollback)
 # ------------------------------------------
@@ -376,17 +399,13 @@ def api_delete_bill(request, bill_id):
 
     with transaction.atomic():
 
-        for bi in bill_items:
-            bi.item.stock_quantity += bi.quantity
-            bi.item.save()
+        restore_bill_stock(bill)
 
         bill_items.delete()
         bill.is_deleted = True
         bill.save(update_fields=["is_deleted"])
 
-        if bill.customer:
-            bill.customer.due = bill.customer.get_actual_due()
-            bill.customer.save()
+        refresh_cached_due([bill.customer_id])
 
     return Response({"success": True, "bill_id": bill.id})
 
@@ -394,5 +413,8 @@ def api_delete_bill(request, bill_id):
 @api_view(['GET'])
 def api_download_bill(request, bill_id):
     bill = get_object_or_404(Bill, id=bill_id)
+    if wants_background_pdf(request):
+        return pdf_job_accepted(request, enqueue_invoice_pdf(bill))
+
     pdf_generator = UserPDFGenerator()
     return pdf_generator.generate_and_return_pdf(bill, request)
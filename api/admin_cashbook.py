@@ -116,8 +116,8 @@ def api_cashbook_dashboard(request):
 
     # ---- Customer Dues aligned with website due calculation ----
     total_customer_dues = sum(
-        max(customer.get_actual_due() or Decimal("0.00"), Decimal("0.00"))
-        for customer in Customer.objects.all()
+        max(actual_due or Decimal("0.00"), Decimal("0.00"))
+        for actual_due in Customer.objects.with_actual_due().values_list("actual_due", flat=True)
     )
 
     leakage_entries = LeakageEntry.objects.filter(
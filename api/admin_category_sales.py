@@ -2,12 +2,14 @@ import json
 from collections import OrderedDict
 from datetime import date, timedelta
 
+from django.db.models import Sum
 from django.utils import timezone
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
 from milk_agency.models import Bill, BillItem, Customer, Item
-from milk_agency.views_sales_summary import extract_liters_from_name
+from milk_agency.item_units import bill_item_liters
+from milk_agency.views_sales_summary import category_volume_totals
 
 
 def _serialize_period(period, today):
@@ -57,8 +59,8 @@ def api_sales_summary_by_category(request):
     amount_by_category = {cat: 0.0 for cat in categories}
     compare_amount_by_category = {cat: 0.0 for cat in categories}
 
-    billitems_qs = BillItem.objects.select_related("bill", "item").filter(bill__is_deleted=False)
-    compare_billitems_qs = BillItem.objects.select_related("bill", "item").filter(bill__is_deleted=False)
+    billitems_qs = BillItem.objects.filter(bill__is_deleted=False)
+    compare_billitems_qs = BillItem.objects.filter(bill__is_deleted=False)
 
     if start_date and end_date:
         billitems_qs = billitems_qs.filter(bill__invoice_date__range=(start_date, end_date))
@@ -69,23 +71,15 @@ def api_sales_summary_by_category(request):
         billitems_qs = billitems_qs.filter(bill__customer_id=customer_id)
         compare_billitems_qs = compare_billitems_qs.filter(bill__customer_id=customer_id)
 
-    for bi in billitems_qs:
-        item = bi.item
-        category = (item.category.strip() if item and item.category else "") or "Others"
-        liters = extract_liters_from_name(item.name if item else "", fallback_unit_liters=0.0) * (bi.quantity or 0)
-        data_by_category.setdefault(category, 0.0)
-        amount_by_category.setdefault(category, 0.0)
-        data_by_category[category] += float(liters)
-        amount_by_category[category] += float(bi.total_amount or 0.0)
-
-    for bi in compare_billitems_qs:
-        item = bi.item
-        category = (item.category.strip() if item and item.category else "") or "Others"
-        liters = extract_liters_from_name(item.name if item else "", fallback_unit_liters=0.0) * (bi.quantity or 0)
-        compare_data_by_category.setdefault(category, 0.0)
-        compare_amount_by_category.setdefault(category, 0.0)
-        compare_data_by_category[category] += float(liters)
-        compare_amount_by_category[category] += float(bi.total_amount or 0.0)
+    volumes, amounts = category_volume_totals(billitems_qs)
+    for category, liters in volumes.items():
+        data_by_category[category] = data_by_category.get(category, 0.0) + liters
+        amount_by_category[category] = amount_by_category.get(category, 0.0) + amounts[category]
+
+    volumes, amounts = category_volume_totals(compare_billitems_qs)
+    for category, liters in volumes.items():
+        compare_data_by_category[category] = compare_data_by_category.get(category, 0.0) + liters
+        compare_amount_by_category[category] = compare_amount_by_category.get(category, 0.0) + amounts[category]
 
     trend_by_category = {c: [] for c in categories}
     months = []
@@ -97,7 +91,7 @@ def api_sales_summary_by_category(request):
     for year, month in months:
         month_start = date(year, month, 1)
         month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-        monthly_items = BillItem.objects.select_related("bill", "item").filter(
+        monthly_items = BillItem.objects.filter(
             bill__is_deleted=False,
             bill__invoice_date__range=(month_start, month_end),
         )
@@ -105,10 +99,8 @@ def api_sales_summary_by_category(request):
             monthly_items = monthly_items.filter(bill__customer_id=customer_id)
 
         per_cat = {c: 0.0 for c in categories}
-        for bi in monthly_items:
-            category = (bi.item.category.strip() if bi.item and bi.item.category else "") or "Others"
-            liters = extract_liters_from_name(bi.item.name if bi.item else "", fallback_unit_liters=0.0) * (bi.quantity or 0)
-            per_cat[category] = per_cat.get(category, 0.0) + float(liters)
+        for category, liters in category_volume_totals(monthly_items)[0].items():
+            per_cat[category] = per_cat.get(category, 0.0) + liters
 
         for category in categories:
             trend_by_category[category].append({"date": month_start.isoformat(), "volume": round(per_cat[category], 3)})
@@ -125,17 +117,19 @@ def api_sales_summary_by_category(request):
     years = year_qs.dates("invoice_date", "year")
     years_list = sorted({d.year for d in years}) if years else [today.year - 2, today.year - 1, today.year]
 
+    bi_qs = BillItem.objects.filter(
+        bill__is_deleted=False,
+        bill__invoice_date__year__in=years_list,
+    )
+    if customer_id:
+        bi_qs = bi_qs.filter(bill__customer_id=customer_id)
+    liters_by_year = dict(
+        bi_qs.values_list("bill__invoice_date__year")
+        .annotate(liters=Sum(bill_item_liters()))
+        .order_by()
+    )
     for year in years_list:
-        bi_qs = BillItem.objects.select_related("bill", "item").filter(
-            bill__is_deleted=False,
-            bill__invoice_date__year=year,
-        )
-        if customer_id:
-            bi_qs = bi_qs.filter(bill__customer_id=customer_id)
-        total_liters = 0.0
-        for bi in bi_qs:
-            total_liters += float(extract_liters_from_name(bi.item.name if bi.item else "", fallback_unit_liters=0.0) * (bi.quantity or 0))
-        year_totals[str(year)] = round(total_liters, 3)
+        year_totals[str(year)] = round(float(liters_by_year.get(year) or 0), 3)
 
     customers = list(Customer.objects.order_by("name").values("id", "name"))
     top_categories = sorted(
@@ -18,7 +18,7 @@ def api_customer_list(request):
         is_superuser=False,
         is_staff=False,
         user_type='retailer'
-    ).order_by('id')
+    ).with_actual_due().order_by('id')
 
     data = []
 
@@ -29,7 +29,7 @@ def api_customer_list(request):
             "name": c.name,
             "shop_name": c.shop_name or "",
             "phone": c.phone or "",
-            "due": float(c.get_actual_due() or 0),
+            "due": float(c.actual_due or 0),
             "frozen": c.frozen,
             "city": c.city or "",
             "state": c.state or "",
@@ -53,14 +53,14 @@ def api_customer_list(request):
 @api_view(['GET'])
 def api_customer_detail(request, pk):
 
-    c = get_object_or_404(Customer, id=pk, is_superuser=False)
+    c = get_object_or_404(Customer.objects.with_actual_due(), id=pk, is_superuser=False)
 
     return Response({
         "id": c.id,
         "name": c.name,
         "shop_name": c.shop_name or "",
         "phone": c.phone or "",
-        "due": float(c.get_actual_due() or 0),
+        "due": float(c.actual_due or 0),
         "flat_number": c.flat_number or "",
         "area": c.area or "",
         "pin_code": c.pin_code or "",
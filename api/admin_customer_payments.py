@@ -1,9 +1,12 @@
+from decimal import Decimal
+
 from django.http import JsonResponse
-from django.db.models import Q, F, Sum
+from django.db.models import Count, Q, F, Sum
 from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
 from rest_framework.decorators import api_view
 
+from milk_agency.keyset_pagination import PAYMENT_ORDERING, InvalidCursor, keyset_page, page_size
 from milk_agency.models import CustomerPayment
 
 
@@ -17,7 +20,7 @@ def customer_payments_api(request):
     transaction_id_filter = request.GET.get("transaction_id", "").strip()
     status_filter = request.GET.get("status", "").strip()
 
-    payments = CustomerPayment.objects.select_related("customer", "bill").all().order_by("-created_at")
+    payments = CustomerPayment.objects.order_by(*PAYMENT_ORDERING)
 
     if customer_filter:
         payments = payments.filter(
@@ -30,12 +33,14 @@ def customer_payments_api(request):
     if status_filter:
         payments = payments.filter(status__iexact=status_filter)
 
-    total_amount = payments.aggregate(
-        total=Coalesce(Sum("amount"), 0)
-    )["total"]
+    totals = payments.aggregate(
+        total=Coalesce(Sum("amount"), Decimal("0.00")),
+        count=Count("id"),
+        success_count=Count("id", filter=Q(status__iexact="SUCCESS")),
+        failed_count=Count("id", filter=Q(status__iexact="FAILED")),
+    )
 
-    data = []
-    for p in payments.values(
+    payments = payments.values(
         "id",
         "transaction_id",
         "amount",
@@ -43,22 +48,36 @@ def customer_payments_api(request):
         "status",
         "created_at",
         "bill_id",
+        "customer_id",
         bill_invoice_number=F("bill__invoice_number"),
         customer_name=F("customer__name"),
-        customer_id=F("customer_id"),
-    ):
+    )
+
+    # Every match is returned unless the app asks for pages with ?limit= or ?cursor=
+    cursors = {}
+    cursor = request.GET.get("cursor", "").strip()
+    if cursor or request.GET.get("limit"):
+        try:
+            payments = keyset_page(payments, cursor, ordering=PAYMENT_ORDERING, per_page=page_size(request.GET.get("limit"), 50))
+        except InvalidCursor:
+            return JsonResponse({"status": "error", "message": "Invalid cursor"}, status=400)
+        cursors = payments.cursor_data()
+
+    data = []
+    for p in payments:
         p["created_at"] = p["created_at"].strftime("%Y-%m-%d %H:%M:%S")
         data.append(p)
 
     return JsonResponse({
         "summary": {
-            "count": len(data),
-            "total_amount": float(total_amount or 0),
-            "success_count": sum(1 for p in data if str(p["status"]).upper() == "SUCCESS"),
-            "failed_count": sum(1 for p in data if str(p["status"]).upper() == "FAILED"),
+            "count": totals["count"],
+            "total_amount": float(totals["total"]),
+            "success_count": totals["success_count"],
+            "failed_count": totals["failed_count"],
         },
-        "count": len(data),
-        "payments": data
+        "count": totals["count"],
+        "payments": data,
+        **cursors,
     })
 
 
@@ -11,6 +11,7 @@ from milk_agency.models import (
     Bill,
     Contact,
     Customer,
+    CustomerLedger,
     CustomerPayment,
     CustomerSubscription,
     Item,
@@ -25,13 +26,6 @@ def _as_float(value):
     return float(value or 0)
 
 
-def _sum_customer_actual_due(queryset):
-    total = Decimal("0.00")
-    for customer in queryset:
-        total += Decimal(customer.get_actual_due() or 0)
-    return total
-
-
 @api_view(["GET"])
 def dashboard_api(request):
     today = timezone.localdate()
@@ -71,20 +65,20 @@ def dashboard_api(request):
     sales_year = yearly_bills.aggregate(total=Coalesce(Sum("total_amount"), Value(Decimal("0.00"))))["total"]
     profit_today = today_bills.aggregate(total=Coalesce(Sum("profit"), Value(Decimal("0.00"))))["total"]
 
-    total_dues = _sum_customer_actual_due(Customer.objects.all())
-    due_customers = []
-    for customer in Customer.objects.filter(frozen=False).order_by("name"):
-        actual_due = Decimal(customer.get_actual_due() or 0)
-        if actual_due > 0:
-            due_customers.append(
-                {
-                    "id": customer.id,
-                    "name": customer.name,
-                    "phone": customer.phone,
-                    "actual_due": float(actual_due),
-                }
-            )
-    due_customers = sorted(due_customers, key=lambda item: item["actual_due"], reverse=True)
+    total_dues = CustomerLedger.objects.aggregate(
+        total=Coalesce(Sum("balance"), Value(Decimal("0.00")))
+    )["total"]
+    due_customers = [
+        {
+            "id": ledger.customer_id,
+            "name": ledger.customer.name,
+            "phone": ledger.customer.phone,
+            "actual_due": float(ledger.balance),
+        }
+        for ledger in CustomerLedger.objects.select_related("customer")
+        .filter(customer__frozen=False, balance__gt=0)
+        .order_by("-balance", "customer__name")[:5]
+    ]
 
     pending_orders_qs = CustomerOrder.objects.select_related("customer").filter(
         status__in=["pending", "payment_pending", "confirmed"]
@@ -249,7 +243,7 @@ def dashboard_api(request):
             }
             for sub in expiring_subscriptions_qs.order_by("end_date")[:5]
         ],
-        "top_due_customers": due_customers[:5],
+        "top_due_customers": due_customers,
         "top_stock_items": [
             {
                 **item,
@@ -1,56 +1,36 @@
 from datetime import datetime
 
-from django.db import connection
-from django.db.models import Q
+from django.core.paginator import Paginator
+from django.db.models import Count, Q
 from django.urls import NoReverseMatch, reverse
 from django.utils import timezone
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
-from customer_portal.models import CustomerOrder
-from milk_agency.models import OrderDelivery, SubscriptionDelivery, SubscriptionOrder
+from milk_agency.models import DeliveryTask
+from milk_agency.delivery_filters import (
+    delivered_orders_q,
+    delivered_subscriptions_q,
+    filter_delivery_tasks,
+    pending_orders_q,
+    pending_subscriptions_q,
+)
+from milk_agency.keyset_pagination import page_size
+from milk_agency.schema_capabilities import model_is_queryable
 
 
-ORDER_PENDING_STATUSES = {"pending", "confirmed", "processing", "ready", "payment_pending"}
-ORDER_CLOSED_STATUSES = {"rejected", "cancelled", "delivered"}
-ORDER_TRACKING_PENDING_STATUSES = {"pending", "out_for_delivery", "failed"}
-SUBSCRIPTION_PENDING_STATUSES = {"pending", "out_for_delivery", "failed", "skipped"}
+# Unlike the web dashboard, the app also lists unpaid orders and failed or skipped subscriptions as pending
+ORDER_PENDING_STATUSES = ("payment_pending", "pending", "confirmed", "processing", "ready")
+SUBSCRIPTION_PENDING_STATUSES = ("pending", "out_for_delivery", "failed", "skipped")
 
-
-class SubscriptionDeliveryFallback:
-    def __init__(self, subscription_order, status, delivered_at=None, bill=None):
-        self.id = None
-        self.subscription_order = subscription_order
-        self.status = status
-        self.delivered_at = delivered_at
-        self.bill = bill
-        self.eta = None
-        self.delivered_by = None
-        self.notes = ""
-        self.created_at = getattr(subscription_order, "created_at", None)
-        self.updated_at = getattr(subscription_order, "created_at", None)
-
-    def get_status_display(self):
-        return self.status.replace("_", " ").title()
-
-
-def _model_is_queryable(model):
-    try:
-        table_names = connection.introspection.table_names()
-        if model._meta.db_table not in table_names:
-            return False
-
-        with connection.cursor() as cursor:
-            description = connection.introspection.get_table_description(cursor, model._meta.db_table)
-        db_columns = {col.name for col in description}
-        model_columns = {
-            field.column
-            for field in model._meta.local_concrete_fields
-            if getattr(field, "column", None)
-        }
-        return model_columns.issubset(db_columns)
-    except Exception:
-        return False
+# Matched case-insensitively by the dashboard's q filter
+ORDER_SEARCH_FIELDS = (
+    "order__order_number", "customer__name", "customer__phone", "order__delivery_address", "order__payment_reference",
+)
+SUBSCRIPTION_SEARCH_FIELDS = (
+    "customer__name", "customer__phone", "subscription_order__item__name",
+    "subscription_order__subscription__subscription_plan__name",
+)
 
 
 def _parse_filter_date(raw):
@@ -73,6 +53,7 @@ def _get_filters(request):
         "kind": (request.GET.get("kind") or "all").strip().lower(),
         "stage": (request.GET.get("stage") or "all").strip().lower(),
         "status": (request.GET.get("status") or "all").strip().lower(),
+        "area": (request.GET.get("area") or "").strip(),
         "date_raw": raw_date,
         "date": _parse_filter_date(raw_date),
     }
@@ -144,73 +125,10 @@ def _staff_payload(user):
     }
 
 
-def _resolve_order_tracking(order, has_order_delivery_table):
-    return getattr(order, "delivery_tracking", None) if has_order_delivery_table else None
-
-
-def _resolve_order_status(order, has_order_delivery_table):
-    delivery_tracking = _resolve_order_tracking(order, has_order_delivery_table)
-    raw_status = getattr(delivery_tracking, "status", None) or getattr(order, "status", None) or "pending"
-    return _present_order_status(raw_status)
-
-
-def _matches_order(order, filters, has_order_delivery_table):
-    status = _resolve_order_status(order, has_order_delivery_table)
-    if filters["kind"] not in ("all", "order"):
-        return False
-    if filters["stage"] == "pending" and status == "delivered":
-        return False
-    if filters["stage"] == "delivered" and status != "delivered":
-        return False
-    if filters["status"] != "all" and status != filters["status"]:
-        return False
-    if filters["date"] and getattr(order, "delivery_date", None) != filters["date"]:
-        return False
-    if filters["q"]:
-        haystack = " ".join(
-            [
-                getattr(order, "order_number", ""),
-                getattr(getattr(order, "customer", None), "name", ""),
-                getattr(getattr(order, "customer", None), "phone", ""),
-                getattr(order, "delivery_address", ""),
-                getattr(order, "payment_reference", ""),
-            ]
-        ).lower()
-        if filters["q"] not in haystack:
-            return False
-    return True
-
-
-def _matches_subscription(delivery, filters):
-    if filters["kind"] not in ("all", "subscription"):
-        return False
-    if filters["stage"] == "pending" and delivery.status == "delivered":
-        return False
-    if filters["stage"] == "delivered" and delivery.status != "delivered":
-        return False
-    if filters["status"] != "all" and delivery.status != filters["status"]:
-        return False
-
-    sub_order = delivery.subscription_order
-    if filters["date"] and getattr(sub_order, "date", None) != filters["date"]:
-        return False
-    if filters["q"]:
-        haystack = " ".join(
-            [
-                getattr(getattr(sub_order, "customer", None), "name", ""),
-                getattr(getattr(sub_order, "customer", None), "phone", ""),
-                getattr(getattr(sub_order, "item", None), "name", ""),
-                getattr(getattr(getattr(sub_order, "subscription", None), "subscription_plan", None), "name", ""),
-            ]
-        ).lower()
-        if filters["q"] not in haystack:
-            return False
-    return True
-
-
-def _serialize_order(order, request, has_order_delivery_table):
-    delivery_tracking = _resolve_order_tracking(order, has_order_delivery_table)
-    status = _resolve_order_status(order, has_order_delivery_table)
+def _serialize_order(task, request):
+    order = task.order
+    delivery_tracking = getattr(order, "delivery_tracking", None)
+    status = _present_order_status(task.status)
     delivery_charge = float(order.delivery_charge or 0)
     items_total = float(order.total_amount or 0)
     grand_total = items_total + delivery_charge
@@ -283,24 +201,23 @@ def _serialize_subscription_delivery(delivery, request):
     }
 
 
-def _build_summary(today, pending_orders, delivered_orders, pending_subs, delivered_subs):
-    today_pending_orders = sum(1 for order in pending_orders if str(order.get("delivery_date")) == str(today))
-    today_delivered_orders = sum(1 for order in delivered_orders if str(order.get("delivery_date")) == str(today))
-    today_pending_subs = sum(1 for item in pending_subs if str(item.get("date")) == str(today))
-    today_delivered_subs = sum(1 for item in delivered_subs if str(item.get("date")) == str(today))
+def _section_counts(rows, today):
+    return rows.aggregate(total=Count("id"), today=Count("id", filter=Q(date=today)))
+
 
+def _build_summary(pending_orders, delivered_orders, pending_subs, delivered_subs):
     return {
-        "pending_orders": len(pending_orders),
-        "delivered_orders": len(delivered_orders),
-        "pending_subscriptions": len(pending_subs),
-        "delivered_subscriptions": len(delivered_subs),
-        "pending_total": len(pending_orders) + len(pending_subs),
-        "delivered_total": len(delivered_orders) + len(delivered_subs),
-        "today_pending_orders": today_pending_orders,
-        "today_delivered_orders": today_delivered_orders,
-        "today_pending_subscriptions": today_pending_subs,
-        "today_delivered_subscriptions": today_delivered_subs,
-        "today_total": today_pending_orders + today_delivered_orders + today_pending_subs + today_delivered_subs,
+        "pending_orders": pending_orders["total"],
+        "delivered_orders": delivered_orders["total"],
+        "pending_subscriptions": pending_subs["total"],
+        "delivered_subscriptions": delivered_subs["total"],
+        "pending_total": pending_orders["total"] + pending_subs["total"],
+        "delivered_total": delivered_orders["total"] + delivered_subs["total"],
+        "today_pending_orders": pending_orders["today"],
+        "today_delivered_orders": delivered_orders["today"],
+        "today_pending_subscriptions": pending_subs["today"],
+        "today_delivered_subscriptions": delivered_subs["today"],
+        "today_total": pending_orders["today"] + delivered_orders["today"] + pending_subs["today"] + delivered_subs["today"],
     }
 
 
@@ -308,137 +225,79 @@ def _build_summary(today, pending_orders, delivered_orders, pending_subs, delive
 def api_admin_delivery_dashboard(request):
     today = timezone.localdate()
     filters = _get_filters(request)
-    has_order_delivery_table = _model_is_queryable(OrderDelivery)
-    has_subscription_delivery_table = _model_is_queryable(SubscriptionDelivery)
-
-    if has_order_delivery_table:
-        pending_orders_qs = (
-            CustomerOrder.objects.select_related(
-                "customer",
-                "approved_by",
-                "bill",
-                "delivery_tracking__delivered_by",
-            )
-            .prefetch_related("items")
-            .filter(
-                Q(status__in=ORDER_PENDING_STATUSES)
-                | Q(delivery_tracking__status__in=ORDER_TRACKING_PENDING_STATUSES)
-            )
-            .exclude(status__in=ORDER_CLOSED_STATUSES)
-            .distinct()
-            .order_by("delivery_date", "-order_date", "-created_at")
-        )
-        delivered_orders_qs = (
-            CustomerOrder.objects.select_related(
-                "customer",
-                "approved_by",
-                "bill",
-                "delivery_tracking__delivered_by",
-            )
-            .prefetch_related("items")
-            .filter(Q(status="delivered") | Q(delivery_tracking__status="delivered"))
-            .distinct()
-            .order_by("-delivery_date", "-updated_at")
-        )
-    else:
-        pending_orders_qs = (
-            CustomerOrder.objects.select_related("customer", "approved_by", "bill")
-            .prefetch_related("items")
-            .filter(status__in=ORDER_PENDING_STATUSES)
-            .exclude(status__in=ORDER_CLOSED_STATUSES)
-            .order_by("delivery_date", "-order_date", "-created_at")
-        )
-        delivered_orders_qs = (
-            CustomerOrder.objects.select_related("customer", "approved_by", "bill")
-            .prefetch_related("items")
-            .filter(status="delivered")
-            .order_by("-delivery_date", "-updated_at")
-        )
-
-    pending_orders = [
-        _serialize_order(order, request, has_order_delivery_table)
-        for order in pending_orders_qs
-        if _matches_order(order, filters, has_order_delivery_table)
-    ]
-    delivered_orders = [
-        _serialize_order(order, request, has_order_delivery_table)
-        for order in delivered_orders_qs
-        if _matches_order(order, filters, has_order_delivery_table)
-    ]
-
-    if has_subscription_delivery_table:
-        pending_sub_qs = (
-            SubscriptionDelivery.objects.select_related(
-                "subscription_order__customer",
-                "subscription_order__item",
-                "subscription_order__subscription__subscription_plan",
-                "delivered_by",
-                "bill",
-            )
-            .filter(status__in=SUBSCRIPTION_PENDING_STATUSES)
-            .order_by("subscription_order__date", "subscription_order__customer__name")
-        )
-        delivered_sub_qs = (
-            SubscriptionDelivery.objects.select_related(
-                "subscription_order__customer",
-                "subscription_order__item",
-                "subscription_order__subscription__subscription_plan",
-                "delivered_by",
-                "bill",
-            )
-            .filter(status="delivered")
-            .order_by("-subscription_order__date", "-delivered_at", "-updated_at")
-        )
-        pending_subscriptions = [
-            _serialize_subscription_delivery(delivery, request)
-            for delivery in pending_sub_qs
-            if _matches_subscription(delivery, filters)
-        ]
-        delivered_subscriptions = [
-            _serialize_subscription_delivery(delivery, request)
-            for delivery in delivered_sub_qs
-            if _matches_subscription(delivery, filters)
-        ]
-    else:
-        pending_sub_fallback = [
-            SubscriptionDeliveryFallback(subscription_order=obj, status="pending")
-            for obj in SubscriptionOrder.objects.select_related(
-                "customer",
-                "item",
-                "subscription__subscription_plan",
-            )
-            .filter(delivered=False)
-            .order_by("date", "customer__name")
-        ]
-        delivered_sub_fallback = [
-            SubscriptionDeliveryFallback(subscription_order=obj, status="delivered")
-            for obj in SubscriptionOrder.objects.select_related(
-                "customer",
-                "item",
-                "subscription__subscription_plan",
-            )
-            .filter(delivered=True)
-            .order_by("-date", "customer__name")
-        ]
-        pending_subscriptions = [
-            _serialize_subscription_delivery(delivery, request)
-            for delivery in pending_sub_fallback
-            if _matches_subscription(delivery, filters)
-        ]
-        delivered_subscriptions = [
-            _serialize_subscription_delivery(delivery, request)
-            for delivery in delivered_sub_fallback
-            if _matches_subscription(delivery, filters)
-        ]
+    if not model_is_queryable(DeliveryTask):
+        return Response({"error": "Delivery tracking is not available until the database is migrated."}, status=503)
+
+    order_tasks = DeliveryTask.objects.select_related(
+        "order__customer",
+        "order__approved_by",
+        "order__bill",
+        "order__delivery_tracking__delivered_by",
+    ).prefetch_related("order__items")
+    pending_orders_qs = order_tasks.filter(pending_orders_q(ORDER_PENDING_STATUSES)).order_by(
+        "date", "-order__order_date", "-order__created_at", "-order_id"
+    )
+    delivered_orders_qs = order_tasks.filter(delivered_orders_q()).order_by("-date", "-order__updated_at", "-order_id")
+    order_filters = {"kind": "order", "present_status": _present_order_status, "search_fields": ORDER_SEARCH_FIELDS}
+    pending_orders_qs = filter_delivery_tasks(pending_orders_qs, filters, **order_filters)
+    delivered_orders_qs = filter_delivery_tasks(delivered_orders_qs, filters, **order_filters)
+
+    subscription_tasks = DeliveryTask.objects.select_related(
+        "subscription_order__customer",
+        "subscription_order__item",
+        "subscription_order__subscription__subscription_plan",
+        "subscription_order__delivery_tracking__delivered_by",
+        "subscription_order__delivery_tracking__bill",
+    )
+    pending_sub_qs = subscription_tasks.filter(pending_subscriptions_q(SUBSCRIPTION_PENDING_STATUSES)).order_by(
+        "date", "subscription_order__customer__name", "id"
+    )
+    delivered_sub_qs = subscription_tasks.filter(delivered_subscriptions_q()).order_by(
+        "-date", "-delivered_at", "-updated_at", "-id"
+    )
+    subscription_filters = {"kind": "subscription", "search_fields": SUBSCRIPTION_SEARCH_FIELDS}
+    pending_sub_qs = filter_delivery_tasks(pending_sub_qs, filters, **subscription_filters)
+    delivered_sub_qs = filter_delivery_tasks(delivered_sub_qs, filters, **subscription_filters)
 
     summary = _build_summary(
-        today=today,
-        pending_orders=pending_orders,
-        delivered_orders=delivered_orders,
-        pending_subs=pending_subscriptions,
-        delivered_subs=delivered_subscriptions,
+        pending_orders=_section_counts(pending_orders_qs, today),
+        delivered_orders=_section_counts(delivered_orders_qs, today),
+        pending_subs=_section_counts(pending_sub_qs, today),
+        delivered_subs=_section_counts(delivered_sub_qs, today),
     )
 
+    # Every match is returned unless the app asks for pages with ?limit=; each
+    # list then pages on its own ?<list>_page= parameter
+    sections = {
+        "pending_customer_orders": pending_orders_qs,
+        "delivered_customer_orders": delivered_orders_qs,
+        "pending_subscriptions": pending_sub_qs,
+        "delivered_subscriptions": delivered_sub_qs,
+    }
+    pagination = {}
+    if request.GET.get("limit"):
+        per_page = page_size(request.GET.get("limit"), 25)
+        pagination["pagination"] = {}
+        for key, rows in sections.items():
+            page = Paginator(rows, per_page).get_page(request.GET.get(f"{key}_page"))
+            sections[key] = page.object_list
+            pagination["pagination"][key] = {
+                "page": page.number,
+                "num_pages": page.paginator.num_pages,
+                "has_next": page.has_next(),
+            }
+
+    pending_orders = [_serialize_order(task, request) for task in sections["pending_customer_orders"]]
+    delivered_orders = [_serialize_order(task, request) for task in sections["delivered_customer_orders"]]
+    pending_subscriptions = [
+        _serialize_subscription_delivery(task.subscription_order.delivery_tracking, request)
+        for task in sections["pending_subscriptions"]
+    ]
+    delivered_subscriptions = [
+        _serialize_subscription_delivery(task.subscription_order.delivery_tracking, request)
+        for task in sections["delivered_subscriptions"]
+    ]
+
     return Response(
         {
             "date": str(today),
@@ -447,15 +306,17 @@ def api_admin_delivery_dashboard(request):
                 "kind": filters["kind"],
                 "stage": filters["stage"],
                 "status": filters["status"],
+                "area": filters["area"],
                 "date": filters["date_raw"],
             },
-            "has_order_delivery_tracking": has_order_delivery_table,
-            "has_subscription_delivery_tracking": has_subscription_delivery_table,
+            "has_order_delivery_tracking": True,
+            "has_subscription_delivery_tracking": True,
             "summary": summary,
             "pending_customer_orders": pending_orders,
             "delivered_customer_orders": delivered_orders,
             "pending_subscriptions": pending_subscriptions,
             "delivered_subscriptions": delivered_subscriptions,
+            **pagination,
             "status_options": {
                 "order": ["pending", "out_for_delivery", "delivered", "failed"],
                 "subscription": ["pending", "out_for_delivery", "delivered", "skipped", "failed"],
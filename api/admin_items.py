@@ -1,8 +1,10 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
+from django.db import transaction
 from django.db.models import Count, Sum, Value
 from django.db.models.functions import Coalesce
 from milk_agency.models import Item
+from milk_agency.stock_ledger import set_stock_quantity
 
 
 def _absolute_media_url(request, file_field):
@@ -155,7 +157,6 @@ def edit_item(request, item_id):
     item.selling_price = request.data.get("selling_price", item.selling_price)
     item.buying_price = request.data.get("buying_price", item.buying_price)
     item.mrp = request.data.get("mrp", item.mrp)
-    item.stock_quantity = request.data.get("stock_quantity", item.stock_quantity)
     item.pcs_count = request.data.get("pcs_count", item.pcs_count)
     item.description = request.data.get("description", item.description)
 
@@ -163,7 +164,13 @@ def edit_item(request, item_id):
     if image:
         item.image = image
 
-    item.save()
+    with transaction.atomic():
+        # Locks the row, so the save below cannot overwrite a concurrent stock change
+        stock_quantity = request.data.get("stock_quantity")
+        if stock_quantity in (None, ""):
+            stock_quantity = Item.objects.select_for_update().values_list("stock_quantity", flat=True).get(pk=item.pk)
+        set_stock_quantity(item, stock_quantity, note="Edited from admin app")
+        item.save()
 
     return Response({
         "success": True,
@@ -5,10 +5,12 @@ from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
 from django.db import transaction
+from django.db.models import Count, Q
 from django.shortcuts import get_object_or_404
 
 from customer_portal.models import CustomerOrder, CustomerOrderItem
 from customer_portal.order_workflow import finalize_order_after_payment
+from milk_agency.keyset_pagination import ORDER_DASHBOARD_ORDERING, InvalidCursor, keyset_page, page_size
 from milk_agency.push_notifications import notify_order_rejected
 from milk_agency.order_pricing import get_customer_unit_price
 
@@ -22,14 +24,32 @@ def api_admin_orders_dashboard(request):
     status_filter = request.GET.get("status", "").strip().lower()
     pending_orders = CustomerOrder.objects.filter(
         status__in=["pending", "payment_pending", "confirmed"]
-    ).select_related("customer", "approved_by", "bill").prefetch_related("items__item").order_by("delivery_date", "-order_date")
+    ).select_related("customer", "approved_by", "bill").prefetch_related("items__item").order_by(*ORDER_DASHBOARD_ORDERING)
 
     if status_filter:
         pending_orders = pending_orders.filter(status=status_filter)
 
+    counts = pending_orders.aggregate(
+        total_pending=Count("id"),
+        payment_pending=Count("id", filter=Q(status="payment_pending")),
+        review_pending=Count("id", filter=Q(status="pending")),
+        confirmed=Count("id", filter=Q(status="confirmed")),
+    )
+
+    # Every open order is returned unless the app asks for pages with ?limit= or ?cursor=
+    page = pending_orders
+    cursors = {}
+    cursor = request.GET.get("cursor")
+    if cursor or request.GET.get("limit"):
+        try:
+            page = keyset_page(pending_orders, cursor, ordering=ORDER_DASHBOARD_ORDERING, per_page=page_size(request.GET.get("limit"), 25))
+        except InvalidCursor:
+            return Response({"error": "Invalid cursor"}, status=400)
+        cursors = page.cursor_data()
+
     orders = []
 
-    for order in pending_orders:
+    for order in page:
         grand_total = float((order.total_amount or 0) + (order.delivery_charge or 0))
         orders.append({
             "order_id": order.id,
@@ -68,14 +88,10 @@ def api_admin_orders_dashboard(request):
         })
 
     return Response({
-        "summary": {
-            "total_pending": pending_orders.count(),
-            "payment_pending": pending_orders.filter(status="payment_pending").count(),
-            "review_pending": pending_orders.filter(status="pending").count(),
-            "confirmed": pending_orders.filter(status="confirmed").count(),
-        },
-        "total_pending": pending_orders.count(),
-        "orders": orders
+        "summary": counts,
+        "total_pending": counts["total_pending"],
+        "orders": orders,
+        **cursors,
     })
 
 
@@ -219,7 +235,7 @@ def api_reject_order(request, order_id):
 
     order.status = "rejected"
     order.save()
-    transaction.on_commit(lambda order_id=order.id: notify_order_rejected(CustomerOrder.objects.select_related("customer").get(pk=order_id)))
+    notify_order_rejected(order)
 
     return Response({
         "success": True,
@@ -7,6 +7,7 @@ from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from django.db import transaction
 from milk_agency.models import Item, BillItem, StockInEntry, LeakageEntry
+from milk_agency.stock_ledger import record_stock_movement
 from milk_agency.utils import apply_stock_updates, delete_stock_entry, parse_decimal, update_stock_entry
 
 
@@ -250,9 +251,6 @@ def save_leakage_api(request):
                 status=400,
             )
 
-        item.stock_quantity -= quantity
-        item.save(update_fields=["stock_quantity"])
-
         leakage = LeakageEntry.objects.create(
             item=item,
             date=leakage_date,
@@ -260,6 +258,7 @@ def save_leakage_api(request):
             unit_cost=item.buying_price,
             notes=notes,
         )
+        record_stock_movement(item, -quantity, "leakage", leakage=leakage)
 
     return Response({
         "success": True,
@@ -286,8 +285,9 @@ def delete_leakage_api(request, leakage_id):
 
     with transaction.atomic():
         item = Item.objects.select_for_update().get(id=leakage.item_id)
-        item.stock_quantity += leakage.quantity
-        item.save(update_fields=["stock_quantity"])
+        record_stock_movement(
+            item, leakage.quantity, "leakage_restore", leakage=leakage, note=f"Leakage dated {leakage.date}"
+        )
         leakage.delete()
 
     return Response({"success": True, "message": "Leakage deleted and stock restored"})
@@ -19,7 +19,7 @@ def _user_queryset():
 
 @api_view(["GET"])
 def api_user_list(request):
-    users = _user_queryset()
+    users = _user_queryset().with_actual_due()
     data = []
     for index, user in enumerate(users, start=1):
         data.append(
@@ -29,7 +29,7 @@ def api_user_list(request):
                 "name": user.name,
                 "shop_name": user.shop_name or "",
                 "phone": user.phone or "",
-                "due": float(user.get_actual_due() or 0),
+                "due": float(user.actual_due or 0),
                 "frozen": user.frozen,
                 "retailer_id": user.retailer_id or "",
                 "area": user.area or "",
@@ -52,14 +52,14 @@ def api_user_list(request):
 
 @api_view(["GET"])
 def api_user_detail(request, pk):
-    user = get_object_or_404(_user_queryset(), pk=pk)
+    user = get_object_or_404(_user_queryset().with_actual_due(), pk=pk)
     return Response(
         {
             "id": user.id,
             "name": user.name,
             "shop_name": user.shop_name or "",
             "phone": user.phone or "",
-            "due": float(user.get_actual_due() or 0),
+            "due": float(user.actual_due or 0),
             "flat_number": user.flat_number or "",
             "pin_code": user.pin_code or "",
             "city": user.city,
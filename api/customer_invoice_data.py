@@ -4,9 +4,11 @@ from rest_framework.decorators import api_view, authentication_classes, permissi
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from api.pdf_jobs import pdf_job_accepted, wants_background_pdf
 from api.user_api_helpers import get_delivery_charge_for_bill
 from api.user_bill_pdf_utils import UserPDFGenerator
 from milk_agency.models import Bill
+from milk_agency.pdf_jobs import enqueue_invoice_pdf
 
 
 @api_view(["GET"])
@@ -110,6 +112,9 @@ def customer_invoice_download_api(request):
     except Bill.DoesNotExist:
         return Response({"error": "Invoice not found"}, status=404)
 
+    if wants_background_pdf(request):
+        return pdf_job_accepted(request, enqueue_invoice_pdf(bill, requested_by=customer))
+
     pdf_gen = UserPDFGenerator()
     return pdf_gen.generate_and_return_pdf(bill, request)
 
@@ -50,7 +50,7 @@ def record_customer_payment(request):
 
         customer.due = customer.get_actual_due()
         customer.save()
-        transaction.on_commit(lambda payment_id=payment.id: notify_admin_payment_recorded(CustomerPayment.objects.select_related("customer").get(pk=payment_id)))
+        notify_admin_payment_recorded(payment)
 
     return Response(
         {"status": "success", "payment_id": payment.id, "new_balance": str(customer.get_actual_due())},
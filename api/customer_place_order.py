@@ -101,7 +101,7 @@ def place_order_api(request):
             order.status = "payment_pending" if requires_online_payment else "pending"
             order.save()
             notifier = notify_admin_order_placed if created_new else notify_admin_order_updated
-            transaction.on_commit(lambda order_id=order.id, notify_func=notifier: notify_func(CustomerOrder.objects.select_related("customer").get(pk=order_id)))
+            notifier(order)
 
             payment_payload = None
             if requires_online_payment:
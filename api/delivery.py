@@ -1,14 +1,22 @@
 from django.apps import apps
-from django.db import connection
-from django.db.models import Q
-from datetime import datetime
+from django.db.models import Case, CharField, Count, Max, Q, Value, When
+from datetime import datetime, timedelta, timezone as dt_timezone
 from django.utils import timezone
+from django.utils.http import parse_etags
 from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from customer_portal.models import CustomerOrder
+from milk_agency.delivery_filters import (
+    delivered_orders_q,
+    delivered_subscriptions_q,
+    filter_delivery_tasks,
+    pending_orders_q,
+    pending_subscriptions_q,
+)
+from milk_agency.schema_capabilities import model_is_queryable
 from milk_agency.push_notifications import (
     notify_order_delivery_status,
     notify_subscription_delivery_status,
@@ -27,37 +35,13 @@ def _subscription_order_model():
     return apps.get_model("milk_agency", "SubscriptionOrder")
 
 
-class SubscriptionDeliveryFallback:
-    def __init__(self, subscription_order, status):
-        self.id = None
-        self.subscription_order = subscription_order
-        self.status = status
-
-
-class OrderDeliveryFallback:
-    def __init__(self, order, status):
-        self.id = None
-        self.order = order
-        self.status = status
+def _delivery_task_model():
+    return apps.get_model("milk_agency", "DeliveryTask")
 
 
-def _model_is_queryable(model):
-    try:
-        table_names = connection.introspection.table_names()
-        if model._meta.db_table not in table_names:
-            return False
-
-        with connection.cursor() as cursor:
-            description = connection.introspection.get_table_description(cursor, model._meta.db_table)
-        db_columns = {col.name for col in description}
-        model_columns = {
-            field.column
-            for field in model._meta.local_concrete_fields
-            if getattr(field, "column", None)
-        }
-        return model_columns.issubset(db_columns)
-    except Exception:
-        return False
+# Matched case-insensitively by the q filter
+ORDER_SEARCH_FIELDS = ("order__order_number", "customer__name", "customer__phone", "order__delivery_address")
+SUBSCRIPTION_SEARCH_FIELDS = ("customer__name", "customer__phone", "subscription_order__item__name")
 
 
 def _present_order_status(raw_status):
@@ -84,79 +68,36 @@ def _get_filters(request):
         "kind": (request.GET.get("kind") or "all").strip().lower(),
         "stage": (request.GET.get("stage") or "all").strip().lower(),
         "status": (request.GET.get("status") or "all").strip().lower(),
+        "area": (request.GET.get("area") or "").strip(),
         "date_raw": raw_date,
         "date": _parse_filter_date(raw_date),
     }
 
 
-def _matches_order_delivery(item, filters):
-    display_status = _present_order_status(item.status)
-    if filters["kind"] not in ("all", "order"):
-        return False
-    if filters["stage"] == "pending" and display_status == "delivered":
-        return False
-    if filters["stage"] == "delivered" and display_status != "delivered":
-        return False
-    if filters["status"] != "all" and display_status != filters["status"]:
-        return False
-    if filters["date"] and getattr(item.order, "delivery_date", None) != filters["date"]:
-        return False
-    if filters["q"]:
-        haystack = " ".join([
-            getattr(item.order, "order_number", ""),
-            getattr(getattr(item.order, "customer", None), "name", ""),
-            getattr(getattr(item.order, "customer", None), "phone", ""),
-            getattr(item.order, "delivery_address", ""),
-        ]).lower()
-        if filters["q"] not in haystack:
-            return False
-    return True
-
-
-def _matches_subscription_delivery(item, filters):
-    if filters["kind"] not in ("all", "subscription"):
-        return False
-    if filters["stage"] == "pending" and item.status == "delivered":
-        return False
-    if filters["stage"] == "delivered" and item.status != "delivered":
-        return False
-    if filters["status"] != "all" and item.status != filters["status"]:
-        return False
-    if filters["date"] and getattr(item.subscription_order, "date", None) != filters["date"]:
-        return False
-    if filters["q"]:
-        haystack = " ".join([
-            getattr(getattr(item.subscription_order, "customer", None), "name", ""),
-            getattr(getattr(item.subscription_order, "customer", None), "phone", ""),
-            getattr(getattr(item.subscription_order, "item", None), "name", ""),
-        ]).lower()
-        if filters["q"] not in haystack:
-            return False
-    return True
-
-
-def _serialize_order_delivery(od):
-    delivery_charge = getattr(od.order, "delivery_charge", 0) or 0
-    grand_total = float((od.order.total_amount or 0) + delivery_charge)
-    status = _present_order_status(od.status)
+def _serialize_order_delivery(task):
+    order = task.order
+    delivery_charge = getattr(order, "delivery_charge", 0) or 0
+    grand_total = float((order.total_amount or 0) + delivery_charge)
+    status = _present_order_status(task.status)
     return {
         "type": "order",
-        "id": od.id,
-        "order_number": od.order.order_number,
-        "order_id": od.order.id,
-        "customer_name": od.order.customer.name,
-        "delivery_date": str(od.order.delivery_date) if hasattr(od.order, "delivery_date") else str(od.order.order_date),
+        "id": getattr(getattr(order, "delivery_tracking", None), "id", None),
+        "order_number": order.order_number,
+        "order_id": order.id,
+        "customer_name": order.customer.name,
+        "delivery_date": str(order.delivery_date),
         "status": status,
         "status_label": status.replace("_", " ").title(),
         "total_amount": grand_total,
-        "items_total": float(od.order.total_amount or 0),
+        "items_total": float(order.total_amount or 0),
         "delivery_charge": float(delivery_charge),
         "grand_total": grand_total,
-        "address": getattr(od.order, "delivery_address", ""),
+        "address": getattr(order, "delivery_address", ""),
     }
 
 
-def _serialize_subscription_delivery(sd):
+def _serialize_subscription_delivery(task):
+    sd = task.subscription_order.delivery_tracking
     return {
         "type": "subscription",
         "id": sd.id,
@@ -168,6 +109,18 @@ def _serialize_subscription_delivery(sd):
     }
 
 
+def _order_tasks(tasks):
+    return tasks.select_related("order__customer", "order__delivery_tracking")
+
+
+def _subscription_tasks(tasks):
+    return tasks.select_related(
+        "subscription_order__customer",
+        "subscription_order__item",
+        "subscription_order__delivery_tracking",
+    )
+
+
 @api_view(["GET"])
 @authentication_classes([TokenAuthentication])
 @permission_classes([IsAuthenticated])
@@ -179,112 +132,34 @@ def delivery_today_list(request):
     """
     filters = _get_filters(request)
     today = filters["date"] or timezone.localdate()
-    OrderDelivery = _order_delivery_model()
-    SubscriptionDelivery = _subscription_delivery_model()
-    SubscriptionOrder = _subscription_order_model()
-    has_order_delivery_table = _model_is_queryable(OrderDelivery)
-    has_subscription_delivery_table = _model_is_queryable(SubscriptionDelivery)
-
-    if has_order_delivery_table:
-        pending_orders = [
-            OrderDeliveryFallback(
-                order=order,
-                status=(
-                    _present_order_status(getattr(getattr(order, "delivery_tracking", None), "status", None))
-                    if getattr(getattr(order, "delivery_tracking", None), "status", None)
-                    else None
-                ) or (
-                    _present_order_status(order.status)
-                    if getattr(order, "status", None)
-                    else None
-                )
-                or "pending",
-            )
-            for order in (
-                CustomerOrder.objects
-                .select_related("customer")
-                .filter(
-                    delivery_date=today
-                )
-                .filter(
-                    Q(status__in=["pending", "confirmed", "processing", "ready"]) |
-                    Q(delivery_tracking__status__in=["pending", "out_for_delivery", "failed"])
-                )
-                .exclude(status__in=["rejected", "cancelled", "delivered"])
-                .distinct()
-                .order_by("delivery_date", "-order_date", "-created_at")
-            )
-        ]
-        completed_orders = [
-            OrderDeliveryFallback(
-                order=order,
-                status=(
-                    _present_order_status(getattr(getattr(order, "delivery_tracking", None), "status", None))
-                    if getattr(getattr(order, "delivery_tracking", None), "status", None)
-                    else None
-                ) or (
-                    _present_order_status(order.status)
-                    if getattr(order, "status", None)
-                    else None
-                ) or "delivered",
-            )
-            for order in (
-                CustomerOrder.objects
-                .select_related("customer")
-                .filter(delivery_date=today)
-                .filter(Q(status="delivered") | Q(delivery_tracking__status="delivered"))
-                .distinct()
-                .order_by("-delivery_date", "-updated_at")
-            )
-        ]
-    else:
-        pending_orders = [
-            OrderDeliveryFallback(order=order, status=_present_order_status(order.status or "pending"))
-            for order in (
-                CustomerOrder.objects
-                .select_related("customer")
-                .filter(
-                    delivery_date=today,
-                    status__in=["pending", "confirmed", "processing", "ready"],
-                )
-                .exclude(status__in=["rejected", "cancelled", "delivered"])
-                .order_by("delivery_date", "-order_date", "-created_at")
-            )
-        ]
-        completed_orders = [
-            OrderDeliveryFallback(order=order, status=_present_order_status("delivered"))
-            for order in (
-                CustomerOrder.objects
-                .select_related("customer")
-                .filter(delivery_date=today, status="delivered")
-                .order_by("-delivery_date", "-updated_at")
-            )
-        ]
-
-    if has_subscription_delivery_table:
-        pending_subs = SubscriptionDelivery.objects.filter(
-            subscription_order__date=today,
-            status__in=["pending", "out_for_delivery"]
-        ).select_related("subscription_order__customer", "subscription_order__item")
-
-        completed_subs = SubscriptionDelivery.objects.filter(
-            subscription_order__date=today,
-            status="delivered"
-        ).select_related("subscription_order__customer", "subscription_order__item")
-    else:
-        pending_subs = [
-            SubscriptionDeliveryFallback(subscription_order=obj, status="pending")
-            for obj in SubscriptionOrder.objects.filter(date=today, delivered=False).select_related("customer", "item")
-        ]
-        completed_subs = [
-            SubscriptionDeliveryFallback(subscription_order=obj, status="delivered")
-            for obj in SubscriptionOrder.objects.filter(date=today, delivered=True).select_related("customer", "item")
-        ]
-
-    pending_orders = [item for item in pending_orders if _matches_order_delivery(item, filters)]
-    completed_orders = [item for item in completed_orders if _matches_order_delivery(item, filters)]
-    pending_subs = [item for item in pending_subs if _matches_subscription_delivery(item, filters)]
-    completed_subs = [item for item in completed_subs if _matches_subscription_delivery(item, filters)]
+    DeliveryTask = _delivery_task_model()
+    if not model_is_queryable(DeliveryTask):
+        return Response({"error": "Delivery tracking is not available until the database is migrated."}, status=503)
+
+    tasks = DeliveryTask.objects.filter(date=today)
+    order_filters = {"kind": "order", "present_status": _present_order_status, "search_fields": ORDER_SEARCH_FIELDS}
+    subscription_filters = {"kind": "subscription", "search_fields": SUBSCRIPTION_SEARCH_FIELDS}
+
+    pending_orders = filter_delivery_tasks(
+        _order_tasks(tasks).filter(pending_orders_q()).order_by("-order__order_date", "-order__created_at", "-order_id"),
+        filters,
+        **order_filters,
+    )
+    completed_orders = filter_delivery_tasks(
+        _order_tasks(tasks).filter(delivered_orders_q()).order_by("-order__updated_at", "-order_id"),
+        filters,
+        **order_filters,
+    )
+    pending_subs = filter_delivery_tasks(
+        _subscription_tasks(tasks).filter(pending_subscriptions_q()).order_by("-updated_at", "-id"),
+        filters,
+        **subscription_filters,
+    )
+    completed_subs = filter_delivery_tasks(
+        _subscription_tasks(tasks).filter(delivered_subscriptions_q()).order_by("-updated_at", "-id"),
+        filters,
+        **subscription_filters,
+    )
 
     return Response({
         "date": str(today),
@@ -293,6 +168,7 @@ def delivery_today_list(request):
             "kind": filters["kind"],
             "stage": filters["stage"],
             "status": filters["status"],
+            "area": filters["area"],
             "date": filters["date_raw"] or str(today),
         },
         "pending": [_serialize_order_delivery(o) for o in pending_orders] +
@@ -302,6 +178,114 @@ def delivery_today_list(request):
     })
 
 
+# Deltas start this far before the client's version, so a change committed after
+# a later-stamped one is still sent; clients upsert entries by key
+MANIFEST_OVERLAP = timedelta(seconds=5)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _route_stage():
+    """A task's place on the route as delivery_today_list splits it; "" once it has left."""
+    return Case(
+        When(delivered_orders_q() | delivered_subscriptions_q(), then=Value("completed")),
+        When(pending_orders_q() | pending_subscriptions_q(), then=Value("pending")),
+        default=Value(""),
+        output_field=CharField(),
+    )
+
+
+def _manifest_version(changed_at):
+    return (changed_at - _EPOCH) // timedelta(microseconds=1) if changed_at else 0
+
+
+def _manifest_state(tasks):
+    """(version, entry count) of a day's route: the latest change, in microseconds, and how many entries it holds."""
+    state = tasks.aggregate(
+        changed_at=Max("updated_at"),
+        count=Count("id", filter=~Q(stage="")),
+    )
+    return _manifest_version(state["changed_at"]), state["count"]
+
+
+def _manifest_key(task):
+    if task.kind == "order":
+        return f"order:{task.order_id}"
+    tracking = getattr(task.subscription_order, "delivery_tracking", None)
+    return f"subscription:{tracking.id}" if tracking else None
+
+
+def _manifest_entry(task):
+    serialize = _serialize_order_delivery if task.kind == "order" else _serialize_subscription_delivery
+    return {"key": _manifest_key(task), "stage": task.stage, **serialize(task)}
+
+
+@api_view(["GET"])
+@authentication_classes([TokenAuthentication])
+@permission_classes([IsAuthenticated])
+def delivery_manifest(request):
+    """
+    The day's delivery route as a versioned snapshot, for agents that sync
+    instead of re-reading delivery_today_list.
+
+    - ETag names the route's state; If-None-Match answers 304 while it holds.
+    - ?since=<version> returns only entries changed after that version, plus
+      "removed" keys for entries that left the route.
+    - "count" is the size of the whole route; a client holding a different
+      number of entries should drop ?since= and take a full snapshot.
+    """
+    DeliveryTask = _delivery_task_model()
+    if not model_is_queryable(DeliveryTask):
+        return Response({"error": "Delivery tracking is not available until the database is migrated."}, status=503)
+
+    day = _parse_filter_date((request.GET.get("date") or "").strip()) or timezone.localdate()
+    since = None
+    if request.GET.get("since"):
+        try:
+            since = int(request.GET["since"])
+            # Versions are microseconds since the epoch; anything outside 0..now cannot be one
+            if not 0 <= since <= _manifest_version(timezone.now()):
+                raise ValueError(since)
+        except ValueError:
+            return Response({"error": "since must be a version from an earlier manifest"}, status=400)
+
+    tasks = DeliveryTask.objects.filter(date=day).alias(stage=_route_stage())
+    version, count = _manifest_state(tasks)
+
+    etag = f'W/"{day.isoformat()}-{version}-{count}"'
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        response = Response(status=304)
+    else:
+        if since is None:
+            tasks = tasks.exclude(stage="")
+        else:
+            changed_after = _EPOCH + timedelta(microseconds=since) - MANIFEST_OVERLAP
+            tasks = tasks.filter(updated_at__gt=changed_after)
+
+        entries = {"pending": [], "completed": []}
+        removed = []
+        tasks = _subscription_tasks(_order_tasks(tasks)).annotate(stage=_route_stage())
+        for task in tasks.order_by("kind", "-order__order_date", "-order__created_at", "id"):
+            if task.stage:
+                entries[task.stage].append(_manifest_entry(task))
+            elif _manifest_key(task):
+                removed.append(_manifest_key(task))
+
+        data = {
+            "date": str(day),
+            "version": version,
+            "count": count,
+            "full": since is None,
+            **entries,
+        }
+        if since is not None:
+            data["removed"] = removed
+        response = Response(data)
+
+    response["ETag"] = etag
+    return response
+
+
 def _update_order_delivery(obj, data, user):
     previous_status = obj.status
     status = data.get("status")
@@ -368,7 +352,7 @@ def delivery_update(request):
     OrderDelivery = _order_delivery_model()
     SubscriptionDelivery = _subscription_delivery_model()
     SubscriptionOrder = _subscription_order_model()
-    has_subscription_delivery_table = _model_is_queryable(SubscriptionDelivery)
+    has_subscription_delivery_table = model_is_queryable(SubscriptionDelivery)
 
     try:
         if delivery_type == "order":
@@ -187,7 +187,7 @@ def create_or_replace_order(
         order.payment_method = payment_method or order.payment_method
         order.payment_status = "pending" if initial_status == "payment_pending" else order.payment_status
         order.save(update_fields=["total_amount", "approved_total_amount", "delivery_charge", "payment_method", "payment_status"])
-        transaction.on_commit(lambda order_id=order.id: notify_admin_order_placed(CustomerOrder.objects.select_related("customer").get(pk=order_id)))
+        notify_admin_order_placed(order)
         return order
 
 
@@ -218,7 +218,7 @@ def edit_order(
         order.total_amount = total
         order.approved_total_amount = total
         order.save(update_fields=["delivery_date", "total_amount", "approved_total_amount", "delivery_charge"])
-        transaction.on_commit(lambda order_id=order.id: notify_admin_order_updated(CustomerOrder.objects.select_related("customer").get(pk=order_id)))
+        notify_admin_order_updated(order)
         return order
 
 
@@ -228,7 +228,7 @@ def delete_order(customer: Customer, order_id: int) -> bool:
         return False
     deleted, _ = CustomerOrder.objects.filter(id=order_id, customer=customer).delete()
     if deleted and existing:
-        transaction.on_commit(lambda customer_id=customer.id, deleted_order_id=order_id: notify_admin_order_deleted(Customer.objects.get(pk=customer_id), deleted_order_id))
+        notify_admin_order_deleted(customer, order_id)
     return deleted > 0
 
 
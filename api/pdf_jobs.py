@@ -0,0 +1,56 @@
+from django.shortcuts import get_object_or_404
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from milk_agency.models import PdfRenderJob
+from milk_agency.pdf_jobs import enqueue_monthly_statements, pdf_job_payload, pdf_job_response
+
+
+def wants_background_pdf(request):
+    """PDF endpoints queue the render instead of blocking when called with ?async=1."""
+    return str(request.GET.get("async", "")).strip().lower() in {"1", "true", "yes"}
+
+
+def pdf_job_accepted(request, job):
+    return Response(pdf_job_payload(job, request), status=202)
+
+
+@api_view(["GET"])
+def pdf_job_status_api(request, token):
+    job = get_object_or_404(PdfRenderJob, token=token)
+    return Response(pdf_job_payload(job, request), status=200)
+
+
+@api_view(["GET"])
+def pdf_job_download_api(request, token):
+    job = get_object_or_404(PdfRenderJob, token=token)
+    if job.status != "done":
+        return Response(pdf_job_payload(job, request), status=409)
+
+    try:
+        return pdf_job_response(job)
+    except FileNotFoundError:
+        return Response({"error": "This PDF has expired. Please request it again."}, status=410)
+
+
+@api_view(["POST"])
+def monthly_statements_queue_api(request):
+    """Queue every retailer's statement for a month; run_pdf_worker renders them in parallel."""
+    date_str = str(request.data.get("date") or "")
+    area = request.data.get("area") or None
+
+    try:
+        year, month = map(int, date_str.split("-"))
+    except ValueError:
+        return Response({"error": "date is required (YYYY-MM)"}, status=400)
+    if not 1 <= month <= 12:
+        return Response({"error": "date is required (YYYY-MM)"}, status=400)
+
+    jobs = enqueue_monthly_statements(year, month, area=area)
+    return Response(
+        {
+            "queued": len(jobs),
+            "jobs": [pdf_job_payload(job, request) for job in jobs],
+        },
+        status=202,
+    )
@@ -35,6 +35,7 @@ from .admin_stock_dashboard import *
 from .admin_customer_payments import *
 from .admin_companies import *
 from .admin_monthly_sales_summary import *
+from .pdf_jobs import *
 from .admin_category_sales import *
 from .admin_subscriptions import *
 from .admin_offers import *
@@ -47,6 +48,7 @@ from .order_creator import (
     user_delete_order,
     user_pending_orders,
 )
+from .delivery import delivery_manifest
 from .delivery import delivery_today_list
 from .delivery import delivery_update
 from .mobile_push import register_mobile_push_device, unregister_mobile_push_device
@@ -87,6 +89,7 @@ urlpatterns = [
     # Bills Management APIs
     path('bills/list/', api_list_bills, name='api_list_bills'),
     path('bills/create/', api_create_bill, name='api_create_bill'),
+    path('bills/route/', api_route_bills, name='api_route_bills'),
     path('bills/<int:bill_id>/', api_bill_detail, name='api_bill_detail'),
     path('bills/<int:bill_id>/items/', api_bill_items, name='api_bill_items'),
     path('bills/<int:bill_id>/download/', api_download_bill, name='api_download_bill'),
@@ -126,7 +129,12 @@ urlpatterns = [
     path('sales/monthly-summary/', api_monthly_sales_summary, name='api_monthly_sales_summary'),
     path('sales/monthly-summary/pdf/', monthly_summary_pdf_api, name='monthly_summary_pdf_api'),
     path('sales/monthly-summary/update-remaining-due/', update_remaining_due_api, name='update_remaining_due_api'),
+    path('sales/monthly-summary/pdf/queue/', monthly_statements_queue_api, name='monthly_statements_queue_api'),
     path('sales/category-summary/', api_sales_summary_by_category, name='api_sales_summary_by_category'),
+
+    # Background PDF renders
+    path('pdf-jobs/<uuid:token>/', pdf_job_status_api, name='pdf_job_status_api'),
+    path('pdf-jobs/<uuid:token>/download/', pdf_job_download_api, name='pdf_job_download_api'),
     
     # Subscriptions APIs
     path("subscriptions/dashboard/", api_subscription_dashboard, name="api_subscription_dashboard"),
@@ -214,5 +222,6 @@ urlpatterns = [
     path('mobile/push/unregister/', unregister_mobile_push_device, name='unregister_mobile_push_device'),
     # Delivery agent view (today's pending/completed deliveries for orders + subscriptions)
     path('delivery/today/', delivery_today_list, name='delivery_today_list'),
+    path('delivery/manifest/', delivery_manifest, name='delivery_manifest'),
     path('delivery/update/', delivery_update, name='delivery_update'),
 ]
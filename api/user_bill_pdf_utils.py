@@ -1,17 +1,13 @@
-import os
 from decimal import Decimal
 from io import BytesIO
 
-from django.conf import settings
-from django.http import HttpResponse
-from django.contrib.staticfiles import finders
 from num2words import num2words
 from reportlab.lib.pagesizes import letter, landscape
-from reportlab.lib.utils import ImageReader
 from reportlab.pdfgen import canvas
 
 from milk_agency.order_pricing import DELIVERY_ITEM_CODE
-from milk_agency.utils import InvoicePDFUtils
+from milk_agency.invoice_pdfs import cached_invoice_pdf, invoice_pdf_fingerprint, invoice_pdf_response
+from milk_agency.pdf_assets import static_image, string_width
 
 from .user_api_helpers import find_linked_order_for_bill, get_delivery_charge_for_bill
 
@@ -22,28 +18,19 @@ class UserPDFGenerator:
     def __init__(self):
         self.width, self.height = landscape(letter)
         self.margin = 20
+        self._related_orders = {}
 
     def generate_invoice_pdf(self, bill):
+        """Return the path of the stored invoice PDF, rendering it only when the bill changed."""
         bill_items = list(bill.items.all().select_related("item"))
-        display_items = [item for item in bill_items if getattr(item.item, "code", "") != DELIVERY_ITEM_CODE]
-
-        buffer = BytesIO()
-        c = canvas.Canvas(buffer, pagesize=landscape(letter))
-        self._draw_invoice_template(c, bill, bill_items, display_items)
-
-        pdf = buffer.getvalue()
-        pdf_path = InvoicePDFUtils.get_invoice_pdf_path(bill.invoice_number)
-        pdf_dir = os.path.dirname(pdf_path)
-        os.makedirs(pdf_dir, exist_ok=True)
-
-        with open(pdf_path, "wb") as pdf_file:
-            pdf_file.write(pdf)
-
-        buffer.close()
-        return pdf_path
+        fingerprint = self._fingerprint(bill, bill_items)
+        return str(cached_invoice_pdf(bill.pk, fingerprint, lambda: self._render_pdf(bill, bill_items)))
 
     def generate_and_return_pdf(self, bill, request=None):
-        bill_items = list(bill.items.all().select_related("item"))
+        pdf_path = self.generate_invoice_pdf(bill)
+        return invoice_pdf_response(pdf_path, f"{bill.invoice_number}.pdf")
+
+    def _render_pdf(self, bill, bill_items):
         display_items = [item for item in bill_items if getattr(item.item, "code", "") != DELIVERY_ITEM_CODE]
 
         buffer = BytesIO()
@@ -52,11 +39,33 @@ class UserPDFGenerator:
 
         pdf = buffer.getvalue()
         buffer.close()
+        return pdf
 
-        response = HttpResponse(content_type="application/pdf")
-        response["Content-Disposition"] = f'attachment; filename="{bill.invoice_number}.pdf"'
-        response.write(pdf)
-        return response
+    def _fingerprint(self, bill, bill_items):
+        # Everything the renderer prints goes into the fingerprint, or a stale PDF keeps being served
+        customer = bill.customer
+        order = self._get_related_order(bill)
+        return invoice_pdf_fingerprint(
+            [
+                bill.invoice_number,
+                bill.invoice_date,
+                self._money(bill.total_amount),
+                self._money(bill.op_due_amount),
+                self._money(bill.last_paid),
+            ],
+            [
+                getattr(customer, field, None)
+                for field in ("name", "shop_name", "phone", "flat_number", "area", "city", "state", "pin_code")
+            ],
+            [
+                (
+                    bi.item_id, bi.item.code, bi.item.name, self._money(bi.item.mrp), bi.quantity,
+                    self._money(bi.price_per_unit), self._money(bi.discount), self._money(bi.total_amount),
+                )
+                for bi in bill_items
+            ],
+            [order.pk, order.order_date, order.delivery_date, self._money(order.delivery_charge)] if order else None,
+        )
 
     def _money(self, value):
         return f"{Decimal(value or 0):.2f}"
@@ -91,18 +100,16 @@ class UserPDFGenerator:
         y = y_top - row_h
         c.rect(x, y, w, row_h)
 
-        logo_path = os.path.join(settings.BASE_DIR, "static", "images", "logo.webp")
-        if os.path.exists(logo_path):
+        logo = static_image("images/logo.webp")
+        if logo:
             try:
-                logo = ImageReader(logo_path)
                 c.drawImage(logo, x + 8, y + 14, width=110, height=44, mask="auto")
             except Exception:
                 pass
 
-        header_logo_path = self._resolve_static_image("images/SVD1.png")
-        if header_logo_path:
+        header_logo = static_image("images/SVD1.png")
+        if header_logo:
             try:
-                header_logo = ImageReader(header_logo_path)
                 logo_width = 64
                 logo_height = 64
                 logo_x = x + w - logo_width - 16
@@ -123,22 +130,6 @@ class UserPDFGenerator:
 
         return y
 
-    def _resolve_static_image(self, *relative_paths):
-        """Resolve a static image path for ReportLab image loading."""
-        for rel_path in relative_paths:
-            finder_path = finders.find(rel_path)
-            if finder_path:
-                return finder_path
-
-            candidate_paths = [
-                os.path.join(settings.BASE_DIR, "static", rel_path),
-                os.path.join(settings.BASE_DIR, "staticfiles", rel_path),
-            ]
-            for path in candidate_paths:
-                if os.path.exists(path):
-                    return path
-        return None
-
     def _draw_bill_heading(self, c, x, y_top, w):
         row_h = 34
         y = y_top - row_h
@@ -328,7 +319,10 @@ class UserPDFGenerator:
             c.drawString(summary_x, base_y - 74, f"Wallet Amount : {self._money(-due_amount)}")
 
     def _get_related_order(self, bill):
-        return find_linked_order_for_bill(getattr(bill, "customer", None), bill)
+        # Looked up once per bill; the header, dates and footer all need it
+        if bill.pk not in self._related_orders:
+            self._related_orders[bill.pk] = find_linked_order_for_bill(getattr(bill, "customer", None), bill)
+        return self._related_orders[bill.pk]
 
     def _get_order_dates(self, bill):
         order = self._get_related_order(bill)
@@ -351,7 +345,7 @@ class UserPDFGenerator:
 
         for word in words:
             test_line = " ".join(current_line + [word])
-            if c.stringWidth(test_line, font_name, font_size) <= max_width or not current_line:
+            if string_width(test_line, font_name, font_size) <= max_width or not current_line:
                 current_line.append(word)
             else:
                 lines.append(" ".join(current_line))
@@ -441,10 +435,9 @@ class UserPDFGenerator:
             c.drawString(right_x + 12, contact_y, line)
             contact_y -= 12
 
-        signature_path = os.path.join(settings.BASE_DIR, "static", "images", "signature.png")
-        if os.path.exists(signature_path):
+        signature = static_image("images/signature.png")
+        if signature:
             try:
-                signature = ImageReader(signature_path)
                 c.drawImage(signature, x0 + w - 150, y0 + 90, width=100, height=52, mask="auto")
             except Exception:
                 pass
@@ -1,5 +1,7 @@
 from decimal import Decimal
 
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.decorators import api_view
@@ -7,11 +9,14 @@ from rest_framework.response import Response
 
 from api.user_bill_pdf_utils import UserPDFGenerator
 from customer_portal.models import CustomerOrder, CustomerOrderItem
+from milk_agency.keyset_pagination import BILL_ORDERING, InvalidCursor, keyset_page, page_size
 from milk_agency.models import Bill, BillItem, Customer, SubscriptionPlan
 from milk_agency.order_pricing import DELIVERY_ITEM_CODE
+from milk_agency.pdf_jobs import enqueue_invoice_pdf
 from milk_agency.push_notifications import notify_admin_profile_updated
 from users.helpers import dashboard_cards, latest_bills, minimum_prebook_date, subscription_context
 
+from .pdf_jobs import pdf_job_accepted, wants_background_pdf
 from .user_api_helpers import (
     coerce_bool,
     find_linked_order_for_bill,
@@ -149,12 +154,25 @@ def user_bills_api(request):
     current_due = float(customer.get_actual_due() or 0)
     selected_month, year, month = _parse_selected_month(request.GET.get("date"))
     bills = latest_bills(customer).filter(invoice_date__year=year, invoice_date__month=month)
+    totals = bills.aggregate(total=Coalesce(Sum("total_amount"), Decimal("0.00")), count=Count("id"))
+
+    # The whole month is returned unless the app asks for pages with ?limit= or ?cursor=
+    cursors = {}
+    cursor = request.GET.get("cursor")
+    if cursor or request.GET.get("limit"):
+        try:
+            bills = keyset_page(bills, cursor, ordering=BILL_ORDERING, per_page=page_size(request.GET.get("limit"), 25))
+        except InvalidCursor:
+            return Response({"error": "Invalid cursor"}, status=400)
+        cursors = bills.cursor_data()
+
     data = [_serialize_bill_list_item(bill, current_due) for bill in bills]
-    total_amount = sum(Decimal(bill.total_amount or 0) for bill in bills)
-    average_amount = (total_amount / bills.count()) if bills else Decimal("0.00")
+    total_amount = totals["total"]
+    average_amount = (total_amount / totals["count"]) if totals["count"] else Decimal("0.00")
     return Response(
         {
             "bills": data,
+            **cursors,
             "selected_date": selected_month,
             "current_year": year,
             "current_month": month,
@@ -216,6 +234,9 @@ def user_bill_download_api(request, bill_id):
     if not bill:
         return Response({"error": "Bill not found"}, status=404)
 
+    if wants_background_pdf(request):
+        return pdf_job_accepted(request, enqueue_invoice_pdf(bill, requested_by=customer))
+
     return UserPDFGenerator().generate_and_return_pdf(bill, request)
 
 
@@ -0,0 +1,132 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import CharField, Count, DateField, DecimalField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, NullIf
+from django.utils import timezone
+
+from customer_portal.models import CustomerOrder
+from milk_agency.models import Bill, Customer, OrderDelivery
+from milk_agency.schema_capabilities import model_is_queryable
+
+# Snapshots are dropped on every bill, payment, order and delivery write; the
+# timeout only bounds staleness from writes that skip signals (QuerySet.update)
+HOME_SNAPSHOT_TIMEOUT = 15 * 60
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+ZERO = Value(Decimal("0.00"), output_field=MONEY)
+
+
+def _cache_key(customer_id, day):
+    # Keyed by day as well, so this month's figures roll over on their own
+    return f"customer_portal:home:{customer_id}:{day.isoformat()}"
+
+
+def _first_value(queryset, field, output_field):
+    return Subquery(queryset.values(field)[:1], output_field=output_field)
+
+
+def _build_home_snapshot(customer_id, today):
+    month_bills = (
+        Bill.objects.filter(
+            customer=OuterRef("pk"),
+            is_deleted=False,
+            invoice_date__year=today.year,
+            invoice_date__month=today.month,
+        )
+        .order_by()
+        .values("customer")
+    )
+    latest_order = (
+        CustomerOrder.objects.filter(customer=OuterRef("pk"))
+        .order_by("-created_at", "-id")
+        .annotate(
+            display_total=Coalesce(NullIf("approved_total_amount", ZERO), "total_amount", ZERO, output_field=MONEY)
+            + Coalesce("delivery_charge", ZERO, output_field=MONEY)
+        )
+    )
+    annotations = {
+        "monthly_invoice_count": Coalesce(
+            Subquery(month_bills.annotate(count=Count("id")).values("count"), output_field=IntegerField()), 0
+        ),
+        "monthly_spend": Coalesce(
+            Subquery(month_bills.annotate(total=Sum("total_amount")).values("total"), output_field=MONEY),
+            ZERO,
+            output_field=MONEY,
+        ),
+        "latest_order_number": _first_value(latest_order, "order_number", CharField()),
+        "latest_order_status": _first_value(latest_order, "status", CharField()),
+        "latest_order_date": _first_value(latest_order, "order_date", DateField()),
+        "latest_order_total": _first_value(latest_order, "display_total", MONEY),
+    }
+    has_order_delivery_table = model_is_queryable(OrderDelivery)
+    if has_order_delivery_table:
+        latest_delivery = OrderDelivery.objects.filter(order__customer=OuterRef("pk")).order_by("-updated_at")
+        annotations["latest_delivery_status"] = _first_value(latest_delivery, "status", CharField())
+        annotations["latest_delivery_order_number"] = _first_value(latest_delivery, "order__order_number", CharField())
+
+    row = (
+        Customer.objects.filter(pk=customer_id)
+        .with_actual_due()
+        .annotate(**annotations)
+        .values("actual_due", *annotations)
+        .first()
+    )
+
+    latest_order = None
+    if row["latest_order_number"] is not None:
+        latest_order = {
+            "order_number": row["latest_order_number"],
+            "status": row["latest_order_status"],
+            "order_date": row["latest_order_date"],
+            "display_total_amount": Decimal(row["latest_order_total"] or 0),
+        }
+    latest_delivery = None
+    if has_order_delivery_table and row["latest_delivery_status"] is not None:
+        latest_delivery = {
+            "status": row["latest_delivery_status"],
+            "order": {"order_number": row["latest_delivery_order_number"]},
+        }
+    return {
+        "actual_due": Decimal(row["actual_due"] or 0),
+        "monthly_invoice_count": row["monthly_invoice_count"],
+        "monthly_spend": Decimal(row["monthly_spend"] or 0),
+        "latest_order": latest_order,
+        "latest_delivery": latest_delivery,
+    }
+
+
+def get_home_snapshot(customer_id, today=None):
+    """
+    The customer portal home page's figures for one customer: dues, this
+    month's bills, and the latest order and delivery.
+
+    Served from the cache, or built with one query on a miss. Orders and
+    deliveries are plain dicts, so snapshots pickle small and read the same
+    in templates.
+    """
+    today = today or timezone.localdate()
+    key = _cache_key(customer_id, today)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = _build_home_snapshot(customer_id, today)
+        cache.set(key, snapshot, HOME_SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+def invalidate_home_snapshot(*customer_ids):
+    """
+    Drop today's snapshots for the given customers once the current
+    transaction commits; dropping them earlier would let a page rendered
+    before the commit cache the old figures again.
+    """
+    customer_ids = {customer_id for customer_id in customer_ids if customer_id}
+    if not customer_ids:
+        return
+
+    def drop():
+        today = timezone.localdate()
+        cache.delete_many([_cache_key(customer_id, today) for customer_id in customer_ids])
+
+    transaction.on_commit(drop)
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer_portal', '0015_delete_customergatewaypayment'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customerorder',
+            index=models.Index(fields=['delivery_date', '-order_date', '-id'], name='customer_po_deliver_4665a9_idx'),
+        ),
+    ]
@@ -46,6 +46,10 @@ class CustomerOrder(models.Model):
         verbose_name = 'Customer Order'
         verbose_name_plural = 'Customer Orders'
         ordering = ['-order_date']
+        indexes = [
+            models.Index(fields=['delivery_date', '-order_date', '-id']),
+            models.Index(fields=['status', '-delivery_date']),
+        ]
 
     def __str__(self):
         return f"Order {self.order_number} - {self.customer.name}"
@@ -3,7 +3,7 @@ from django.contrib import messages
 from django.contrib.messages import get_messages
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
-from django.db import OperationalError, ProgrammingError, transaction
+from django.db import transaction
 from django.db.models import DecimalField, Sum
 from django.db.models.functions import Coalesce
 from django.http import JsonResponse
@@ -20,12 +20,9 @@ from milk_agency.models import (
     Bill,
     Customer,
     CustomerPayment,
-    CustomerSubscription,
     Item,
-    Offers,
-    OrderDelivery,
-    SubscriptionOrder,
 )
+from milk_agency.media_index import resolve_image_urls
 from milk_agency.order_pricing import DELIVERY_ITEM_CODE, get_customer_unit_price, get_delivery_charge_amount
 from milk_agency.paytm import (
     initiate_paytm_transaction,
@@ -41,6 +38,7 @@ from milk_agency.push_notifications import notify_admin_order_placed, notify_adm
 
 
 from .models import CustomerOrder, CustomerOrderItem
+from .home_snapshot import get_home_snapshot
 
 
 def _find_linked_customer_order_for_bill(bill):
@@ -131,34 +129,11 @@ def _record_gateway_due_payment(customer, bill, amount, *, transaction_id, payme
 
         customer.due = customer.get_actual_due()
         customer.save(update_fields=["due"])
+        notify_admin_payment_recorded(payment)
 
-    transaction.on_commit(lambda payment_id=payment.id: notify_admin_payment_recorded(CustomerPayment.objects.select_related("customer").get(pk=payment_id)))
     return payment
 
 
-def _safe_first(queryset):
-    try:
-        return queryset.first()
-    except (OperationalError, ProgrammingError):
-        return None
-
-
-def _safe_list(queryset, limit=None):
-    try:
-        if limit is not None:
-            return list(queryset[:limit])
-        return list(queryset)
-    except (OperationalError, ProgrammingError):
-        return []
-
-
-def _safe_count(queryset):
-    try:
-        return queryset.count()
-    except (OperationalError, ProgrammingError):
-        return 0
-
-
 def _customer_delivery_address(customer):
     return ", ".join(
         filter(
@@ -278,51 +253,8 @@ def login_view(request):
 def home(request):
     customer = request.user
     today = timezone.localdate()
-    account_offer_type = "user" if getattr(customer, "user_type", "").lower() == "user" else "retailer"
-    current_month_bills = Bill.objects.filter(
-        customer=customer,
-        is_deleted=False,
-        invoice_date__year=today.year,
-        invoice_date__month=today.month,
-    ).order_by("-invoice_date")
-    monthly_invoice_count = _safe_count(current_month_bills)
-    monthly_spend = sum(Decimal(bill.total_amount or 0) for bill in current_month_bills)
-    latest_order = (
-        CustomerOrder.objects.filter(customer=customer)
-        .order_by("-created_at", "-id")
-        .first()
-    )
-    if latest_order:
-        latest_order.display_total_amount = Decimal(
-            latest_order.approved_total_amount or latest_order.total_amount or 0
-        ) + Decimal(latest_order.delivery_charge or 0)
-
-    active_subscription = _safe_first(
-        CustomerSubscription.objects.filter(customer=customer, is_active=True, end_date__gte=today)
-        .select_related("subscription_plan")
-        .order_by("end_date")
-    )
-    next_subscription_delivery = _safe_first(
-        SubscriptionOrder.objects.filter(customer=customer, date__gte=today)
-        .select_related("item", "delivery_tracking")
-        .order_by("date", "id")
-    )
-    latest_delivery = _safe_first(
-        OrderDelivery.objects.filter(order__customer=customer)
-        .select_related("order")
-        .order_by("-updated_at")
-    )
-    active_offers = _safe_list(
-        Offers.objects.filter(
-            offer_for=account_offer_type,
-            is_active=True,
-            start_date__lte=today,
-            end_date__gte=today,
-        ).order_by("end_date", "name"),
-        limit=3,
-    )
-
-    actual_due = Decimal(customer.get_actual_due() or 0)
+    snapshot = get_home_snapshot(customer.pk, today)
+    actual_due = snapshot["actual_due"]
     outstanding_due = actual_due if actual_due > 0 else Decimal("0.00")
     wallet_balance = abs(actual_due) if actual_due < 0 else Decimal("0.00")
 
@@ -343,15 +275,10 @@ def home(request):
         "actual_due": actual_due,
         "outstanding_due": outstanding_due,
         "wallet_balance": wallet_balance,
-        "monthly_invoice_count": monthly_invoice_count,
-        "monthly_spend": monthly_spend,
-        "latest_bill": _safe_first(current_month_bills),
-        "latest_order": latest_order,
-        "active_subscription": active_subscription,
-        "next_subscription_delivery": next_subscription_delivery,
-        "latest_delivery": latest_delivery,
-        "active_offers": active_offers,
-        "account_offer_type": account_offer_type,
+        "monthly_invoice_count": snapshot["monthly_invoice_count"],
+        "monthly_spend": snapshot["monthly_spend"],
+        "latest_order": snapshot["latest_order"],
+        "latest_delivery": snapshot["latest_delivery"],
         "profile_completion": profile_completion,
         "primary_address": ", ".join(
             filter(None, [customer.flat_number, customer.area, customer.city, customer.state, customer.pin_code])
@@ -405,7 +332,7 @@ def customer_orders_dashboard(request):
             order.delivery_charge = get_delivery_charge_amount(customer=request.user, address=order.delivery_address)
             order.total_amount = total_amount
             order.save()
-            transaction.on_commit(lambda order_id=order.id: notify_admin_order_placed(CustomerOrder.objects.select_related("customer").get(pk=order_id)))
+            notify_admin_order_placed(order)
 
             return JsonResponse({'success': True, 'order_number': order_number})
 
@@ -413,6 +340,7 @@ def customer_orders_dashboard(request):
             return JsonResponse({'success': False, 'message': str(e)})
 
     items = Item.objects.select_related("company").filter(company__name__iexact="Dodla")
+    resolve_image_urls(items)
 
     for item in items:
         item.display_price = get_customer_unit_price(item, request.user)
@@ -519,7 +447,7 @@ def place_order(request):
         order.delivery_charge = get_delivery_charge_amount(customer=customer, address=order.delivery_address)
         order.approved_total_amount = total_amount
         order.save()
-        transaction.on_commit(lambda order_id=order.id: notify_admin_order_placed(CustomerOrder.objects.select_related("customer").get(pk=order_id)))
+        notify_admin_order_placed(order)
 
         return JsonResponse({"success": True, "order_number": order_number})
 
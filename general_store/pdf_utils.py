@@ -4,11 +4,11 @@ from decimal import Decimal
 from io import BytesIO
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
 from num2words import num2words
-from django.contrib.staticfiles import finders
 from django.http import HttpResponse
 
+from milk_agency.pdf_assets import static_image, string_width
+
 from .models import SaleItem
 
 class PDFGenerator:
@@ -17,8 +17,8 @@ class PDFGenerator:
     def __init__(self):
         self.width, self.height = letter
 
-    def generate_sale_pdf(self, sale):
-        """Generate sale PDF and save to file system"""
+    def render_sale_pdf(self, sale):
+        """Render the sale invoice and return the PDF bytes"""
         sale_items = SaleItem.objects.filter(sale=sale).select_related('product')
 
         buffer = BytesIO()
@@ -26,8 +26,17 @@ class PDFGenerator:
 
         self._draw_invoice_template(c, sale, sale_items)
 
-        # Save PDF
         pdf = buffer.getvalue()
+        buffer.close()
+        return pdf
+
+    def sale_pdf_filename(self, sale):
+        return f"invoice_{sale.invoice_number}.pdf"
+
+    def generate_sale_pdf(self, sale):
+        """Generate sale PDF and save to file system"""
+        # Save PDF
+        pdf = self.render_sale_pdf(sale)
         pdf_path = f"media/sales/invoices/{sale.invoice_number}.pdf"
 
         pdf_dir = os.path.dirname(pdf_path)
@@ -36,23 +45,14 @@ class PDFGenerator:
         with open(pdf_path, 'wb') as f:
             f.write(pdf)
 
-        buffer.close()
         return pdf_path
 
     def generate_and_return_pdf(self, sale, request=None):
         """Generate PDF and return as HTTP response"""
-        sale_items = SaleItem.objects.filter(sale=sale).select_related('product')
-
-        buffer = BytesIO()
-        c = canvas.Canvas(buffer, pagesize=letter)
-
-        self._draw_invoice_template(c, sale, sale_items)
-
-        pdf = buffer.getvalue()
-        buffer.close()
+        pdf = self.render_sale_pdf(sale)
 
         response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename=invoice_{sale.invoice_number}.pdf'
+        response['Content-Disposition'] = f'attachment; filename={self.sale_pdf_filename(sale)}'
         response.write(pdf)
 
         return response
@@ -99,10 +99,9 @@ class PDFGenerator:
         c.drawString(40, height - 95, "Phone: 9392890375")
 
         # Logo
-        logo_path = finders.find('images/SVD.png')
-        if logo_path and os.path.exists(logo_path):
+        logo = static_image('images/SVD.png')
+        if logo:
             try:
-                logo = ImageReader(logo_path)
                 c.drawImage(logo, 280, height - 110, width=80, height=80, mask='auto')
             except Exception as e:
                 pass
@@ -228,11 +227,10 @@ class PDFGenerator:
         """Draw signature"""
         footer_y = 60
 
-        signature_path = finders.find('images/N. Ramesh.png')
+        signature = static_image('images/N. Ramesh.png')
 
-        if signature_path and os.path.exists(signature_path):
+        if signature:
             try:
-                signature = ImageReader(signature_path)
                 c.saveState()
                 c.translate(width - 200, footer_y + 80)
                 c.drawImage(signature, 0, 0, width=100, height=100, mask='auto')
@@ -263,6 +261,6 @@ class PDFGenerator:
         # Center-align "Thank you for your business!"
         c.setFont("Helvetica-Bold", 9)
         thank_you_text = "Thank you for your business!"
-        text_width = c.stringWidth(thank_you_text, "Helvetica-Bold", 9)
+        text_width = string_width(thank_you_text, "Helvetica-Bold", 9)
         x_center = (width - text_width) / 2
         c.drawString(x_center, footer_y - 10, thank_you_text)
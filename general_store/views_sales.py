@@ -1,9 +1,13 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.http import JsonResponse
 from django.db import transaction
 from django.utils import timezone
 from decimal import Decimal
+from api.pdf_jobs import wants_background_pdf
+from milk_agency.pdf_jobs import enqueue_sale_pdf, pdf_job_payload
+
 from .models import Product, Sale, SaleItem, Customer
 
 
@@ -209,6 +213,11 @@ def generate_sale_pdf(request, pk):
     Generate sale PDF and return as download
     """
     sale = get_object_or_404(Sale, pk=pk)
+    if wants_background_pdf(request):
+        # Rendered by run_pdf_worker; poll status_url until download_url appears
+        job = enqueue_sale_pdf(sale, requested_by=request.user)
+        return JsonResponse(pdf_job_payload(job, request), status=202)
+
     from .pdf_utils import PDFGenerator
     pdf_generator = PDFGenerator()
     response = pdf_generator.generate_and_return_pdf(sale, request)
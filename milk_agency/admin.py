@@ -1,6 +1,29 @@
 from django.contrib import admin
-from .models import Company, StockInEntry
+from .models import Company, Item, StockInEntry, StockMovement
 
 # Register your models here.
 admin.site.register(Company)
 admin.site.register(StockInEntry)
+
+
+@admin.register(Item)
+class ItemAdmin(admin.ModelAdmin):
+    list_display = ('code', 'name', 'category', 'liters_per_unit', 'liters_per_unit_override')
+    list_filter = ('category', 'liters_per_unit_override')
+    list_editable = ('liters_per_unit', 'liters_per_unit_override')
+    search_fields = ('code', 'name')
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'item', 'quantity', 'reason', 'bill', 'stock_entry', 'leakage', 'note')
+    list_filter = ('reason',)
+    search_fields = ('item__code', 'item__name', 'note')
+    raw_id_fields = ('item', 'bill', 'stock_entry', 'leakage')
+
+    def has_change_permission(self, request, obj=None):
+        # The ledger is append-only; corrections are new movements
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
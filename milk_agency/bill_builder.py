@@ -0,0 +1,274 @@
+from decimal import Decimal, InvalidOperation, ROUND_UP
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .invoice_numbers import allocate_invoice_numbers
+from .models import Bill, BillItem, Customer, CustomerLedger, CustomerMonthlyCommission, Item
+from .pdf_jobs import queue_invoice_pdfs
+from .stock_ledger import apply_stock_movements, stock_movement
+
+
+def selling_price(item, customer=None):
+    return Decimal(str(item.selling_price))
+
+
+def parse_bill_rows(item_ids, quantities, discounts=()):
+    """
+    Zip posted item/quantity/discount lists into (item_id, quantity, discount) rows.
+
+    Blank items and non-positive quantities are skipped, as the bill forms
+    always have; malformed numbers raise ValueError.
+    """
+    rows = []
+    for i, item_id in enumerate(item_ids):
+        if not item_id:
+            continue
+
+        raw_quantity = quantities[i] if i < len(quantities) else None
+        quantity = int(raw_quantity) if raw_quantity else 0
+        if quantity <= 0:
+            continue
+
+        raw_discount = discounts[i] if discounts and i < len(discounts) else None
+        try:
+            discount = Decimal(str(raw_discount)) if raw_discount else Decimal("0")
+        except InvalidOperation:
+            raise ValueError(f"Invalid discount {raw_discount!r}.")
+
+        rows.append((int(item_id), quantity, discount))
+    return rows
+
+
+def price_bill_lines(rows, *, customer=None, unit_price=selling_price, items=None):
+    """
+    Price parsed rows into bill lines with a single in_bulk item fetch.
+
+    ``unit_price(item, customer)`` picks the price per unit; ``items`` is an
+    optional {id: Item} map so batch billing can share one lookup across bills.
+    """
+    if items is None:
+        items = Item.objects.in_bulk({item_id for item_id, _, _ in rows})
+
+    lines = []
+    for item_id, quantity, discount in rows:
+        item = items.get(item_id)
+        if item is None:
+            raise Item.DoesNotExist(f"Item with ID {item_id} not found.")
+
+        price = unit_price(item, customer)
+        lines.append({
+            "item": item,
+            "quantity": quantity,
+            "price": price,
+            "discount": discount,
+            "total": (price * quantity) - (discount * quantity),
+            "profit": ((price - Decimal(str(item.buying_price))) * quantity) - (discount * quantity),
+        })
+    return lines
+
+
+def delivery_charge_line(delivery_item, amount):
+    """A one-unit service line; it carries no stock."""
+    return {
+        "item": delivery_item,
+        "quantity": 1,
+        "price": amount,
+        "discount": Decimal("0"),
+        "total": amount,
+        "profit": amount,
+        "track_stock": False,
+    }
+
+
+def bill_line_totals(lines):
+    """Return (total, profit) for a list of bill lines."""
+    total = sum((line["total"] for line in lines), Decimal("0"))
+    profit = sum((line["profit"] for line in lines), Decimal("0"))
+    return total, profit
+
+
+def bill_items_for(bill, lines):
+    return [
+        BillItem(
+            bill=bill,
+            item=line["item"],
+            price_per_unit=line["price"],
+            discount=line["discount"],
+            quantity=line["quantity"],
+            total_amount=line["total"],
+        )
+        for line in lines
+    ]
+
+
+def stock_movements_for(bill, lines):
+    return [
+        stock_movement(line["item"].pk, -line["quantity"], "bill", bill=bill)
+        for line in lines
+        if line.get("track_stock", True)
+    ]
+
+
+def save_bill_lines(bill, lines):
+    """
+    Insert a saved bill's lines and take them out of stock.
+
+    BillItems go in with one bulk_create and stock moves in one UPDATE.
+    bulk_create skips the BillItem signals, so callers must save the bill's
+    totals afterwards (which refreshes the ledger and monthly rollup).
+    Returns (total, profit).
+    """
+    BillItem.objects.bulk_create(bill_items_for(bill, lines), batch_size=500)
+    apply_stock_movements(stock_movements_for(bill, lines))
+    return bill_line_totals(lines)
+
+
+def apply_bill_totals(bill, total, profit, commission=None):
+    """
+    Round the bill total up to the rupee and deduct an unpaid monthly
+    commission, as the counter billing screen always has. The commission row
+    is marked deducted; the bill itself is left unsaved.
+    """
+    rounded_total = total.quantize(Decimal("1"), rounding=ROUND_UP)
+
+    if commission and rounded_total > 0:
+        bill.total_amount = max(rounded_total - commission.commission_amount, Decimal("0"))
+        bill.commission_deducted = commission.commission_amount
+        bill.commission_month = commission.month
+        bill.commission_year = commission.year
+
+        commission.status = True
+        commission.save(update_fields=["status"])
+    else:
+        bill.total_amount = rounded_total
+
+    bill.profit = profit
+    return bill
+
+
+def finalize_bill(bill, total, profit, commission=None):
+    """apply_bill_totals() and save the bill."""
+    apply_bill_totals(bill, total, profit, commission)
+    bill.save()
+    return bill
+
+
+def refresh_cached_due(customer_ids):
+    """
+    Copy the incrementally maintained CustomerLedger balance into Customer.due.
+
+    One UPDATE for any number of customers, instead of re-aggregating each
+    customer's bill and payment history with get_actual_due().
+    """
+    customer_ids = {customer_id for customer_id in customer_ids if customer_id}
+    if not customer_ids:
+        return 0
+    return Customer.objects.filter(pk__in=customer_ids).update(
+        due=Coalesce(
+            Subquery(CustomerLedger.objects.filter(customer_id=OuterRef("pk")).values("balance")[:1]),
+            F("due"),
+        )
+    )
+
+
+def create_route_bills(entries, *, invoice_date=None, unit_price=selling_price):
+    """
+    Bill many customers in one transaction, as the counter screen would bill each.
+
+    ``entries`` is a list of {"customer_id", "rows"} with rows from
+    parse_bill_rows(), priced with ``unit_price`` as in price_bill_lines(). Items and unpaid commissions are looked up once for the
+    whole batch, invoice numbers are reserved as one block, BillItems go in
+    with one bulk_create and stock moves in one UPDATE. Entries that cannot be
+    billed (unknown customer or item, nothing to bill, customer repeated) are
+    reported and skipped; the rest are created together.
+
+    Returns one result dict per entry, in order.
+    """
+    invoice_date = invoice_date or timezone.localdate()
+    customer_ids = {entry["customer_id"] for entry in entries}
+    customers = Customer.objects.in_bulk(customer_ids)
+    items = Item.objects.in_bulk({item_id for entry in entries for item_id, _, _ in entry["rows"]})
+
+    results = []
+    planned = []
+    seen = set()
+    for entry in entries:
+        customer = customers.get(entry["customer_id"])
+        result = {
+            "customer_id": entry["customer_id"],
+            "customer": customer.name if customer else None,
+            "success": False,
+            "bill_id": None,
+            "invoice_number": None,
+            "total_amount": None,
+            "error": None,
+        }
+        results.append(result)
+
+        if customer is None:
+            result["error"] = "Customer not found."
+            continue
+        if customer.pk in seen:
+            result["error"] = "Customer appears more than once in this batch."
+            continue
+        seen.add(customer.pk)
+
+        try:
+            lines = price_bill_lines(entry["rows"], customer=customer, unit_price=unit_price, items=items)
+        except Item.DoesNotExist as e:
+            result["error"] = str(e)
+            continue
+
+        total, profit = bill_line_totals(lines)
+        if total <= 0:
+            result["error"] = "No valid items in bill."
+            continue
+
+        planned.append((result, customer, lines, total, profit))
+
+    if not planned:
+        return results
+
+    with transaction.atomic():
+        commissions = {}
+        for commission in CustomerMonthlyCommission.objects.select_for_update().filter(
+            customer_id__in=[customer.pk for _, customer, _, _, _ in planned], status=False
+        ):
+            # Same pick as generate_bill: the first row in the model's ordering
+            commissions.setdefault(commission.customer_id, commission)
+
+        invoice_numbers = allocate_invoice_numbers(len(planned))
+        bill_items = []
+        movements = []
+        for (result, customer, lines, total, profit), invoice_number in zip(planned, invoice_numbers):
+            bill = Bill(
+                customer=customer,
+                invoice_number=invoice_number,
+                invoice_date=invoice_date,
+                op_due_amount=customer.due,
+                last_paid=Decimal("0"),
+            )
+            apply_bill_totals(bill, total, profit, commissions.get(customer.pk))
+            bill.save()
+
+            bill_items.extend(bill_items_for(bill, lines))
+            movements.extend(stock_movements_for(bill, lines))
+            result.update(
+                success=True,
+                bill_id=bill.pk,
+                invoice_number=bill.invoice_number,
+                total_amount=bill.total_amount,
+            )
+
+        BillItem.objects.bulk_create(bill_items, batch_size=500)
+        apply_stock_movements(movements)
+
+        # The monthly rollups queued by the bill saves are rebuilt on commit, after these items
+        refresh_cached_due([customer.pk for _, customer, _, _, _ in planned])
+
+        queue_invoice_pdfs([result["bill_id"] for result, _, _, _, _ in planned])
+
+    return results
@@ -0,0 +1,244 @@
+import csv
+import io
+import re
+import zipfile
+from datetime import date
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.db.models import Q
+
+from .models import BillItem
+
+BILL_EXPORT_CHUNK_SIZE = 2000
+
+# (header, BillItem lookup); one row per bill line, carrying its bill, customer and item
+BILL_EXPORT_COLUMNS = [
+    ("Invoice Number", "bill__invoice_number"),
+    ("Invoice Date", "bill__invoice_date"),
+    ("Customer ID", "bill__customer_id"),
+    ("Customer", "bill__customer__name"),
+    ("Shop", "bill__customer__shop_name"),
+    ("Retailer ID", "bill__customer__retailer_id"),
+    ("Area", "bill__customer__area"),
+    ("Phone", "bill__customer__phone"),
+    ("Item Code", "item__code"),
+    ("Item", "item__name"),
+    ("Category", "item__category"),
+    ("Quantity", "quantity"),
+    ("Price Per Unit", "price_per_unit"),
+    ("Discount", "discount"),
+    ("Line Total", "total_amount"),
+    ("Bill Total", "bill__total_amount"),
+    ("Opening Due", "bill__op_due_amount"),
+    ("Paid", "bill__last_paid"),
+    ("Commission Deducted", "bill__commission_deducted"),
+    ("Profit", "bill__profit"),
+]
+
+# Rows buffered into each chunk handed to the response, so the client is not sent one tiny write per row
+ROWS_PER_CHUNK = 500
+
+
+def bill_export_rows(*, customer_id=None, area=None, start_date=None, end_date=None, chunk_size=BILL_EXPORT_CHUNK_SIZE):
+    """
+    Yield one tuple per line of every active bill matching the filters, in
+    BILL_EXPORT_COLUMNS order.
+
+    Rows are read in keyset batches of chunk_size on (invoice date, bill,
+    line), each a plain LIMIT query, so memory stays flat however long the
+    range is and no cursor has to outlive a transaction behind the pooler.
+    """
+    items = BillItem.objects.filter(bill__is_deleted=False)
+    if customer_id:
+        items = items.filter(bill__customer_id=customer_id)
+    if area:
+        items = items.filter(bill__customer__area=area)
+    if start_date:
+        items = items.filter(bill__invoice_date__gte=start_date)
+    if end_date:
+        items = items.filter(bill__invoice_date__lte=end_date)
+
+    # The keyset columns ride along after the exported ones and are sliced off
+    items = items.order_by("bill__invoice_date", "bill_id", "id").values_list(
+        *[lookup for _, lookup in BILL_EXPORT_COLUMNS], "bill__invoice_date", "bill_id", "id"
+    )
+    width = len(BILL_EXPORT_COLUMNS)
+    batch = list(items[:chunk_size])
+    while batch:
+        for row in batch:
+            yield row[:width]
+        if len(batch) < chunk_size:
+            break
+        invoice_date, bill_id, item_id = batch[-1][width:]
+        batch = list(
+            items.filter(
+                Q(bill__invoice_date__gt=invoice_date)
+                | Q(bill__invoice_date=invoice_date, bill_id__gt=bill_id)
+                | Q(bill__invoice_date=invoice_date, bill_id=bill_id, id__gt=item_id)
+            )[:chunk_size]
+        )
+
+
+def bill_export_filename(extension, start_date=None, end_date=None):
+    span = "_".join(d.isoformat() for d in (start_date, end_date) if d) or "all"
+    return f"bills_{span}.{extension}"
+
+
+def csv_export_chunks(rows):
+    """Encode rows as CSV text, a header first, in chunks of ROWS_PER_CHUNK rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([header for header, _ in BILL_EXPORT_COLUMNS])
+
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(["" if value is None else value for value in row])
+        if count % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+class _ZipSink:
+    """Write-only file for zipfile; whatever it is given is drained by the generator feeding the response."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+_XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Bills" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+        'Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # Style 1 is the built-in d-mmm-yy date format, used for invoice dates
+    "xl/styles.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+        '<borders count="1"><border/></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="2">'
+        '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="15" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '</cellXfs>'
+        '</styleSheet>'
+    ),
+}
+
+_EXCEL_EPOCH = date(1899, 12, 30)
+_XML_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _text_cell(value):
+    text = escape(_XML_ILLEGAL.sub("", str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _number_cell(value):
+    return f"<c><v>{value}</v></c>"
+
+
+# Looked up by exact type: the column types are fixed, and this is the per-cell hot path
+_XLSX_CELLS = {
+    type(None): lambda value: "<c/>",
+    bool: lambda value: f'<c t="b"><v>{int(value)}</v></c>',
+    int: _number_cell,
+    float: _number_cell,
+    Decimal: _number_cell,
+    date: lambda value: f'<c s="1"><v>{(value - _EXCEL_EPOCH).days}</v></c>',
+    str: _text_cell,
+}
+
+
+def _xlsx_row(values):
+    return "<row>" + "".join([_XLSX_CELLS.get(type(value), _text_cell)(value) for value in values]) + "</row>"
+
+
+def xlsx_export_chunks(rows):
+    """
+    Encode rows as a single-sheet XLSX workbook, yielding the zip as it is
+    written. Cells are inline strings and numbers, so nothing is held back
+    for a shared-strings table.
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_PARTS.items():
+            archive.writestr(name, content)
+        yield sink.drain()
+
+        with archive.open("xl/worksheets/sheet1.xml", "w") as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b'<sheetViews><sheetView workbookViewId="0">'
+                b'<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+                b'</sheetView></sheetViews><sheetData>'
+            )
+            sheet.write(_xlsx_row([header for header, _ in BILL_EXPORT_COLUMNS]).encode())
+
+            batch = []
+            for row in rows:
+                batch.append(_xlsx_row(row))
+                if len(batch) == ROWS_PER_CHUNK:
+                    sheet.write("".join(batch).encode())
+                    batch.clear()
+                    yield sink.drain()
+            sheet.write("".join(batch).encode())
+            sheet.write(b"</sheetData></worksheet>")
+    yield sink.drain()
+
+
+BILL_EXPORT_FORMATS = {
+    "csv": (csv_export_chunks, "text/csv"),
+    "xlsx": (xlsx_export_chunks, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
@@ -7,7 +7,9 @@ from django.db.models import Q
 from django.db.models import Sum, DecimalField
 from django.db.models.functions import Coalesce
 from django.db import transaction
+from django.utils.http import urlencode
 
+from .keyset_pagination import PAYMENT_ORDERING, InvalidCursor, keyset_page
 from .models import CustomerPayment
 # from .paytm import successful_payments_q  # moved to utils or inline
 
@@ -42,7 +44,7 @@ def customer_payments(request):
     customer_filter = request.GET.get('customer', '').strip()
     transaction_id_filter = request.GET.get('transaction_id', '').strip()
 
-    payments = CustomerPayment.objects.all().order_by('-created_at')
+    payments = CustomerPayment.objects.select_related('customer')
 
     if customer_filter:
         payments = payments.filter(
@@ -53,10 +55,20 @@ def customer_payments(request):
     if transaction_id_filter:
         payments = payments.filter(transaction_id__icontains=transaction_id_filter)
 
+    try:
+        payments = keyset_page(payments, request.GET.get('cursor'), ordering=PAYMENT_ORDERING, per_page=50)
+    except InvalidCursor:
+        payments = keyset_page(payments, ordering=PAYMENT_ORDERING, per_page=50)
+
     context = {
         'payments': payments,
         'customer_filter': customer_filter,
         'transaction_id_filter': transaction_id_filter,
+        'filter_query': urlencode({
+            key: value for key, value in (
+                ('customer', customer_filter), ('transaction_id', transaction_id_filter)
+            ) if value
+        }),
     }
 
     return render(request, 'milk_agency/customer_payments.html', context)
@@ -0,0 +1,87 @@
+from django.db.models import Q
+
+# Every raw status a CustomerOrder or its OrderDelivery row is saved with
+ORDER_RAW_STATUSES = (
+    "payment_pending",
+    "pending",
+    "confirmed",
+    "processing",
+    "ready",
+    "out_for_delivery",
+    "delivered",
+    "failed",
+    "cancelled",
+    "rejected",
+)
+
+DELIVERY_DASHBOARD_PAGE_SIZE = 25
+
+
+def _raw_statuses(present_status, status):
+    """The raw statuses that present_status() shows as ``status``."""
+    return [raw for raw in ORDER_RAW_STATUSES if present_status(raw) == status]
+
+
+def _search_q(text, fields):
+    condition = Q()
+    for field in fields:
+        condition |= Q(**{f"{field}__icontains": text})
+    return condition
+
+
+# Section membership for DeliveryTask rows. An order is on the route while its
+# own status or its tracking row's says so, unless the order itself is closed.
+ORDER_PENDING_STATUSES = ("pending", "confirmed", "processing", "ready")
+ORDER_PENDING_TRACKING_STATUSES = ("pending", "out_for_delivery", "failed")
+ORDER_CLOSED_STATUSES = ("rejected", "cancelled", "delivered")
+SUBSCRIPTION_PENDING_STATUSES = ("pending", "out_for_delivery")
+
+
+def pending_orders_q(statuses=ORDER_PENDING_STATUSES):
+    return (
+        Q(kind="order")
+        & (Q(source_status__in=statuses) | Q(tracking_status__in=ORDER_PENDING_TRACKING_STATUSES))
+        & ~Q(source_status__in=ORDER_CLOSED_STATUSES)
+    )
+
+
+def delivered_orders_q():
+    return Q(kind="order") & (Q(source_status="delivered") | Q(tracking_status="delivered"))
+
+
+def pending_subscriptions_q(statuses=SUBSCRIPTION_PENDING_STATUSES):
+    return Q(kind="subscription", tracking_status__in=statuses)
+
+
+def delivered_subscriptions_q():
+    return Q(kind="subscription", tracking_status="delivered")
+
+
+def filter_delivery_tasks(tasks, filters, *, kind, search_fields, present_status=None):
+    """
+    Narrow a DeliveryTask queryset of one kind by the delivery dashboard filters.
+
+    Stage and status match the status as the dashboard shows it,
+    present_status(raw) for orders. Each one becomes a condition on the raw
+    statuses that are shown that way, so the database does the filtering.
+    """
+    if filters["kind"] not in ("all", kind):
+        return tasks.none()
+
+    def shown_as(status):
+        return _raw_statuses(present_status, status) if present_status else [status]
+
+    delivered = shown_as("delivered")
+    if filters["stage"] == "pending":
+        tasks = tasks.exclude(status__in=delivered)
+    elif filters["stage"] == "delivered":
+        tasks = tasks.filter(status__in=delivered)
+    if filters["status"] != "all":
+        tasks = tasks.filter(status__in=shown_as(filters["status"]))
+    if filters["date"]:
+        tasks = tasks.filter(date=filters["date"])
+    if filters.get("area"):
+        tasks = tasks.filter(area__iexact=filters["area"])
+    if filters["q"]:
+        tasks = tasks.filter(_search_q(filters["q"], search_fields))
+    return tasks
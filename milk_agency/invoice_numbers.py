@@ -0,0 +1,37 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .models import InvoiceSequence
+
+INVOICE_PREFIX = "INV"
+
+
+def _format_invoice_number(day, number):
+    return f"{INVOICE_PREFIX}-{day:%Y%m%d}-{number:05d}"
+
+
+def allocate_invoice_numbers(count):
+    """
+    Reserve ``count`` consecutive invoice numbers for today.
+
+    The day's InvoiceSequence row is locked for the rest of the caller's
+    transaction, so concurrent bills never share a number and a rolled-back
+    bill releases its number again. Batch jobs should reserve their whole block
+    in one call.
+    """
+    if count <= 0:
+        return []
+
+    today = timezone.localdate()
+    with transaction.atomic():
+        sequence, _ = InvoiceSequence.objects.select_for_update().get_or_create(date=today)
+        first = sequence.last_number + 1
+        sequence.last_number += count
+        sequence.save(update_fields=["last_number"])
+
+    return [_format_invoice_number(today, number) for number in range(first, first + count)]
+
+
+def allocate_invoice_number():
+    """Reserve a single invoice number for today."""
+    return allocate_invoice_numbers(1)[0]
@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+
+# Bump when the invoice layout changes so stored PDFs are re-rendered
+INVOICE_PDF_LAYOUT_VERSION = 1
+
+
+def invoice_pdf_cache_dir():
+    return Path(getattr(settings, "INVOICE_PDF_CACHE_DIR", Path(settings.BASE_DIR) / "invoice_cache"))
+
+
+def invoice_pdf_fingerprint(*parts):
+    """Content hash of everything printed on the invoice, plus the layout version."""
+    payload = json.dumps([INVOICE_PDF_LAYOUT_VERSION, *parts], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cached_invoice_pdf(bill_id, fingerprint, render):
+    """
+    Return the path of the stored PDF for this bill version.
+
+    ``render()`` returning PDF bytes is only called on a miss. Files are
+    written atomically, older versions of the same bill are dropped, and a hit
+    refreshes the file's mtime so age-based eviction is least-recently-used.
+    """
+    bill_dir = invoice_pdf_cache_dir() / str(bill_id)
+    path = bill_dir / f"{fingerprint}.pdf"
+
+    if path.exists():
+        os.utime(path)
+        return path
+
+    pdf = render()
+    bill_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=bill_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(pdf)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    for stale in bill_dir.glob("*.pdf"):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+    return path
+
+
+def invoice_pdf_response(path, filename):
+    """
+    Serve a stored PDF as a download.
+
+    With INVOICE_PDF_X_ACCEL_PREFIX set, nginx sends the file (X-Accel-Redirect)
+    and the worker returns immediately; otherwise Django streams it.
+    """
+    accel_prefix = str(getattr(settings, "INVOICE_PDF_X_ACCEL_PREFIX", "") or "").strip()
+    if accel_prefix:
+        relative = Path(path).relative_to(invoice_pdf_cache_dir()).as_posix()
+        response = HttpResponse(content_type="application/pdf")
+        response["X-Accel-Redirect"] = f"{accel_prefix.rstrip('/')}/{relative}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+    return FileResponse(open(path, "rb"), as_attachment=True, filename=filename, content_type="application/pdf")
+
+
+def evict_invoice_pdfs(max_age_days=None, max_bytes=None, dry_run=False):
+    """
+    Remove stored PDFs unused for ``max_age_days`` and then, oldest first,
+    until the store fits in ``max_bytes``. Returns (files removed, bytes freed).
+    """
+    if max_age_days is None:
+        max_age_days = getattr(settings, "INVOICE_PDF_CACHE_MAX_AGE_DAYS", 60)
+
+    cache_dir = invoice_pdf_cache_dir()
+    if not cache_dir.exists():
+        return 0, 0
+
+    files = []
+    for path in cache_dir.glob("*/*"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+    files.sort()
+
+    cutoff = time.time() - (max_age_days * 86400)
+    total_bytes = sum(size for _, size, _ in files)
+    removed = freed = 0
+
+    for mtime, size, path in files:
+        # Leftover temp files from an interrupted write are always stale
+        too_old = mtime < cutoff or (path.suffix == ".tmp" and mtime < time.time() - 3600)
+        over_budget = max_bytes is not None and total_bytes - freed > max_bytes
+        if not (too_old or over_budget):
+            continue
+        if not dry_run:
+            path.unlink(missing_ok=True)
+        removed += 1
+        freed += size
+
+    if not dry_run:
+        for bill_dir in cache_dir.iterdir():
+            if bill_dir.is_dir() and not any(bill_dir.iterdir()):
+                try:
+                    bill_dir.rmdir()
+                except OSError:
+                    # A render wrote into it meanwhile
+                    pass
+
+    return removed, freed
+
@@ -0,0 +1,64 @@
+import re
+from decimal import Decimal
+
+from django.db.models import DecimalField, ExpressionWrapper, F
+
+
+# Helper: derive liters per single unit from Item.name
+def extract_liters_from_name(item_name, fallback_unit_liters=None):
+    """
+    Tries to parse strings like:
+      - "FCM500" -> 500 -> treated as ml -> 0.5 L
+      - "Curd450g" -> 450 g -> treated as 0.45 L (assume g ~ ml for dairy)
+      - "UHT1L" -> 1 L
+      - "Paneer200g" -> 0.2 L (approx, may be non-liquid but we treat g/ml -> /1000)
+      - "Bottle 2L" -> 2 L
+
+    Rules (conservative):
+      - If unit explicitly 'l' or 'L' => liters = number
+      - If unit 'ml' or 'g' => liters = number / 1000
+      - If unit 'kg' => treat as liters = number (approx 1kg ~ 1L for dairy)
+      - If no unit but a number exists:
+          * if number < 10 -> treat as liters (e.g., "1" -> 1L)
+          * else -> treat as ml and divide by 1000 (e.g., 500 -> 0.5L)
+      - If parse fails -> fallback_unit_liters (if provided) else 0.0
+    """
+    if not item_name:
+        return float(fallback_unit_liters or 0.0)
+
+    s = item_name.strip()
+    # Find number and optional unit
+    m = re.search(r'(?i)(\d+(?:\.\d+)?)(?:\s?)(ml|l|kg|g)?', s)
+    if not m:
+        return float(fallback_unit_liters or 0.0)
+
+    num = float(m.group(1))
+    unit = (m.group(2) or '').lower()
+
+    if unit == 'l':
+        return float(num)
+    if unit in ('ml', 'g'):
+        return float(num) / 1000.0
+    if unit == 'kg':
+        # approximate: 1 kg = 1 L for dairy / milk-like items
+        return float(num)
+
+    # no unit found, apply heuristic
+    if num < 10:
+        # often means liters: "1L" may be written "1"
+        return float(num)
+    # likely milliliters / grams
+    return float(num) / 1000.0
+
+
+def liters_per_unit_for_name(item_name):
+    """Decimal liters per unit as stored on Item.liters_per_unit."""
+    return Decimal(str(extract_liters_from_name(item_name, fallback_unit_liters=0.0))).quantize(Decimal('0.001'))
+
+
+def bill_item_liters(prefix=''):
+    """SQL expression for quantity * liters_per_unit of a BillItem (optionally via a relation prefix)."""
+    return ExpressionWrapper(
+        F(f'{prefix}quantity') * F(f'{prefix}item__liters_per_unit'),
+        output_field=DecimalField(max_digits=14, decimal_places=3),
+    )
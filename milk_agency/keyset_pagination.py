@@ -0,0 +1,157 @@
+import base64
+import binascii
+import json
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+BILL_ORDERING = ("-invoice_date", "-id")
+PAYMENT_ORDERING = ("-created_at", "-id")
+ORDER_DASHBOARD_ORDERING = ("delivery_date", "-order_date", "-id")
+
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    """One page of a keyset-paginated queryset; iterate it like a Paginator page."""
+
+    def __init__(self, object_list, *, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def cursor_data(self):
+        """The cursor fields the list APIs add to their responses."""
+        return {
+            "next_cursor": self.next_cursor,
+            "previous_cursor": self.previous_cursor,
+            "has_next": self.has_next,
+        }
+
+
+def _ordering_fields(ordering):
+    return [(name.lstrip("-"), name.startswith("-")) for name in ordering]
+
+
+def _cursor_value(value):
+    # isoformat keeps microseconds, which DjangoJSONEncoder would cut to milliseconds
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _row_values(row, fields):
+    if isinstance(row, dict):
+        return [row[name] for name, _ in fields]
+    return [getattr(row, name) for name, _ in fields]
+
+
+def encode_cursor(values, direction="next"):
+    payload = json.dumps({"d": direction, "k": [_cursor_value(value) for value in values]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token, model, ordering):
+    """Return (direction, values) from a cursor, converting values with the model's own fields."""
+    fields = _ordering_fields(ordering)
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        direction, raw_values = payload["d"], payload["k"]
+        if direction not in ("next", "previous") or len(raw_values) != len(fields):
+            raise ValueError(token)
+        values = [model._meta.get_field(name).to_python(value) for (name, _), value in zip(fields, raw_values)]
+    except (ValueError, TypeError, KeyError, binascii.Error, FieldDoesNotExist, ValidationError) as exc:
+        raise InvalidCursor("Invalid cursor.") from exc
+    if any(value is None for value in values):
+        raise InvalidCursor("Invalid cursor.")
+    return direction, values
+
+
+def _after_cursor(fields, values, backwards):
+    """
+    Rows strictly past ``values`` in the ordering, e.g. for (-invoice_date, -id):
+    invoice_date <= d AND (invoice_date < d OR (invoice_date = d AND id < i)).
+    The leading bound gives the database a plain range on the index's first column.
+    """
+    def op(descending, inclusive=False):
+        return ("lt" if descending != backwards else "gt") + ("e" if inclusive else "")
+
+    first_name, first_descending = fields[0]
+    condition = Q()
+    for index, (name, descending) in enumerate(fields):
+        equal = {prior: value for (prior, _), value in zip(fields[:index], values[:index])}
+        condition |= Q(**equal, **{f"{name}__{op(descending)}": values[index]})
+    return Q(**{f"{first_name}__{op(first_descending, inclusive=True)}": values[0]}) & condition
+
+
+def keyset_page(queryset, cursor=None, *, ordering, per_page):
+    """
+    Return the page of ``queryset`` after (or, for a previous-page cursor,
+    before) ``cursor``, ordered by ``ordering``.
+
+    Each page is one indexed range query of per_page + 1 rows. It never
+    counts and never OFFSETs, so deep pages cost the same as the first. The
+    last field of ``ordering`` must be unique, normally the id. The fields
+    must be non-null. Raises InvalidCursor for a cursor this ordering did
+    not produce.
+    """
+    fields = _ordering_fields(ordering)
+    direction, values = decode_cursor(cursor, queryset.model, ordering) if cursor else ("next", None)
+    backwards = direction == "previous"
+
+    if backwards:
+        queryset = queryset.order_by(*(name[1:] if name.startswith("-") else f"-{name}" for name in ordering))
+    else:
+        queryset = queryset.order_by(*ordering)
+    if values is not None:
+        queryset = queryset.filter(_after_cursor(fields, values, backwards))
+
+    rows = list(queryset[:per_page + 1])
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    has_next = more if not backwards else True
+    has_previous = values is not None if not backwards else more
+    if not rows:
+        return KeysetPage(rows)
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(_row_values(rows[-1], fields)) if has_next else None,
+        previous_cursor=encode_cursor(_row_values(rows[0], fields), "previous") if has_previous else None,
+    )
+
+
+def page_size(value, default):
+    """A ?limit= value clamped to 1..MAX_PAGE_SIZE, or ``default`` when missing or invalid."""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return min(max(size, 1), MAX_PAGE_SIZE)
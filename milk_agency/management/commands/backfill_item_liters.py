@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from milk_agency.item_units import liters_per_unit_for_name
+from milk_agency.models import Item
+
+
+class Command(BaseCommand):
+    help = "Recompute Item.liters_per_unit from item names (overridden items are left alone)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report items whose liters per unit would change.",
+        )
+
+    def handle(self, *args, **options):
+        changed = []
+        for item in Item.objects.filter(liters_per_unit_override=False).only("id", "name", "liters_per_unit"):
+            liters = liters_per_unit_for_name(item.name)
+            if item.liters_per_unit != liters:
+                self.stdout.write(f"{item.name}: {item.liters_per_unit} -> {liters}")
+                item.liters_per_unit = liters
+                changed.append(item)
+
+        if options.get("dry_run"):
+            self.stdout.write(self.style.WARNING(f"{len(changed)} item(s) would be updated."))
+            return
+
+        Item.objects.bulk_update(changed, ["liters_per_unit"], batch_size=500)
+        self.stdout.write(self.style.SUCCESS(f"Updated liters per unit for {len(changed)} item(s)."))
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from milk_agency.invoice_pdfs import evict_invoice_pdfs
+
+
+class Command(BaseCommand):
+    help = "Remove stored invoice PDFs that have not been downloaded recently."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.INVOICE_PDF_CACHE_MAX_AGE_DAYS,
+            help="Remove PDFs unused for this many days (default: INVOICE_PDF_CACHE_MAX_AGE_DAYS).",
+        )
+        parser.add_argument(
+            "--max-mb",
+            type=int,
+            help="Afterwards, remove the least recently used PDFs until the store fits in this many MB.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report what would be removed.",
+        )
+
+    def handle(self, *args, **options):
+        max_mb = options.get("max_mb")
+        removed, freed = evict_invoice_pdfs(
+            max_age_days=options["days"],
+            max_bytes=max_mb * 1024 * 1024 if max_mb is not None else None,
+            dry_run=options.get("dry_run"),
+        )
+
+        verb = "Would remove" if options.get("dry_run") else "Removed"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {removed} invoice PDF(s), {freed / (1024 * 1024):.1f} MB."))
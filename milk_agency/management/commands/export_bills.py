@@ -0,0 +1,79 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from milk_agency.bill_exports import BILL_EXPORT_CHUNK_SIZE, BILL_EXPORT_FORMATS, bill_export_rows
+
+
+def _parse_date(value, option):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"{option} must be in YYYY-MM-DD format")
+
+
+class Command(BaseCommand):
+    help = "Export bill lines with their bill, customer and item details to CSV or XLSX."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format",
+            choices=sorted(BILL_EXPORT_FORMATS),
+            default="csv",
+            help="Output format (default csv).",
+        )
+        parser.add_argument(
+            "--output",
+            help="File to write. CSV goes to stdout when omitted; XLSX needs a file.",
+        )
+        parser.add_argument(
+            "--customer",
+            type=int,
+            help="Only bills for this customer id.",
+        )
+        parser.add_argument(
+            "--area",
+            help="Only bills for customers in this area.",
+        )
+        parser.add_argument(
+            "--start-date",
+            help="First invoice date to include (YYYY-MM-DD).",
+        )
+        parser.add_argument(
+            "--end-date",
+            help="Last invoice date to include (YYYY-MM-DD).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=BILL_EXPORT_CHUNK_SIZE,
+            help=f"Rows fetched from the database at a time (default {BILL_EXPORT_CHUNK_SIZE}).",
+        )
+
+    def handle(self, *args, **options):
+        export_format = options["format"]
+        output = options.get("output")
+        if export_format == "xlsx" and not output:
+            raise CommandError("--output is required for XLSX exports.")
+
+        rows = bill_export_rows(
+            customer_id=options.get("customer"),
+            area=options.get("area"),
+            start_date=_parse_date(options["start_date"], "--start-date") if options.get("start_date") else None,
+            end_date=_parse_date(options["end_date"], "--end-date") if options.get("end_date") else None,
+            chunk_size=max(options["chunk_size"], 1),
+        )
+        encode, _ = BILL_EXPORT_FORMATS[export_format]
+
+        if not output:
+            for chunk in encode(rows):
+                self.stdout.write(chunk, ending="")
+            return
+
+        size = 0
+        mode, encoding = ("w", "utf-8") if export_format == "csv" else ("wb", None)
+        with open(output, mode, encoding=encoding, newline="" if encoding else None) as export_file:
+            for chunk in encode(rows):
+                size += export_file.write(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f"Exported bills to {output} ({size / 1024:.1f} KB)."))
@@ -0,0 +1,97 @@
+import os
+import time
+import zipfile
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from milk_agency.monthly_statements import monthly_statement_contexts, statement_customers, write_statement_pdf
+from milk_agency.pdf_jobs import pdf_process_pool
+
+
+class Command(BaseCommand):
+    help = "Render every retailer's monthly statement PDF into a dated archive directory."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--month",
+            required=True,
+            help="Statement month as YYYY-MM.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Render processes (default: one per CPU core).",
+        )
+        parser.add_argument(
+            "--area",
+            help="Only retailers in this area.",
+        )
+        parser.add_argument(
+            "--output-dir",
+            default=getattr(settings, "MONTHLY_STATEMENT_ARCHIVE_DIR", Path(settings.BASE_DIR) / "statements"),
+            help="Archive root; PDFs go into a YYYY-MM folder under it (default: MONTHLY_STATEMENT_ARCHIVE_DIR).",
+        )
+        parser.add_argument(
+            "--zip",
+            action="store_true",
+            help="Also pack the month's PDFs into statements_YYYY-MM.zip next to the folder.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            selected = datetime.strptime(options["month"], "%Y-%m")
+        except ValueError:
+            raise CommandError("--month must be YYYY-MM.")
+        year, month = selected.year, selected.month
+        workers = max(options["workers"], 1)
+
+        archive_dir = Path(options["output_dir"]) / f"{year}-{month:02d}"
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        timings = []
+
+        started = time.perf_counter()
+        customers = list(statement_customers(year, month, options.get("area")))
+        timings.append(("customers", time.perf_counter() - started))
+        if not customers:
+            self.stdout.write(f"No retailers were billed in {year}-{month:02d}.")
+            return
+
+        started = time.perf_counter()
+        contexts = monthly_statement_contexts(customers, year, month, area=options.get("area"))
+        timings.append(("contexts", time.perf_counter() - started))
+
+        started = time.perf_counter()
+        pool = pdf_process_pool(workers) if workers > 1 else None
+        if pool is None:
+            if workers > 1:
+                self.stderr.write("Process pools need fork(); rendering in this process instead.")
+            results = [write_statement_pdf(context, archive_dir) for context in contexts]
+        else:
+            connections.close_all()
+            with pool:
+                chunksize = max(len(contexts) // (workers * 4), 1)
+                results = list(pool.map(write_statement_pdf, contexts, [archive_dir] * len(contexts), chunksize=chunksize))
+        timings.append(("render", time.perf_counter() - started))
+        total_bytes = sum(size for _, size in results)
+
+        if options["zip"]:
+            started = time.perf_counter()
+            zip_path = archive_dir.parent / f"statements_{year}-{month:02d}.zip"
+            with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+                for path, _ in results:
+                    archive.write(path, arcname=f"{archive_dir.name}/{path.name}")
+            timings.append(("zip", time.perf_counter() - started))
+            self.stdout.write(f"Zipped to {zip_path}.")
+
+        for stage, seconds in timings:
+            self.stdout.write(f"  {stage:<10} {seconds:8.2f}s")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {len(results)} statement(s), {total_bytes / (1024 * 1024):.1f} MB, "
+            f"to {archive_dir} in {sum(seconds for _, seconds in timings):.2f}s."
+        ))
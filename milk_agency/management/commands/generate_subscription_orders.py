@@ -1,5 +1,5 @@
 from django.core.management.base import BaseCommand
-from milk_agency.utils.subscription_engine import generate_daily_subscription_orders
+from milk_agency.subscription_billing import generate_daily_subscription_orders
 
 
 class Command(BaseCommand):
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from milk_agency.models import Bill, Customer, CustomerLedger, CustomerPayment
+
+
+class Command(BaseCommand):
+    help = "Rebuild (or verify) CustomerLedger balances from bill and payment history."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--customer",
+            type=int,
+            action="append",
+            help="Limit to the given customer id. May be repeated.",
+        )
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only report ledger rows that differ from history; do not write.",
+        )
+
+    def handle(self, *args, **options):
+        customer_ids = options.get("customer")
+        verify_only = options.get("verify")
+
+        if not customer_ids:
+            customer_ids = (
+                set(Bill.objects.filter(customer__isnull=False).values_list("customer_id", flat=True))
+                | set(CustomerPayment.objects.values_list("customer_id", flat=True))
+                | set(CustomerLedger.objects.values_list("customer_id", flat=True))
+            )
+
+        customers = Customer.objects.in_bulk(customer_ids)
+        ledgers = CustomerLedger.objects.in_bulk(customers.keys(), field_name="customer_id")
+        mismatched = 0
+
+        for customer_id in sorted(customers):
+            expected = customers[customer_id].get_actual_due()
+            ledger = ledgers.get(customer_id)
+            if ledger is not None and ledger.balance == expected:
+                continue
+
+            mismatched += 1
+            current = ledger.balance if ledger is not None else "missing"
+            self.stdout.write(f"Customer {customer_id}: ledger {current}, history {expected}")
+
+            if not verify_only:
+                with transaction.atomic():
+                    CustomerLedger.rebuild(customer_id)
+
+        checked = len(customers)
+        if verify_only:
+            style = self.style.SUCCESS if not mismatched else self.style.WARNING
+            self.stdout.write(style(f"Verified {checked} customer ledger(s): {mismatched} mismatch(es)."))
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f"Checked {checked} customer ledger(s): {mismatched} rebuilt.")
+            )
@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from customer_portal.models import CustomerOrder
+from milk_agency.models import DeliveryTask, SubscriptionOrder
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = "Rebuild (or verify) DeliveryTask rows from customer and subscription orders."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--date",
+            help="Limit to deliveries due on this date (YYYY-MM-DD).",
+        )
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only report tasks that differ from their orders; do not write.",
+        )
+
+    def _stale_tasks(self, expected, field_name, existing):
+        stale = []
+        for task in expected:
+            current = existing.get(getattr(task, f"{field_name}_id"))
+            if current is None or any(
+                getattr(current, field.attname) != getattr(task, field.attname)
+                for field in map(DeliveryTask._meta.get_field, DeliveryTask.SYNCED_FIELDS)
+            ):
+                stale.append(task)
+        return stale
+
+    def _check(self, sources, build, field_name, verify_only):
+        checked = stale_count = 0
+        batch = []
+        for source in sources.iterator(chunk_size=BATCH_SIZE):
+            batch.append(build(source))
+            if len(batch) == BATCH_SIZE:
+                stale_count += self._check_batch(batch, field_name, verify_only)
+                checked += len(batch)
+                batch = []
+        if batch:
+            stale_count += self._check_batch(batch, field_name, verify_only)
+            checked += len(batch)
+        return checked, stale_count
+
+    def _check_batch(self, batch, field_name, verify_only):
+        existing = DeliveryTask.objects.in_bulk(
+            [getattr(task, f"{field_name}_id") for task in batch],
+            field_name=f"{field_name}_id",
+        )
+        stale = self._stale_tasks(batch, field_name, existing)
+        for task in stale:
+            self.stdout.write(f"{task.get_kind_display()} {getattr(task, f'{field_name}_id')}: task out of date")
+        if stale and not verify_only:
+            with transaction.atomic():
+                DeliveryTask.upsert(stale)
+        return len(stale)
+
+    def handle(self, *args, **options):
+        verify_only = options.get("verify")
+        orders = CustomerOrder.objects.select_related("customer", "delivery_tracking")
+        subscription_orders = SubscriptionOrder.objects.select_related("customer", "delivery_tracking")
+        if options.get("date"):
+            orders = orders.filter(delivery_date=options["date"])
+            subscription_orders = subscription_orders.filter(date=options["date"])
+
+        order_count, stale_orders = self._check(orders, DeliveryTask.for_order, "order", verify_only)
+        subscription_count, stale_subscriptions = self._check(
+            subscription_orders, DeliveryTask.for_subscription_order, "subscription_order", verify_only
+        )
+
+        checked = order_count + subscription_count
+        mismatched = stale_orders + stale_subscriptions
+        if verify_only:
+            style = self.style.SUCCESS if not mismatched else self.style.WARNING
+            self.stdout.write(style(f"Verified {checked} delivery task(s): {mismatched} mismatch(es)."))
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f"Checked {checked} delivery task(s): {mismatched} rebuilt.")
+            )
@@ -0,0 +1,49 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from milk_agency.models import Bill
+from milk_agency.monthly_sales_rollup import refresh_customer_monthly_sales
+
+
+class Command(BaseCommand):
+    help = "Rebuild CustomerMonthlySales rollups from bill history."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--month",
+            help="Only rebuild the given month (YYYY-MM).",
+        )
+        parser.add_argument(
+            "--customer",
+            type=int,
+            action="append",
+            help="Limit to the given customer id. May be repeated.",
+        )
+
+    def handle(self, *args, **options):
+        bills = Bill.objects.filter(customer__isnull=False)
+
+        if options.get("month"):
+            try:
+                selected = datetime.strptime(options["month"], "%Y-%m")
+            except ValueError:
+                raise CommandError("--month must be in YYYY-MM format")
+            bills = bills.filter(invoice_date__year=selected.year, invoice_date__month=selected.month)
+
+        if options.get("customer"):
+            bills = bills.filter(customer_id__in=options["customer"])
+
+        # Deleted bills are included so months that only hold deleted bills are zeroed
+        customer_months = (
+            bills.values_list("customer_id", "invoice_date__year", "invoice_date__month")
+            .distinct()
+            .order_by()
+        )
+
+        count = 0
+        for customer_id, year, month in customer_months:
+            refresh_customer_monthly_sales(customer_id, year, month)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} customer monthly sales row(s)."))
@@ -0,0 +1,77 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from milk_agency.models import Item, StockMovement
+from milk_agency.stock_ledger import ledger_stock_quantities
+
+
+class Command(BaseCommand):
+    help = "Recompute (or verify) Item.stock_quantity from the StockMovement ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--item",
+            type=int,
+            action="append",
+            help="Limit to the given item id. May be repeated.",
+        )
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only report items whose stock differs from the ledger; do not write.",
+        )
+        parser.add_argument(
+            "--record-adjustments",
+            action="store_true",
+            help="Keep the current stock and record the difference as adjustment movements instead.",
+        )
+
+    def handle(self, *args, **options):
+        item_ids = options.get("item")
+        verify_only = options.get("verify")
+        record_adjustments = options.get("record_adjustments")
+
+        with transaction.atomic():
+            items = Item.objects.select_for_update().order_by("id")
+            if item_ids:
+                items = items.filter(pk__in=item_ids)
+            stock = dict(items.values_list("id", "stock_quantity"))
+            expected = ledger_stock_quantities(stock.keys())
+
+            mismatched = {}
+            for item_id, current in stock.items():
+                ledger_total = expected.get(item_id, 0)
+                if current != ledger_total:
+                    mismatched[item_id] = ledger_total
+                    self.stdout.write(f"Item {item_id}: stock {current}, ledger {ledger_total}")
+
+            if not verify_only and mismatched:
+                if record_adjustments:
+                    StockMovement.objects.bulk_create(
+                        [
+                            StockMovement(
+                                item_id=item_id,
+                                quantity=stock[item_id] - ledger_total,
+                                reason="adjustment",
+                                note="Recorded by reconcile_stock",
+                            )
+                            for item_id, ledger_total in mismatched.items()
+                        ],
+                        batch_size=500,
+                    )
+                else:
+                    changed = Item.objects.in_bulk(mismatched.keys())
+                    for item_id, ledger_total in mismatched.items():
+                        changed[item_id].stock_quantity = ledger_total
+                    Item.objects.bulk_update(changed.values(), ["stock_quantity"], batch_size=500)
+
+        checked = len(stock)
+        if verify_only:
+            style = self.style.SUCCESS if not mismatched else self.style.WARNING
+            self.stdout.write(style(f"Verified {checked} item(s): {len(mismatched)} mismatch(es)."))
+        elif record_adjustments:
+            self.stdout.write(
+                self.style.SUCCESS(f"Checked {checked} item(s): {len(mismatched)} adjustment(s) recorded.")
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Checked {checked} item(s): {len(mismatched)} reset from the ledger."))
@@ -0,0 +1,118 @@
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.management.base import BaseCommand
+
+from milk_agency.pdf_jobs import (
+    PDF_MAX_ATTEMPTS,
+    claim_pdf_jobs,
+    pdf_process_pool,
+    purge_pdf_jobs,
+    requeue_stale_pdf_jobs,
+    run_pdf_jobs,
+)
+
+
+class Command(BaseCommand):
+    help = "Render queued invoice and statement PDFs, spreading the work over a pool of processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain the currently queued jobs and exit.",
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Render processes (default: one per CPU core).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="Jobs claimed per batch (default: 4 per process).",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=2.0,
+            help="Seconds to sleep when the queue is empty (default 2).",
+        )
+        parser.add_argument(
+            "--max-attempts",
+            type=int,
+            default=PDF_MAX_ATTEMPTS,
+            help=f"Attempts before a job is marked failed (default {PDF_MAX_ATTEMPTS}).",
+        )
+        parser.add_argument(
+            "--stale-minutes",
+            type=int,
+            default=15,
+            help="Requeue jobs left running this long by a worker that stopped (default 15).",
+        )
+        parser.add_argument(
+            "--keep-days",
+            type=int,
+            default=7,
+            help="Delete finished jobs and their files after this many days (default 7).",
+        )
+
+    def handle(self, *args, **options):
+        processes = max(options["processes"], 1)
+        batch_size = options["batch_size"] or processes * 4
+        max_attempts = options["max_attempts"]
+        last_purge = None
+
+        pool = self._start_pool(processes)
+        try:
+            while True:
+                if last_purge is None or time.monotonic() - last_purge > 3600:
+                    self._purge_finished(options["keep_days"])
+                    last_purge = time.monotonic()
+
+                job_ids = claim_pdf_jobs(batch_size, max_attempts=max_attempts)
+                if job_ids:
+                    try:
+                        summary = run_pdf_jobs(job_ids, pool=pool, max_attempts=max_attempts)
+                    except BrokenProcessPool:
+                        # The batch stays "running" until --stale-minutes requeues it
+                        self.stderr.write("A render process died; restarting the pool.")
+                        pool.shutdown(wait=False, cancel_futures=True)
+                        pool = self._start_pool(processes)
+                        continue
+
+                    self.stdout.write(
+                        f"Rendered {len(job_ids)} PDF(s): {summary['done']} done, "
+                        f"{summary['pending']} retrying, {summary['failed']} failed."
+                    )
+
+                if len(job_ids) < batch_size:
+                    requeued = requeue_stale_pdf_jobs(options["stale_minutes"], max_attempts=max_attempts)
+                    if requeued:
+                        self.stdout.write(f"Requeued {requeued} stalled job(s).")
+                        continue
+                    if options["once"]:
+                        break
+                    time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+        self.stdout.write(self.style.SUCCESS("PDF worker stopped."))
+
+    def _start_pool(self, processes):
+        if processes == 1:
+            return None
+        pool = pdf_process_pool(processes)
+        if pool is None:
+            self.stderr.write("Process pools need fork(); rendering in this process instead.")
+        return pool
+
+    def _purge_finished(self, keep_days):
+        deleted = purge_pdf_jobs(keep_days)
+        if deleted:
+            self.stdout.write(f"Removed {deleted} finished job(s) older than {keep_days} day(s).")
@@ -0,0 +1,93 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from milk_agency.models import PushNotificationOutbox
+from milk_agency.push_notifications import (
+    PUSH_MAX_ATTEMPTS,
+    fail_stalled_pushes,
+    process_push_outbox,
+    push_delivery_available,
+)
+
+
+class Command(BaseCommand):
+    help = "Deliver queued push notifications from the outbox, retrying failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain the currently due notifications and exit.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50,
+            help="Outbox rows claimed per batch (default 50).",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds to sleep when the outbox is empty (default 5).",
+        )
+        parser.add_argument(
+            "--max-attempts",
+            type=int,
+            default=PUSH_MAX_ATTEMPTS,
+            help=f"Attempts before a notification is marked failed (default {PUSH_MAX_ATTEMPTS}).",
+        )
+        parser.add_argument(
+            "--stale-minutes",
+            type=int,
+            default=10,
+            help="Fail notifications left sending this long by a worker that stopped (default 10).",
+        )
+        parser.add_argument(
+            "--keep-days",
+            type=int,
+            default=7,
+            help="Delete sent notifications older than this many days (default 7).",
+        )
+
+    def handle(self, *args, **options):
+        if not push_delivery_available():
+            raise CommandError("Firebase is not configured; push notifications cannot be delivered.")
+
+        batch_size = options["batch_size"]
+        max_attempts = options["max_attempts"]
+        last_purge = None
+
+        try:
+            while True:
+                if last_purge is None or time.monotonic() - last_purge > 3600:
+                    self._purge_sent(options["keep_days"])
+                    last_purge = time.monotonic()
+
+                summary = process_push_outbox(batch_size=batch_size, max_attempts=max_attempts)
+                if summary["processed"]:
+                    self.stdout.write(
+                        f"Processed {summary['processed']} push(es): {summary['sent']} sent, "
+                        f"{summary['retried']} retrying, {summary['failed']} failed."
+                    )
+
+                if summary["processed"] < batch_size:
+                    stalled = fail_stalled_pushes(options["stale_minutes"])
+                    if stalled:
+                        self.stdout.write(f"Failed {stalled} push(es) left sending by a stopped worker.")
+                    if options["once"]:
+                        break
+                    time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS("Push worker stopped."))
+
+    def _purge_sent(self, keep_days):
+        cutoff = timezone.now() - timedelta(days=keep_days)
+        deleted, _ = PushNotificationOutbox.objects.filter(status="sent", sent_at__lt=cutoff).delete()
+        if deleted:
+            self.stdout.write(f"Removed {deleted} delivered push(es) older than {keep_days} day(s).")
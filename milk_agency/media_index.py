@@ -0,0 +1,108 @@
+import re
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.templatetags.static import static
+
+
+# directory path -> (directory mtime, {normalized stem: filename}, {filename})
+_media_indexes = {}
+_media_indexes_lock = threading.Lock()
+
+
+def _normalize_asset_key(value):
+    normalized = re.sub(r"[^a-z0-9]+", "", str(value or "").strip().lower())
+    return normalized
+
+
+def _build_media_index(base_dir):
+    index = {}
+    filenames = set()
+    # Sorted so the same file wins for a stem on every rebuild
+    for file_path in sorted(base_dir.iterdir()):
+        if file_path.is_file():
+            index.setdefault(_normalize_asset_key(file_path.stem), file_path.name)
+            filenames.add(file_path.name)
+    return index, filenames
+
+
+def _directory_listing(base_dir):
+    """
+    Return ({normalized stem: filename}, {filename}) for a directory.
+    The listing is shared by the whole process and rebuilt when the directory mtime changes.
+    """
+    key = str(base_dir)
+    try:
+        mtime = base_dir.stat().st_mtime_ns
+    except OSError:
+        return {}, set()
+
+    cached = _media_indexes.get(key)
+    if cached is None or cached[0] != mtime:
+        with _media_indexes_lock:
+            cached = _media_indexes.get(key)
+            if cached is None or cached[0] != mtime:
+                cached = (mtime, *_build_media_index(base_dir))
+                _media_indexes[key] = cached
+    return cached[1], cached[2]
+
+
+def get_media_index(media_subdir):
+    """Return the normalized-stem -> filename index for MEDIA_ROOT/<media_subdir>."""
+    return _directory_listing(Path(settings.MEDIA_ROOT) / media_subdir)[0]
+
+
+def invalidate_media_index(media_subdir=None):
+    """Drop the cached index for one media subdirectory, or for all of them."""
+    with _media_indexes_lock:
+        if media_subdir is None:
+            _media_indexes.clear()
+        else:
+            _media_indexes.pop(str(Path(settings.MEDIA_ROOT) / media_subdir), None)
+
+
+def _upload_exists(upload_field):
+    try:
+        path = Path(upload_field.storage.path(upload_field.name))
+    except NotImplementedError:
+        # Remote storage: there is no directory to list
+        return upload_field.storage.exists(upload_field.name)
+    return path.name in _directory_listing(path.parent)[1]
+
+
+def resolved_media_url(upload_field, media_subdir, *names, index=None, check_upload=None):
+    if upload_field and getattr(upload_field, "name", ""):
+        try:
+            exists = check_upload(upload_field) if check_upload else upload_field.storage.exists(upload_field.name)
+            if exists:
+                return upload_field.url
+        except Exception:
+            pass
+
+    if index is None:
+        index = get_media_index(media_subdir)
+    for name in names:
+        key = _normalize_asset_key(name)
+        if key and key in index:
+            return f"{settings.MEDIA_URL}{media_subdir}/{index[key]}"
+
+    return static('images/placeholder.png')
+
+
+def resolve_image_urls(items):
+    """
+    Resolve the image of many Items with one index lookup and one listing of
+    the upload directory, instead of a stat() and storage.exists() per item.
+
+    Each item's resolved_image_url is primed with the result, so templates
+    listing the items read it for free. Returns {item.pk: image url}.
+    """
+    index = get_media_index('items')
+    urls = {}
+    for item in items:
+        item._resolved_image_url = resolved_media_url(
+            item.image, 'items', item.code, item.name, index=index, check_upload=_upload_exists
+        )
+        urls[item.pk] = item._resolved_image_url
+    return urls
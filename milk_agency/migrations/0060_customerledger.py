@@ -0,0 +1,71 @@
+import django.db.models.deletion
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_customer_ledger(apps, schema_editor):
+    Bill = apps.get_model('milk_agency', 'Bill')
+    CustomerPayment = apps.get_model('milk_agency', 'CustomerPayment')
+    CustomerLedger = apps.get_model('milk_agency', 'CustomerLedger')
+
+    active_bills = Bill.objects.filter(is_deleted=False, customer__isnull=False)
+
+    opening = {}
+    for customer_id, op_due_amount in active_bills.order_by('customer_id', 'invoice_date', 'id').values_list('customer_id', 'op_due_amount'):
+        opening.setdefault(customer_id, Decimal(op_due_amount or 0))
+
+    billed = {
+        row['customer_id']: Decimal(row['total'] or 0)
+        for row in active_bills.values('customer_id').annotate(total=Sum('total_amount'))
+    }
+    paid = {
+        row['customer_id']: Decimal(row['total'] or 0)
+        for row in CustomerPayment.objects.filter(status__in=["success", "SUCCESS"])
+        .values('customer_id')
+        .annotate(total=Sum('amount'))
+    }
+
+    ledgers = []
+    for customer_id in set(opening) | set(billed) | set(paid):
+        opening_due = opening.get(customer_id, Decimal("0.00"))
+        billed_total = billed.get(customer_id, Decimal("0.00"))
+        paid_total = paid.get(customer_id, Decimal("0.00"))
+        ledgers.append(
+            CustomerLedger(
+                customer_id=customer_id,
+                opening_due=opening_due,
+                billed_total=billed_total,
+                paid_total=paid_total,
+                balance=opening_due + billed_total - paid_total,
+            )
+        )
+    CustomerLedger.objects.bulk_create(ledgers, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('milk_agency', '0059_alter_customerpayment_method'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('opening_due', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('billed_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('paid_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='ledger', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['balance'], name='milk_agency_balance_3b5a64_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_customer_ledger, migrations.RunPython.noop),
+    ]
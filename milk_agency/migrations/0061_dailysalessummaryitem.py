@@ -0,0 +1,61 @@
+import django.db.models.deletion
+from decimal import Decimal, InvalidOperation
+
+from django.db import migrations, models
+
+
+def _parse_decimal(values, index):
+    try:
+        return Decimal(values[index].strip())
+    except (IndexError, InvalidOperation):
+        return Decimal("0")
+
+
+def backfill_line_items(apps, schema_editor):
+    DailySalesSummary = apps.get_model('milk_agency', 'DailySalesSummary')
+    DailySalesSummaryItem = apps.get_model('milk_agency', 'DailySalesSummaryItem')
+
+    line_items = []
+    for summary in DailySalesSummary.objects.exclude(item_names='').iterator(chunk_size=500):
+        quantities = summary.item_quantities.split(',') if summary.item_quantities else []
+        prices = summary.item_prices.split(',') if summary.item_prices else []
+        for position, name in enumerate(summary.item_names.split(',')):
+            line_items.append(
+                DailySalesSummaryItem(
+                    summary_id=summary.pk,
+                    position=position,
+                    name=name.strip()[:255],
+                    quantity=_parse_decimal(quantities, position),
+                    price=_parse_decimal(prices, position),
+                )
+            )
+        if len(line_items) >= 1000:
+            DailySalesSummaryItem.objects.bulk_create(line_items)
+            line_items = []
+
+    DailySalesSummaryItem.objects.bulk_create(line_items)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('milk_agency', '0060_customerledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesSummaryItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('name', models.CharField(max_length=255)),
+                ('quantity', models.DecimalField(decimal_places=3, default=0, max_digits=12)),
+                ('price', models.DecimalField(decimal_places=3, default=0, max_digits=12)),
+                ('summary', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='line_items', to='milk_agency.dailysalessummary')),
+            ],
+            options={
+                'ordering': ['position'],
+            },
+        ),
+        migrations.RunPython(backfill_line_items, migrations.RunPython.noop),
+    ]
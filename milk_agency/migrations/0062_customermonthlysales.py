@@ -0,0 +1,37 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('milk_agency', '0061_dailysalessummaryitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerMonthlySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('bill_count', models.IntegerField(default=0)),
+                ('opening_due', models.DecimalField(decimal_places=2, default=0, help_text='Opening due of the first bill in the month', max_digits=12)),
+                ('billed_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('paid_total', models.DecimalField(decimal_places=2, default=0, help_text="Sum of last_paid over the month's bills", max_digits=12)),
+                ('item_count', models.IntegerField(default=0, help_text='Total units billed in the month')),
+                ('milk_liters', models.DecimalField(decimal_places=3, default=0, max_digits=12)),
+                ('curd_liters', models.DecimalField(decimal_places=3, default=0, max_digits=12)),
+                ('milk_commission', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('curd_commission', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('commission', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_sales', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-year', '-month'],
+                'unique_together': {('customer', 'year', 'month')},
+            },
+        ),
+    ]
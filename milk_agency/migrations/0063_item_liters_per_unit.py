@@ -0,0 +1,52 @@
+import re
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+# A frozen copy of milk_agency.item_units.liters_per_unit_for_name as it stood
+# for this migration, so later parser changes cannot alter its backfill
+def liters_per_unit_for_name(item_name):
+    if not item_name:
+        return Decimal('0.000')
+
+    m = re.search(r'(?i)(\d+(?:\.\d+)?)(?:\s?)(ml|l|kg|g)?', item_name.strip())
+    if not m:
+        return Decimal('0.000')
+
+    num = float(m.group(1))
+    unit = (m.group(2) or '').lower()
+    if unit in ('ml', 'g') or (not unit and num >= 10):
+        liters = num / 1000.0
+    else:
+        liters = num
+    return Decimal(str(liters)).quantize(Decimal('0.001'))
+
+
+def backfill_liters_per_unit(apps, schema_editor):
+    Item = apps.get_model('milk_agency', 'Item')
+    items = list(Item.objects.only('id', 'name'))
+    for item in items:
+        item.liters_per_unit = liters_per_unit_for_name(item.name)
+    Item.objects.bulk_update(items, ['liters_per_unit'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('milk_agency', '0062_customermonthlysales'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='liters_per_unit',
+            field=models.DecimalField(decimal_places=3, default=0, help_text='Liters in one unit, derived from the item name unless overridden', max_digits=8),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='liters_per_unit_override',
+            field=models.BooleanField(default=False, help_text='If true, liters_per_unit is kept as entered instead of parsed from the name'),
+        ),
+        migrations.RunPython(backfill_liters_per_unit, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def seed_opening_stock(apps, schema_editor):
+    Item = apps.get_model('milk_agency', 'Item')
+    StockMovement = apps.get_model('milk_agency', 'StockMovement')
+    StockMovement.objects.bulk_create(
+        [
+            StockMovement(item_id=item_id, quantity=quantity, reason='opening', note='Stock on hand when the ledger was introduced')
+            for item_id, quantity in Item.objects.exclude(stock_quantity=0).values_list('id', 'stock_quantity')
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('milk_agency', '0065_invoicesequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(help_text='Signed change in stock units')),
+                ('reason', models.CharField(choices=[('opening', 'Opening Stock'), ('adjustment', 'Manual Adjustment'), ('stock_in', 'Stock In'), ('stock_in_edit', 'Stock In Edited'), ('stock_in_delete', 'Stock In Deleted'), ('bill', 'Bill'), ('bill_restore', 'Bill Edited/Deleted'), ('leakage', 'Leakage'), ('leakage_restore', 'Leakage Deleted')], max_length=20)),
+                ('note', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('bill', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='milk_agency.bill')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='milk_agency.item')),
+                ('leakage', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='milk_agency.leakageentry')),
+                ('stock_entry', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='milk_agency.stockinentry')),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['item', 'created_at'], name='milk_agency_item_id_4baf04_idx'), models.Index(fields=['reason'], name='milk_agency_reason_4c8e70_idx')],
+            },
+        ),
+        migrations.RunPython(seed_opening_stock, migrations.RunPython.noop),
+    ]
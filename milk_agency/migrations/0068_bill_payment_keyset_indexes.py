@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('milk_agency', '0067_pdfrenderjob'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='bill',
+            name='milk_agency_invoice_9d5524_idx',
+        ),
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['invoice_date', 'id'], name='milk_agency_invoice_d65969_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['customer', 'invoice_date', 'id'], name='milk_agency_custome_1ac2b2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customerpayment',
+            index=models.Index(fields=['created_at', 'id'], name='milk_agency_created_97bfe3_idx'),
+        ),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('milk_agency', '0068_bill_payment_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subscriptionorder',
+            index=models.Index(fields=['date'], name='milk_agency_date_c6b87d_idx'),
+        ),
+    ]
@@ -0,0 +1,89 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def seed_delivery_tasks(apps, schema_editor):
+    CustomerOrder = apps.get_model('customer_portal', 'CustomerOrder')
+    SubscriptionOrder = apps.get_model('milk_agency', 'SubscriptionOrder')
+    DeliveryTask = apps.get_model('milk_agency', 'DeliveryTask')
+
+    def task(tracking, source_status, **fields):
+        tracking_status = getattr(tracking, 'status', '') or ''
+        return DeliveryTask(
+            source_status=source_status,
+            tracking_status=tracking_status,
+            status=tracking_status or source_status or 'pending',
+            agent_id=getattr(tracking, 'delivered_by_id', None),
+            delivered_at=getattr(tracking, 'delivered_at', None),
+            **fields,
+        )
+
+    def tracking_of(obj):
+        try:
+            return obj.delivery_tracking
+        except AttributeError:
+            return None
+
+    tasks = []
+
+    def add(new_task):
+        tasks.append(new_task)
+        if len(tasks) >= 500:
+            DeliveryTask.objects.bulk_create(tasks)
+            tasks.clear()
+
+    for order in CustomerOrder.objects.select_related('customer', 'delivery_tracking').iterator(chunk_size=500):
+        add(task(
+            tracking_of(order),
+            order.status or '',
+            kind='order',
+            order_id=order.id,
+            customer_id=order.customer_id,
+            area=order.customer.area,
+            date=order.delivery_date,
+        ))
+    for subscription_order in SubscriptionOrder.objects.select_related('customer', 'delivery_tracking').iterator(chunk_size=500):
+        add(task(
+            tracking_of(subscription_order),
+            'delivered' if subscription_order.delivered else 'pending',
+            kind='subscription',
+            subscription_order_id=subscription_order.id,
+            customer_id=subscription_order.customer_id,
+            area=subscription_order.customer.area,
+            date=subscription_order.date,
+        ))
+    DeliveryTask.objects.bulk_create(tasks)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer_portal', '0017_customerorder_status_index'),
+        ('milk_agency', '0069_subscriptionorder_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('order', 'Customer order'), ('subscription', 'Subscription')], max_length=20)),
+                ('area', models.CharField(blank=True, max_length=255)),
+                ('date', models.DateField(help_text='Delivery date')),
+                ('source_status', models.CharField(max_length=20)),
+                ('tracking_status', models.CharField(blank=True, max_length=20)),
+                ('status', models.CharField(max_length=20)),
+                ('delivered_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('agent', models.ForeignKey(blank=True, help_text='Staff user who last updated the delivery', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='assigned_delivery_tasks', to=settings.AUTH_USER_MODEL)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='delivery_tasks', to=settings.AUTH_USER_MODEL)),
+                ('order', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='delivery_task', to='customer_portal.customerorder')),
+                ('subscription_order', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='delivery_task', to='milk_agency.subscriptionorder')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'date'], name='milk_agency_kind_5ec22b_idx'), models.Index(fields=['date', 'updated_at'], name='milk_agency_date_6ff281_idx'), models.Index(fields=['status', 'date'], name='milk_agency_status_74cf74_idx'), models.Index(fields=['area', 'date'], name='milk_agency_area_fb6d7c_idx'), models.Index(fields=['agent', 'date'], name='milk_agency_agent_i_c2ef77_idx')],
+            },
+        ),
+        migrations.RunPython(seed_delivery_tasks, migrations.RunPython.noop),
+    ]
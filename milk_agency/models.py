@@ -1,58 +1,60 @@
+import uuid
+
 from django.db import models
 from django.conf import settings
-from django.db.models import Q, Sum
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
-from django.templatetags.static import static
 from django.contrib.auth.models import (
     AbstractBaseUser, PermissionsMixin, BaseUserManager
 )
 from decimal import Decimal
-from pathlib import Path
-import re
-
-
-def _normalize_asset_key(value):
-    normalized = re.sub(r"[^a-z0-9]+", "", str(value or "").strip().lower())
-    return normalized
-
-
-def _candidate_names(*values):
-    seen = set()
-    for value in values:
-        if not value:
-            continue
-        raw = str(value).strip()
-        normalized = _normalize_asset_key(raw)
-        for candidate in (raw, normalized):
-            if candidate and candidate not in seen:
-                seen.add(candidate)
-                yield candidate
-
-
-def _resolved_media_url(upload_field, media_subdir, *names):
-    if upload_field and getattr(upload_field, "name", ""):
-        try:
-            if upload_field.storage.exists(upload_field.name):
-                return upload_field.url
-        except Exception:
-            pass
-
-    base_dir = Path(settings.MEDIA_ROOT) / media_subdir
-    if base_dir.exists():
-        for candidate in _candidate_names(*names):
-            for file_path in base_dir.iterdir():
-                if not file_path.is_file():
-                    continue
-                stem = file_path.stem
-                if candidate == stem or _normalize_asset_key(candidate) == _normalize_asset_key(stem):
-                    return f"{settings.MEDIA_URL}{media_subdir}/{file_path.name}"
-
-    return static('images/placeholder.png')
+from .item_units import liters_per_unit_for_name
+from .media_index import invalidate_media_index, resolved_media_url
+
 
 # -----------------------------
 # Custom User Manager
 # -----------------------------
-class CustomerManager(BaseUserManager):
+class CustomerQuerySet(models.QuerySet):
+    def with_actual_due(self):
+        """
+        Annotate opening_due, billed_total, paid_total and actual_due with the
+        same semantics as Customer.get_actual_due(), in a single query.
+        """
+        money = DecimalField(max_digits=12, decimal_places=2)
+        zero = Value(Decimal("0.00"), output_field=money)
+        active_bills = Bill.objects.filter(customer=OuterRef("pk"), is_deleted=False)
+
+        opening_due = Subquery(
+            active_bills.order_by("invoice_date", "id").values("op_due_amount")[:1],
+            output_field=money,
+        )
+        billed_total = Subquery(
+            active_bills.order_by().values("customer").annotate(total=Sum("total_amount")).values("total"),
+            output_field=money,
+        )
+        paid_total = Subquery(
+            CustomerPayment.objects.filter(
+                customer=OuterRef("pk"),
+                status__in=SUCCESSFUL_PAYMENT_STATUSES,
+            ).order_by().values("customer").annotate(total=Sum("amount")).values("total"),
+            output_field=money,
+        )
+
+        return self.annotate(
+            opening_due=Coalesce(opening_due, zero, output_field=money),
+            billed_total=Coalesce(billed_total, zero, output_field=money),
+            paid_total=Coalesce(paid_total, zero, output_field=money),
+        ).annotate(
+            actual_due=ExpressionWrapper(
+                F("opening_due") + F("billed_total") - F("paid_total"),
+                output_field=money,
+            )
+        )
+
+
+class CustomerManager(BaseUserManager.from_queryset(CustomerQuerySet)):
     def create_user(self, phone, password=None, **extra_fields):
         if not phone:
             raise ValueError("Phone number is required")
@@ -148,22 +150,31 @@ class Customer(AbstractBaseUser, PermissionsMixin):
         return self.name
     
     def get_actual_due(self):
-        active_bills = self.bills.filter(is_deleted=False).order_by('invoice_date', 'id')
+        opening_due, total_billed, total_paid = _customer_due_components(self.pk)
+        return opening_due + total_billed - total_paid
 
-        opening_due = Decimal("0.00")
-        if active_bills.exists():
-            opening_due = Decimal(active_bills.first().op_due_amount or 0)
 
-        total_billed = Decimal(
-            active_bills.aggregate(total=Sum('total_amount'))['total'] or 0
-        )
-        total_paid = Decimal(
-            self.customerpayment_set.filter(
-                Q(status="success") | Q(status="SUCCESS")
-            ).aggregate(total=Sum('amount'))['total'] or 0
-        )
+SUCCESSFUL_PAYMENT_STATUSES = ("success", "SUCCESS")
 
-        return opening_due + total_billed - total_paid
+
+def _customer_due_components(customer_id):
+    """Return (opening_due, total_billed, total_paid) computed from bill/payment history."""
+    active_bills = Bill.objects.filter(customer_id=customer_id, is_deleted=False).order_by('invoice_date', 'id')
+
+    first_bill = active_bills.values('op_due_amount').first()
+    opening_due = Decimal(first_bill['op_due_amount'] or 0) if first_bill else Decimal("0.00")
+
+    total_billed = Decimal(
+        active_bills.aggregate(total=Sum('total_amount'))['total'] or 0
+    )
+    total_paid = Decimal(
+        CustomerPayment.objects.filter(
+            customer_id=customer_id,
+            status__in=SUCCESSFUL_PAYMENT_STATUSES,
+        ).aggregate(total=Sum('amount'))['total'] or 0
+    )
+
+    return opening_due, total_billed, total_paid
 
 
 class PushDevice(models.Model):
@@ -197,6 +208,98 @@ class PushDevice(models.Model):
     def __str__(self):
         return f"{self.customer} - {self.device_type} push device"
 
+
+class PushNotificationOutbox(models.Model):
+    AUDIENCE_CHOICES = [
+        ("customer", "Customer"),
+        ("admin", "Admins"),
+    ]
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("sending", "Sending"),
+        ("sent", "Sent"),
+        ("failed", "Failed"),
+    ]
+
+    audience = models.CharField(max_length=20, choices=AUDIENCE_CHOICES, default="customer")
+    customer = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="push_outbox",
+    )
+    title = models.CharField(max_length=255)
+    body = models.TextField()
+    data = models.JSONField(default=dict, blank=True)
+    tag = models.CharField(max_length=100, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    sent_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["next_attempt_at", "id"]
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+            models.Index(fields=["status", "audience", "tag"]),
+        ]
+
+    def __str__(self):
+        return f"{self.audience} push '{self.title}' ({self.status})"
+
+
+class PdfRenderJob(models.Model):
+    """A PDF render queued by a request and produced by run_pdf_worker."""
+    KIND_CHOICES = [
+        ("invoice", "Invoice"),
+        ("sale_invoice", "General Store Invoice"),
+        ("monthly_statement", "Monthly Statement"),
+    ]
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+
+    # Unguessable handle for the status/download endpoints
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    params = models.JSONField(default=dict, blank=True)
+    dedupe_key = models.CharField(max_length=100, blank=True)
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="pdf_render_jobs",
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    file_path = models.CharField(max_length=500, blank=True)
+    filename = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["next_attempt_at", "id"]
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+            models.Index(fields=["kind", "dedupe_key", "status"]),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} PDF {self.dedupe_key} ({self.status})"
+
 class Company(models.Model):
     name = models.CharField(max_length=255, unique=True)
     logo = models.ImageField(upload_to='company_logos/', blank=True, null=True)
@@ -210,7 +313,7 @@ class Company(models.Model):
 
     @property
     def resolved_logo_url(self):
-        return _resolved_media_url(self.logo, 'company', self.name)
+        return resolved_media_url(self.logo, 'company', self.name)
 
 class Item(models.Model):
     code = models.CharField(max_length=50, unique=True, blank=True, null=True, help_text='Unique item code')
@@ -225,13 +328,23 @@ class Item(models.Model):
     image = models.ImageField(upload_to='items_saved/', blank=True, null=True)
     description = models.TextField(blank=True, null=True)
     frozen = models.BooleanField(default=False, help_text='If true, item is frozen and not displayed in app except items dashboard')
+    liters_per_unit = models.DecimalField(max_digits=8, decimal_places=3, default=0, help_text='Liters in one unit, derived from the item name unless overridden')
+    liters_per_unit_override = models.BooleanField(default=False, help_text='If true, liters_per_unit is kept as entered instead of parsed from the name')
 
     def __str__(self):
         return f"{self.code} - {self.name}" if self.code else self.name
 
+    def save(self, *args, **kwargs):
+        if not self.liters_per_unit_override:
+            self.liters_per_unit = liters_per_unit_for_name(self.name)
+        super().save(*args, **kwargs)
+
     @property
     def resolved_image_url(self):
-        return _resolved_media_url(self.image, 'items', self.code, self.name)
+        # Primed for whole listings by media_index.resolve_image_urls()
+        if hasattr(self, '_resolved_image_url'):
+            return self._resolved_image_url
+        return resolved_media_url(self.image, 'items', self.code, self.name)
 
 class LeakageEntry(models.Model):
     item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='leakage_entries')
@@ -277,10 +390,20 @@ class Bill(models.Model):
     
     class Meta:
         indexes = [
-            models.Index(fields=["invoice_date"]),
+            # Keyset pagination walks bills by (invoice_date, id), overall and per customer
+            models.Index(fields=["invoice_date", "id"]),
             models.Index(fields=["customer"]),
+            models.Index(fields=["customer", "invoice_date", "id"]),
         ]
 
+class InvoiceSequence(models.Model):
+    """Per-day invoice counter; rows are locked with select_for_update while numbers are taken."""
+    date = models.DateField(unique=True)
+    last_number = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Invoice sequence {self.date} ({self.last_number})"
+
 class BillItem(models.Model):
     bill = models.ForeignKey(Bill, on_delete=models.CASCADE, related_name='items')
     item = models.ForeignKey(Item, on_delete=models.CASCADE)
@@ -331,6 +454,39 @@ class StockInEntry(models.Model):
     def __str__(self):
         return f"{self.item.name} - {self.quantity} pcs - ₹{self.value}"
 
+class StockMovement(models.Model):
+    """Append-only stock ledger; Item.stock_quantity is the running sum of these rows."""
+    REASON_CHOICES = [
+        ('opening', 'Opening Stock'),
+        ('adjustment', 'Manual Adjustment'),
+        ('stock_in', 'Stock In'),
+        ('stock_in_edit', 'Stock In Edited'),
+        ('stock_in_delete', 'Stock In Deleted'),
+        ('bill', 'Bill'),
+        ('bill_restore', 'Bill Edited/Deleted'),
+        ('leakage', 'Leakage'),
+        ('leakage_restore', 'Leakage Deleted'),
+    ]
+
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='stock_movements')
+    quantity = models.IntegerField(help_text='Signed change in stock units')
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    bill = models.ForeignKey(Bill, on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_movements')
+    stock_entry = models.ForeignKey(StockInEntry, on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_movements')
+    leakage = models.ForeignKey(LeakageEntry, on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_movements')
+    note = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['item', 'created_at']),
+            models.Index(fields=['reason']),
+        ]
+
+    def __str__(self):
+        return f"{self.item_id} {self.quantity:+d} ({self.reason})"
+
 class DailyPayment(models.Model):
     company = models.ForeignKey(Company, on_delete=models.SET_NULL, null=True, blank=True, related_name='daily_payments')
     date = models.DateField()
@@ -362,7 +518,7 @@ class DailySalesSummary(models.Model):
     retailer_id = models.CharField(max_length=100, help_text="Unique identifier for the retailer")
     retailer_name = models.CharField(max_length=255, blank=True, help_text="Name of the retailer")
 
-    # Item tracking fields - will be updated dynamically
+    # Legacy comma-separated copies of the line items; DailySalesSummaryItem is the source of truth
     item_names = models.TextField(blank=True, help_text="Comma-separated list of all items sold")
     item_quantities = models.TextField(blank=True, help_text="Comma-separated quantities for each item")
     item_prices = models.TextField(blank=True, help_text="Comma-separated prices for each item")
@@ -383,24 +539,17 @@ class DailySalesSummary(models.Model):
 
     def get_item_list(self):
         """Return list of items as dictionary"""
-        if not self.item_names:
-            return []
-
-        names = self.item_names.split(',')
-        quantities = self.item_quantities.split(',') if self.item_quantities else []
-        prices = self.item_prices.split(',') if self.item_prices else []
-
-        items = []
-        for i, name in enumerate(names):
-            items.append({
-                'name': name.strip(),
-                'quantity': float(quantities[i]) if i < len(quantities) else 0,
-                'price': float(prices[i]) if i < len(prices) else 0
-            })
-        return items
+        return [
+            {
+                'name': line.name,
+                'quantity': float(line.quantity),
+                'price': float(line.price),
+            }
+            for line in self.line_items.all()
+        ]
 
     def set_items(self, items_list):
-        """Set items from list of dictionaries"""
+        """Set items from list of dictionaries; line items are written on save()"""
         names = []
         quantities = []
         prices = []
@@ -413,6 +562,66 @@ class DailySalesSummary(models.Model):
         self.item_names = ','.join(names)
         self.item_quantities = ','.join(quantities)
         self.item_prices = ','.join(prices)
+        self._pending_items = list(items_list)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        pending_items = getattr(self, '_pending_items', None)
+        if pending_items is not None:
+            self.line_items.all().delete()
+            DailySalesSummaryItem.objects.bulk_create([
+                DailySalesSummaryItem(
+                    summary=self,
+                    position=position,
+                    name=item['name'],
+                    quantity=Decimal(str(item.get('quantity', 0))),
+                    price=Decimal(str(item.get('price', 0))),
+                )
+                for position, item in enumerate(pending_items)
+            ])
+            self._pending_items = None
+
+
+class DailySalesSummaryItem(models.Model):
+    summary = models.ForeignKey(DailySalesSummary, on_delete=models.CASCADE, related_name='line_items')
+    position = models.PositiveIntegerField(default=0)
+    name = models.CharField(max_length=255)
+    quantity = models.DecimalField(max_digits=12, decimal_places=3, default=0)
+    price = models.DecimalField(max_digits=12, decimal_places=3, default=0)
+
+    class Meta:
+        ordering = ['position']
+
+    def __str__(self):
+        return f"{self.summary} - {self.name} x {self.quantity}"
+
+class CustomerMonthlySales(models.Model):
+    """
+    Per-customer monthly rollup of active bills, refreshed on every Bill
+    save/delete (see milk_agency/monthly_sales_rollup.py). Rebuild with
+    `manage.py rebuild_monthly_sales`.
+    """
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='monthly_sales')
+    year = models.IntegerField()
+    month = models.IntegerField()
+    bill_count = models.IntegerField(default=0)
+    opening_due = models.DecimalField(max_digits=12, decimal_places=2, default=0, help_text="Opening due of the first bill in the month")
+    billed_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    paid_total = models.DecimalField(max_digits=12, decimal_places=2, default=0, help_text="Sum of last_paid over the month's bills")
+    item_count = models.IntegerField(default=0, help_text="Total units billed in the month")
+    milk_liters = models.DecimalField(max_digits=12, decimal_places=3, default=0)
+    curd_liters = models.DecimalField(max_digits=12, decimal_places=3, default=0)
+    milk_commission = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    curd_commission = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    commission = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('customer', 'year', 'month')
+        ordering = ['-year', '-month']
+
+    def __str__(self):
+        return f"{self.customer.name} - {self.month}/{self.year} - ₹{self.billed_total}"
 
 # CustomerMonthlyPurchase model removed - functionality replaced with direct calculations from Bill and BillItem models
 
@@ -530,6 +739,83 @@ class CustomerPayment(models.Model):
     completed_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"]),
+        ]
+
+
+# -------------------------------------------------------
+# CUSTOMER LEDGER (denormalized running balance)
+# -------------------------------------------------------
+class CustomerLedger(models.Model):
+    """
+    Running balance per customer, equal to Customer.get_actual_due().
+
+    Kept in step with Bill and CustomerPayment writes by the signal handlers at
+    the bottom of this module; BillItem changes reach it through the
+    Bill.total_amount save that follows them. Rebuild with
+    `manage.py rebuild_customer_ledger`.
+    """
+    customer = models.OneToOneField(Customer, on_delete=models.CASCADE, related_name='ledger')
+    opening_due = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    billed_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    paid_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["balance"]),
+        ]
+
+    def __str__(self):
+        return f"{self.customer} ledger - ₹{self.balance}"
+
+    @classmethod
+    def rebuild(cls, customer_id):
+        opening_due, total_billed, total_paid = _customer_due_components(customer_id)
+        ledger, _ = cls.objects.update_or_create(
+            customer_id=customer_id,
+            defaults={
+                "opening_due": opening_due,
+                "billed_total": total_billed,
+                "paid_total": total_paid,
+                "balance": opening_due + total_billed - total_paid,
+            },
+        )
+        return ledger
+
+    @classmethod
+    def apply(cls, customer_id, billed_delta=Decimal("0"), paid_delta=Decimal("0"), seed_missing=True):
+        updated = cls.objects.filter(customer_id=customer_id).update(
+            billed_total=F("billed_total") + billed_delta,
+            paid_total=F("paid_total") + paid_delta,
+            balance=F("balance") + billed_delta - paid_delta,
+            updated_at=timezone.now(),
+        )
+        if not updated and seed_missing:
+            # First write for this customer: seed the row from history,
+            # which already includes the change being applied.
+            cls.rebuild(customer_id)
+
+    @classmethod
+    def refresh_opening_due(cls, customer_id):
+        first_bill = (
+            Bill.objects.filter(customer_id=customer_id, is_deleted=False)
+            .order_by('invoice_date', 'id')
+            .values('op_due_amount')
+            .first()
+        )
+        opening_due = Decimal(first_bill['op_due_amount'] or 0) if first_bill else Decimal("0.00")
+        updated = cls.objects.filter(customer_id=customer_id).update(
+            opening_due=opening_due,
+            balance=F("balance") - F("opening_due") + opening_due,
+            updated_at=timezone.now(),
+        )
+        if not updated:
+            cls.rebuild(customer_id)
+
 
 # -------------------------------------------------------
 # SUBSCRIPTION PLAN
@@ -686,7 +972,10 @@ class SubscriptionOrder(models.Model):
 
     class Meta:
         unique_together = ('subscription', 'item', 'date')
-        
+        indexes = [
+            models.Index(fields=["date"]),
+        ]
+
 class SubscriptionPause(models.Model):
 
     subscription = models.ForeignKey(
@@ -811,7 +1100,7 @@ class OrderDelivery(models.Model):
                 self.order.status = "delivered"
             elif self.status == "failed":
                 self.order.status = "cancelled"
-            self.order.save(update_fields=["status"])
+            self.order.save(update_fields=["status", "updated_at"])
         super().save(*args, **kwargs)
 
 
@@ -879,16 +1168,412 @@ class SubscriptionDelivery(models.Model):
         super().save(*args, **kwargs)
 
 
+# -------------------------------------------------------
+# DELIVERY TASK (denormalized delivery status)
+# -------------------------------------------------------
+class DeliveryTask(models.Model):
+    """
+    One row per delivery, for a customer order or a subscription order, with
+    everything the delivery views filter on in one table.
+
+    source_status is the order's own status (a subscription order's delivered
+    flag as "delivered"/"pending"), tracking_status its OrderDelivery or
+    SubscriptionDelivery row's, and status the one the views show: the
+    tracking row's, else the order's. Kept in step by the signal handlers at
+    the bottom of this module; rebuild with `manage.py rebuild_delivery_tasks`.
+    """
+    KIND_CHOICES = [
+        ("order", "Customer order"),
+        ("subscription", "Subscription"),
+    ]
+    SYNCED_FIELDS = [
+        "kind", "customer", "area", "date", "source_status",
+        "tracking_status", "status", "agent", "delivered_at",
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    order = models.OneToOneField(
+        "customer_portal.CustomerOrder",
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name="delivery_task",
+    )
+    subscription_order = models.OneToOneField(
+        "SubscriptionOrder",
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name="delivery_task",
+    )
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name="delivery_tasks")
+    area = models.CharField(max_length=255, blank=True)
+    date = models.DateField(help_text="Delivery date")
+    source_status = models.CharField(max_length=20)
+    tracking_status = models.CharField(max_length=20, blank=True)
+    status = models.CharField(max_length=20)
+    agent = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="assigned_delivery_tasks",
+        help_text="Staff user who last updated the delivery",
+    )
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["kind", "date"]),
+            models.Index(fields=["date", "updated_at"]),
+            models.Index(fields=["status", "date"]),
+            models.Index(fields=["area", "date"]),
+            models.Index(fields=["agent", "date"]),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} delivery on {self.date} ({self.status})"
+
+    @classmethod
+    def for_order(cls, order):
+        tracking = getattr(order, "delivery_tracking", None)
+        tracking_status = getattr(tracking, "status", "") or ""
+        return cls(
+            kind="order",
+            order=order,
+            customer_id=order.customer_id,
+            area=order.customer.area,
+            date=order.delivery_date,
+            source_status=order.status or "",
+            tracking_status=tracking_status,
+            status=tracking_status or order.status or "pending",
+            agent_id=getattr(tracking, "delivered_by_id", None),
+            delivered_at=getattr(tracking, "delivered_at", None),
+        )
+
+    @classmethod
+    def for_subscription_order(cls, subscription_order):
+        tracking = getattr(subscription_order, "delivery_tracking", None)
+        tracking_status = getattr(tracking, "status", "") or ""
+        source_status = "delivered" if subscription_order.delivered else "pending"
+        return cls(
+            kind="subscription",
+            subscription_order=subscription_order,
+            customer_id=subscription_order.customer_id,
+            area=subscription_order.customer.area,
+            date=subscription_order.date,
+            source_status=source_status,
+            tracking_status=tracking_status,
+            status=tracking_status or source_status,
+            agent_id=getattr(tracking, "delivered_by_id", None),
+            delivered_at=getattr(tracking, "delivered_at", None),
+        )
+
+    @classmethod
+    def upsert(cls, tasks):
+        """Insert or refresh the given tasks in one statement per kind."""
+        for unique_field in ("order", "subscription_order"):
+            rows = [task for task in tasks if getattr(task, f"{unique_field}_id")]
+            if rows:
+                cls.objects.bulk_create(
+                    rows,
+                    batch_size=500,
+                    update_conflicts=True,
+                    unique_fields=[unique_field],
+                    update_fields=cls.SYNCED_FIELDS + ["updated_at"],
+                )
+
+    @classmethod
+    def sync_orders(cls, order_ids):
+        CustomerOrder = cls._meta.get_field("order").related_model
+        orders = CustomerOrder.objects.filter(pk__in=order_ids).select_related("customer", "delivery_tracking")
+        cls.upsert([cls.for_order(order) for order in orders])
+
+    @classmethod
+    def sync_subscription_orders(cls, subscription_order_ids):
+        subscription_orders = SubscriptionOrder.objects.filter(pk__in=subscription_order_ids).select_related(
+            "customer", "delivery_tracking"
+        )
+        cls.upsert([cls.for_subscription_order(subscription_order) for subscription_order in subscription_orders])
+
+
 # -------------------------------------------------------------------
 # SIGNALS: ensure delivery tracking exists for every SubscriptionOrder
 # -------------------------------------------------------------------
-from django.db.models.signals import post_save
+from collections import defaultdict
+
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
 from django.dispatch import receiver
 
 
+def _saved_upload(update_fields, field_name):
+    return update_fields is None or field_name in update_fields
+
+
+@receiver(post_save, sender=Item)
+def invalidate_item_image_index(sender, instance, update_fields=None, **kwargs):
+    if _saved_upload(update_fields, "image"):
+        invalidate_media_index("items")
+
+
+@receiver(post_save, sender=Item)
+def record_opening_stock(sender, instance, created, raw=False, **kwargs):
+    # Stock given at creation is already on the row; only the ledger needs it
+    if created and not raw and instance.stock_quantity:
+        StockMovement.objects.create(item=instance, quantity=instance.stock_quantity, reason='opening')
+
+
+@receiver(post_save, sender=Company)
+def invalidate_company_logo_index(sender, instance, update_fields=None, **kwargs):
+    if _saved_upload(update_fields, "logo"):
+        invalidate_media_index("company")
+
+
 @receiver(post_save, sender=SubscriptionOrder)
-def ensure_subscription_delivery(sender, instance, created, **kwargs):
+def ensure_subscription_delivery(sender, instance, created, update_fields=None, **kwargs):
     """
     Always keep a SubscriptionDelivery row in sync with each SubscriptionOrder.
     """
+    if update_fields is not None and set(update_fields) == {"delivered"}:
+        # SubscriptionDelivery.save() syncing the flag, before its own row is
+        # written; get_or_create here would create it again, recursively
+        return
     SubscriptionDelivery.objects.get_or_create(subscription_order=instance)
+
+
+# -------------------------------------------------------------------
+# SIGNALS: keep DeliveryTask rows in step with both kinds of order
+# -------------------------------------------------------------------
+def _deleted_directly(origin, model):
+    # Tracking rows also cascade away with their order or customer; only a
+    # delete that started at the tracking row itself leaves a task to refresh
+    return isinstance(origin, model) or getattr(origin, "model", None) is model
+
+
+@receiver(post_save, sender="customer_portal.CustomerOrder")
+def sync_delivery_task_on_order_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        DeliveryTask.sync_orders([instance.pk])
+
+
+@receiver(post_save, sender=OrderDelivery)
+def sync_delivery_task_on_order_delivery_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        DeliveryTask.sync_orders([instance.order_id])
+
+
+@receiver(post_delete, sender=OrderDelivery)
+def sync_delivery_task_on_order_delivery_delete(sender, instance, origin=None, **kwargs):
+    if _deleted_directly(origin, OrderDelivery):
+        DeliveryTask.sync_orders([instance.order_id])
+
+
+@receiver(post_save, sender=SubscriptionOrder)
+def sync_delivery_task_on_subscription_order_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        DeliveryTask.sync_subscription_orders([instance.pk])
+
+
+@receiver(post_save, sender=SubscriptionDelivery)
+def sync_delivery_task_on_subscription_delivery_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        DeliveryTask.sync_subscription_orders([instance.subscription_order_id])
+
+
+@receiver(post_delete, sender=SubscriptionDelivery)
+def sync_delivery_task_on_subscription_delivery_delete(sender, instance, origin=None, **kwargs):
+    if _deleted_directly(origin, SubscriptionDelivery):
+        DeliveryTask.sync_subscription_orders([instance.subscription_order_id])
+
+
+@receiver(post_save, sender=Customer)
+def sync_delivery_task_area(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or created or (update_fields is not None and "area" not in update_fields):
+        return
+    DeliveryTask.objects.filter(customer=instance).exclude(area=instance.area).update(
+        area=instance.area,
+        updated_at=timezone.now(),
+    )
+
+
+# -------------------------------------------------------------------
+# SIGNALS: keep CustomerLedger balances in step with bills and payments
+# -------------------------------------------------------------------
+_BILL_LEDGER_FIELDS = ("customer_id", "total_amount", "is_deleted", "op_due_amount", "invoice_date")
+_PAYMENT_LEDGER_FIELDS = ("customer_id", "amount", "status")
+
+
+def _bill_ledger_amount(state):
+    if not state or not state["customer_id"] or state["is_deleted"]:
+        return Decimal("0")
+    return Decimal(str(state["total_amount"] or 0))
+
+
+def _payment_ledger_amount(state):
+    if not state or not state["customer_id"] or state["status"] not in SUCCESSFUL_PAYMENT_STATUSES:
+        return Decimal("0")
+    return Decimal(str(state["amount"] or 0))
+
+
+def _instance_state(instance, fields):
+    return {field: getattr(instance, field) for field in fields}
+
+
+@receiver(pre_save, sender=Bill)
+def remember_bill_previous_state(sender, instance, raw=False, **kwargs):
+    instance._previous_state = None
+    if instance.pk and not raw:
+        instance._previous_state = (
+            Bill.objects.filter(pk=instance.pk).values(*_BILL_LEDGER_FIELDS).first()
+        )
+
+
+@receiver(post_save, sender=Bill)
+def sync_ledger_on_bill_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_previous_state", None)
+    current = _instance_state(instance, _BILL_LEDGER_FIELDS)
+
+    deltas = defaultdict(Decimal)
+    if previous and previous["customer_id"]:
+        deltas[previous["customer_id"]] -= _bill_ledger_amount(previous)
+    if current["customer_id"]:
+        deltas[current["customer_id"]] += _bill_ledger_amount(current)
+
+    for customer_id, delta in deltas.items():
+        if delta:
+            CustomerLedger.apply(customer_id, billed_delta=delta)
+
+    # Only the customer's earliest active bill sets the opening due, so it
+    # needs a refresh whenever ordering or visibility may have changed.
+    if previous is None or any(previous[field] != current[field] for field in _BILL_LEDGER_FIELDS if field != "total_amount"):
+        for customer_id in {(previous or {}).get("customer_id"), current["customer_id"]}:
+            if customer_id:
+                CustomerLedger.refresh_opening_due(customer_id)
+
+
+@receiver(post_delete, sender=Bill)
+def sync_ledger_on_bill_delete(sender, instance, **kwargs):
+    if not instance.customer_id:
+        return
+    delta = _bill_ledger_amount(_instance_state(instance, _BILL_LEDGER_FIELDS))
+    if delta:
+        CustomerLedger.apply(instance.customer_id, billed_delta=-delta)
+    CustomerLedger.refresh_opening_due(instance.customer_id)
+
+
+@receiver(pre_save, sender=CustomerPayment)
+def remember_payment_previous_state(sender, instance, raw=False, **kwargs):
+    instance._previous_state = None
+    if instance.pk and not raw:
+        instance._previous_state = (
+            CustomerPayment.objects.filter(pk=instance.pk).values(*_PAYMENT_LEDGER_FIELDS).first()
+        )
+
+
+@receiver(post_save, sender=CustomerPayment)
+def sync_ledger_on_payment_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_previous_state", None)
+
+    deltas = defaultdict(Decimal)
+    if previous and previous["customer_id"]:
+        deltas[previous["customer_id"]] -= _payment_ledger_amount(previous)
+    deltas[instance.customer_id] += _payment_ledger_amount(_instance_state(instance, _PAYMENT_LEDGER_FIELDS))
+
+    for customer_id, delta in deltas.items():
+        if delta:
+            CustomerLedger.apply(customer_id, paid_delta=delta)
+
+
+@receiver(post_delete, sender=CustomerPayment)
+def sync_ledger_on_payment_delete(sender, instance, **kwargs):
+    delta = _payment_ledger_amount(_instance_state(instance, _PAYMENT_LEDGER_FIELDS))
+    if delta:
+        # Payments also cascade away with their customer; never re-create a
+        # ledger row for a customer that is being deleted.
+        CustomerLedger.apply(instance.customer_id, paid_delta=-delta, seed_missing=False)
+
+
+# -------------------------------------------------------------------
+# SIGNALS: keep CustomerMonthlySales rollups in step with bills
+# -------------------------------------------------------------------
+def _bill_months(state):
+    if not state or not state["customer_id"] or not state["invoice_date"]:
+        return set()
+    return {(state["customer_id"], state["invoice_date"].year, state["invoice_date"].month)}
+
+
+# Refreshes are queued to run once per customer-month when the transaction
+# commits, by which time a bill's items have been written as well.
+@receiver(post_save, sender=Bill)
+def sync_monthly_sales_on_bill_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from .monthly_sales_rollup import queue_monthly_sales_refresh
+
+    months = _bill_months(getattr(instance, "_previous_state", None))
+    months |= _bill_months(_instance_state(instance, _BILL_LEDGER_FIELDS))
+    queue_monthly_sales_refresh(months)
+
+
+@receiver(post_delete, sender=Bill)
+def sync_monthly_sales_on_bill_delete(sender, instance, **kwargs):
+    from .monthly_sales_rollup import queue_monthly_sales_refresh
+
+    queue_monthly_sales_refresh(_bill_months(_instance_state(instance, _BILL_LEDGER_FIELDS)))
+
+
+@receiver(post_save, sender=BillItem)
+@receiver(post_delete, sender=BillItem)
+def sync_monthly_sales_on_bill_item_change(sender, instance, raw=False, **kwargs):
+    # Bills are looked up when the queue flushes, once for all pending items
+    if raw:
+        return
+    from .monthly_sales_rollup import queue_monthly_sales_refresh
+
+    queue_monthly_sales_refresh(bill_ids=[instance.bill_id])
+
+
+@receiver(post_migrate)
+def refresh_schema_capabilities_after_migrate(sender, using="default", **kwargs):
+    # Sent once per app; forgetting the cached answers is cheap, they are re-read on next use
+    from .schema_capabilities import refresh_schema_capabilities
+
+    refresh_schema_capabilities(using)
+
+
+# -------------------------------------------------------------------
+# SIGNALS: drop cached customer portal home snapshots
+# -------------------------------------------------------------------
+def _invalidate_home_snapshots(*customer_ids):
+    from customer_portal.home_snapshot import invalidate_home_snapshot
+
+    invalidate_home_snapshot(*customer_ids)
+
+
+@receiver(post_save, sender=Bill)
+@receiver(post_delete, sender=Bill)
+@receiver(post_save, sender=CustomerPayment)
+@receiver(post_delete, sender=CustomerPayment)
+@receiver(post_save, sender="customer_portal.CustomerOrder")
+@receiver(post_delete, sender="customer_portal.CustomerOrder")
+def invalidate_home_snapshot_on_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_previous_state", None) or {}
+    _invalidate_home_snapshots(instance.customer_id, previous.get("customer_id"))
+
+
+@receiver(post_save, sender=OrderDelivery)
+@receiver(post_delete, sender=OrderDelivery)
+def invalidate_home_snapshot_on_delivery_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    CustomerOrder = OrderDelivery._meta.get_field("order").related_model
+    _invalidate_home_snapshots(
+        CustomerOrder.objects.filter(pk=instance.order_id).values_list("customer_id", flat=True).first()
+    )
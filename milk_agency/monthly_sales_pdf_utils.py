@@ -1,18 +1,16 @@
-from django.conf import settings
-import os
 from datetime import datetime
 from decimal import Decimal
 from io import BytesIO
 from reportlab.lib.pagesizes import letter, landscape, A3
 from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
 from reportlab.platypus import Table, TableStyle, SimpleDocTemplate, Paragraph, Spacer, PageTemplate, Frame, BaseDocTemplate
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
-from django.contrib.staticfiles import finders
 from django.http import HttpResponse
 
+from .pdf_assets import draw_watermark, static_image, string_width
+
 class MonthlySalesPDFGenerator:
     """PDF generation utility for monthly sales summary"""
 
@@ -20,8 +18,8 @@ class MonthlySalesPDFGenerator:
         self.width, self.height = landscape(A3)
         self.margin_bottom = 100  # Minimum space needed at bottom for footer
 
-    def generate_monthly_sales_pdf(self, context, request=None):
-        """Generate monthly sales summary PDF and return as HTTP response"""
+    def render_monthly_sales_pdf(self, context):
+        """Render the monthly sales summary and return the PDF bytes"""
         buffer = BytesIO()
         c = canvas.Canvas(buffer, pagesize=landscape(A3))
         customer = context['selected_customer_obj']
@@ -32,10 +30,18 @@ class MonthlySalesPDFGenerator:
 
         pdf = buffer.getvalue()
         buffer.close()
+        return pdf
+
+    def monthly_sales_pdf_filename(self, context):
+        customer = context['selected_customer_obj']
+        return f'{customer.name}_{context["selected_date"].strftime("%B_%Y")}.pdf'
+
+    def generate_monthly_sales_pdf(self, context, request=None):
+        """Generate monthly sales summary PDF and return as HTTP response"""
+        pdf = self.render_monthly_sales_pdf(context)
 
-        
         response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="{customer.name}_{context["selected_date"].strftime("%B_%Y")}.pdf"'
+        response['Content-Disposition'] = f'attachment; filename="{self.monthly_sales_pdf_filename(context)}"'
         response.write(pdf)
 
         return response
@@ -101,18 +107,16 @@ class MonthlySalesPDFGenerator:
         c.setLineWidth(1)
         c.rect(left_x, header_y, header_w, header_h)
 
-        logo_path = os.path.join(settings.BASE_DIR, "static", "images", "logo.webp")
-        if os.path.exists(logo_path):
+        logo = static_image("images/logo.webp")
+        if logo:
             try:
-                logo = ImageReader(logo_path)
                 c.drawImage(logo, left_x + 8, header_y + 14, width=110, height=44, mask="auto")
             except Exception:
                 pass
 
-        header_logo_path = self._resolve_static_image("images/SVD1.png")
-        if header_logo_path:
+        header_logo = static_image("images/SVD1.png")
+        if header_logo:
             try:
-                header_logo = ImageReader(header_logo_path)
                 logo_width = 64
                 logo_height = 64
                 logo_x = left_x + header_w - logo_width - 16
@@ -150,7 +154,7 @@ class MonthlySalesPDFGenerator:
         # Title below header with lines above and below
         c.setFont("Helvetica-Bold", 10)
         title_text = f"Customer Statement for the Period: {context['start_date'].strftime('%d %b %Y')} - {context['end_date'].strftime('%d %b %Y')}"
-        text_width = c.stringWidth(title_text, "Helvetica-Bold", 10)
+        text_width = string_width(title_text, "Helvetica-Bold", 10)
         x_center = (width - text_width) / 2
         y_title = customer_box_y - 24
 
@@ -169,24 +173,6 @@ class MonthlySalesPDFGenerator:
 
         return y_title - 20  # Return the y position after the header
 
-    def _resolve_static_image(self, *relative_paths):
-        """Resolve a static image path for ReportLab image loading."""
-        for rel_path in relative_paths:
-            finder_path = finders.find(rel_path)
-            if finder_path:
-                return finder_path
-
-            candidate_paths = [
-                os.path.join(settings.BASE_DIR, "static", rel_path),
-                os.path.join(settings.BASE_DIR, "staticfiles", rel_path),
-            ]
-            for path in candidate_paths:
-                if os.path.exists(path):
-                    return path
-        return None
-
-
-
     def _draw_purchase_details_table(self, c, context, width, start_y):
         """Draw purchase details table using Table class"""
         y = start_y - 10
@@ -317,18 +303,10 @@ class MonthlySalesPDFGenerator:
 
     def _draw_watermark(self, c, width, height):
         """Draw logo as watermark on the page"""
-        logo_path = self._resolve_static_image("images/SVD1.png")
-        if logo_path and os.path.exists(logo_path):
+        logo = static_image("images/SVD1.png")
+        if logo:
             try:
-                logo = ImageReader(logo_path)
-                c.saveState()
-                c.setFillAlpha(0.1)  # Set transparency for watermark
-                logo_width = 300
-                logo_height = 300
-                logo_x = (width - logo_width) / 2
-                logo_y = (height - logo_height) / 2
-                c.drawImage(logo, logo_x, logo_y, width=logo_width, height=logo_height, mask='auto')
-                c.restoreState()
+                draw_watermark(c, logo, width, height)
             except Exception as e:
                 pass
 
@@ -336,10 +314,9 @@ class MonthlySalesPDFGenerator:
         """Draw signature"""
         footer_y = 60
 
-        signature_path = os.path.join(settings.BASE_DIR, "static", "images", "signature.png")
-        if signature_path and os.path.exists(signature_path):
+        signature = static_image("images/signature.png")
+        if signature:
             try:
-                signature = ImageReader(signature_path)
                 c.saveState()
                 c.translate(width - 200, footer_y + 120)
                 c.drawImage(signature, 0, 0, width=100, height=100, mask='auto')
@@ -369,7 +346,7 @@ class MonthlySalesPDFGenerator:
         # Center-align "Thank you for your business!"
         c.setFont("Helvetica-Bold", 12)
         thank_you_text = "Thank you for your business!"
-        text_width = c.stringWidth(thank_you_text, "Helvetica-Bold", 9)
+        text_width = string_width(thank_you_text, "Helvetica-Bold", 9)
         x_center = (width - text_width) / 2
         c.drawString(x_center, footer_y - 10, thank_you_text)
 
@@ -381,7 +358,7 @@ class MonthlySalesPDFGenerator:
 
         for word in words:
             test_line = " ".join(current_line + [word])
-            if c.stringWidth(test_line, font_name, font_size) <= max_width or not current_line:
+            if string_width(test_line, font_name, font_size) <= max_width or not current_line:
                 current_line.append(word)
             else:
                 lines.append(" ".join(current_line))
@@ -414,18 +391,16 @@ class MonthlySalesPDFGenerator:
         c.setLineWidth(1)
         c.rect(left_x, header_y, header_w, header_h)
 
-        logo_path = os.path.join(settings.BASE_DIR, "static", "images", "logo.webp")
-        if os.path.exists(logo_path):
+        logo = static_image("images/logo.webp")
+        if logo:
             try:
-                logo = ImageReader(logo_path)
                 c.drawImage(logo, left_x + 8, header_y + 14, width=110, height=44, mask="auto")
             except Exception:
                 pass
 
-        header_logo_path = self._resolve_static_image("images/SVD1.png")
-        if header_logo_path:
+        header_logo = static_image("images/SVD1.png")
+        if header_logo:
             try:
-                header_logo = ImageReader(header_logo_path)
                 c.drawImage(header_logo, left_x + header_w - 82, header_y + 5, width=64, height=64, mask="auto")
             except Exception:
                 pass
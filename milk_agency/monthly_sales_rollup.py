@@ -0,0 +1,116 @@
+import calendar
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from .item_units import bill_item_liters
+from .models import Bill, BillItem, CustomerMonthlySales
+
+
+def _month_volumes(customer_id, year, month):
+    """Return (item_count, milk_liters, curd_liters) for a customer's active bills in a month."""
+    totals = BillItem.objects.filter(
+        bill__customer_id=customer_id,
+        bill__is_deleted=False,
+        bill__invoice_date__year=year,
+        bill__invoice_date__month=month,
+    ).aggregate(
+        item_count=Sum('quantity'),
+        milk_liters=Sum(bill_item_liters(), filter=Q(item__category__iexact='milk')),
+        curd_liters=Sum(bill_item_liters(), filter=Q(item__category__iexact='curd')),
+    )
+    return (
+        totals['item_count'] or 0,
+        totals['milk_liters'] or Decimal('0'),
+        totals['curd_liters'] or Decimal('0'),
+    )
+
+
+def refresh_customer_monthly_sales(customer_id, year, month):
+    """Recompute and store the CustomerMonthlySales row for one customer-month."""
+    # Imported here: monthly_sales_summary imports this module for its views
+    from .monthly_sales_summary import calculate_curd_commission, calculate_milk_commission
+
+    bills = Bill.objects.filter(
+        customer_id=customer_id,
+        is_deleted=False,
+        invoice_date__year=year,
+        invoice_date__month=month,
+    )
+    totals = bills.aggregate(
+        bill_count=Count('id'),
+        billed_total=Sum('total_amount'),
+        paid_total=Sum('last_paid'),
+    )
+    first_bill = bills.order_by('invoice_date', 'id').values('op_due_amount').first()
+    item_count, milk_liters, curd_liters = _month_volumes(customer_id, year, month)
+
+    # Same average-based slab logic as the monthly summary views
+    days_in_month = calendar.monthrange(year, month)[1]
+    milk_commission = (calculate_milk_commission(milk_liters / days_in_month) * days_in_month).quantize(Decimal('0.01'))
+    curd_commission = (calculate_curd_commission(curd_liters / days_in_month) * days_in_month).quantize(Decimal('0.01'))
+
+    monthly_sales, _ = CustomerMonthlySales.objects.update_or_create(
+        customer_id=customer_id,
+        year=year,
+        month=month,
+        defaults={
+            'bill_count': totals['bill_count'] or 0,
+            'opening_due': first_bill['op_due_amount'] if first_bill else Decimal('0'),
+            'billed_total': totals['billed_total'] or Decimal('0'),
+            'paid_total': totals['paid_total'] or Decimal('0'),
+            'item_count': item_count,
+            'milk_liters': milk_liters,
+            'curd_liters': curd_liters,
+            'milk_commission': milk_commission,
+            'curd_commission': curd_commission,
+            'commission': milk_commission + curd_commission,
+        },
+    )
+    return monthly_sales
+
+
+def _bill_months(bill_ids):
+    return {
+        (customer_id, invoice_date.year, invoice_date.month)
+        for customer_id, invoice_date in Bill.objects.filter(pk__in=bill_ids, customer__isnull=False)
+        .values_list('customer_id', 'invoice_date')
+        if invoice_date
+    }
+
+
+def queue_monthly_sales_refresh(months=(), bill_ids=()):
+    """
+    Refresh the given (customer_id, year, month) rollups, and those of the
+    given bills, once the current transaction commits.
+
+    Keys are pooled per connection, so a bill saved twice or edited line by
+    line is still recomputed once per customer-month. Keys left by a rolled
+    back transaction are refreshed with the next commit, which is harmless.
+    """
+    connection = transaction.get_connection()
+    pending = getattr(connection, '_pending_monthly_sales', None)
+    if pending is None:
+        pending = connection._pending_monthly_sales = {'months': set(), 'bill_ids': set()}
+    pending['months'].update(months)
+    pending['bill_ids'].update(bill_id for bill_id in bill_ids if bill_id)
+
+    def flush():
+        months = pending['months'] | _bill_months(pending['bill_ids'])
+        pending['months'].clear()
+        pending['bill_ids'].clear()
+        for customer_id, year, month in sorted(months):
+            refresh_customer_monthly_sales(customer_id, year, month)
+
+    # Outside a transaction this runs at once; inside, every later callback finds the pool empty.
+    # A failed refresh is logged rather than failing a write that has already committed.
+    transaction.on_commit(flush, robust=True)
+
+
+def get_customer_monthly_sales(customer, year, month):
+    """Return the stored rollup for a customer-month, building it on first use."""
+    monthly_sales = CustomerMonthlySales.objects.filter(customer=customer, year=year, month=month).first()
+    if monthly_sales is None:
+        monthly_sales = refresh_customer_monthly_sales(customer.pk, year, month)
+    return monthly_sales
@@ -4,13 +4,13 @@ from django.db.models import Sum
 from datetime import datetime, date, timedelta
 from collections import defaultdict
 from decimal import Decimal
-from .models import DailySalesSummary, Customer, Bill, CustomerMonthlyCommission
+from .models import DailySalesSummary, DailySalesSummaryItem, Customer, Bill, CustomerMonthlyCommission
 import calendar
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.cache import never_cache
 from django.http import JsonResponse
 from .monthly_sales_pdf_utils import MonthlySalesPDFGenerator
-from .views_sales_summary import extract_liters_from_name
+from .monthly_sales_rollup import get_customer_monthly_sales
 
 
 def calculate_milk_commission(volume):
@@ -83,20 +83,15 @@ def monthly_sales_summary(request):
     due_amount = 0
     total_sales = 0
     due_total = 0
+    monthly_sales = None
     if customer:
-        bills = Bill.objects.filter(
-            customer__retailer_id=customer.retailer_id,
-            is_deleted=False,
-            invoice_date__year=year,
-            invoice_date__month=month,
-        ).order_by('invoice_date')
-
-        # Use aggregates for consistent totals
-        invoice_total = bills.aggregate(total=Sum('total_amount'))['total'] or 0
-        paid_total = bills.aggregate(total=Sum('last_paid'))['total'] or 0
+        # Month totals come from the stored per-customer rollup
+        monthly_sales = get_customer_monthly_sales(customer, year, month)
+        invoice_total = monthly_sales.billed_total
+        paid_total = monthly_sales.paid_total
 
         # Opening due: from first bill in the month or customer.due if no bills
-        opening_due = bills.first().op_due_amount if bills.exists() else customer.due
+        opening_due = monthly_sales.opening_due if monthly_sales.bill_count else customer.due
 
         # Due = opening due + monthly invoices - monthly payments
         due_total = opening_due + invoice_total - paid_total
@@ -108,13 +103,9 @@ def monthly_sales_summary(request):
         total_sales = invoice_total
 
     # Total items
-    total_items = 0
-    for sale in sales_data:
-        try:
-            items = sale.get_item_list()
-            total_items += sum(item['quantity'] for item in items)
-        except Exception:
-            continue
+    total_items = DailySalesSummaryItem.objects.filter(summary__in=sales_data).aggregate(
+        total=Sum('quantity')
+    )['total'] or 0
 
     # --- your existing bills & items aggregation logic ---
     customer_bills_dict = {}
@@ -128,7 +119,7 @@ def monthly_sales_summary(request):
             is_deleted=False,
             invoice_date__year=year,
             invoice_date__month=month,
-        ).order_by('invoice_date')
+        ).prefetch_related('items__item').order_by('invoice_date')
 
         aggregated_bills = defaultdict(
             lambda: {
@@ -187,34 +178,18 @@ def monthly_sales_summary(request):
     start_date = date(year, month, 1)
     end_date = date(year, month, days_in_month)
 
-    # Calculate volumes directly from bills instead of using CustomerMonthlyPurchase
+    # Volumes and commission come from the CustomerMonthlySales rollup
     total_volume = Decimal('0')
     milk_volume = Decimal('0')
     curd_volume = Decimal('0')
-
-    if customer:
-        # Get all bill items for the customer in the selected month
-        bill_items = Bill.objects.filter(
-            customer__retailer_id=customer.retailer_id,
-            is_deleted=False,
-            invoice_date__year=year,
-            invoice_date__month=month,
-        ).prefetch_related('items__item')
-
-        # Calculate total volumes by item category using extract_liters_from_name
-        for bill in bill_items:
-            for bill_item in bill.items.all():
-                category = bill_item.item.category
-                quantity = bill_item.quantity
-                if category and quantity:
-                    category_lower = category.lower()
-                    liters_per_unit = extract_liters_from_name(bill_item.item.name)
-                    total_liters = Decimal(str(liters_per_unit)) * Decimal(str(quantity))
-                    if category_lower == 'milk':
-                        milk_volume += total_liters
-                    elif category_lower == 'curd':
-                        curd_volume += total_liters
-
+    milk_commission = Decimal('0')
+    curd_commission = Decimal('0')
+
+    if monthly_sales:
+        milk_volume = monthly_sales.milk_liters
+        curd_volume = monthly_sales.curd_liters
+        milk_commission = monthly_sales.milk_commission
+        curd_commission = monthly_sales.curd_commission
         total_volume = milk_volume + curd_volume
 
     # Calculate average daily volumes (already in liters, no need to divide by 1000)
@@ -222,9 +197,6 @@ def monthly_sales_summary(request):
     avg_curd = curd_volume / days_in_month if curd_volume else Decimal('0')
     avg_volunme = avg_milk + avg_curd
 
-    # Calculate commissions based on slabs
-    milk_commission = calculate_milk_commission(avg_milk)*days_in_month
-    curd_commission = calculate_curd_commission(avg_curd)*days_in_month
     total_commission = milk_commission + curd_commission
 
     # Calculate effective rates for template compatibility
@@ -316,20 +288,15 @@ def generate_monthly_sales_pdf(request):
     due_amount = 0
     total_sales = 0
     due_total = 0
+    monthly_sales = None
     if customer:
-        bills = Bill.objects.filter(
-            customer__retailer_id=customer.retailer_id,
-            is_deleted=False,
-            invoice_date__year=year,
-            invoice_date__month=month,
-        ).order_by('invoice_date')
-
-        # Use aggregates for consistent totals
-        invoice_total = bills.aggregate(total=Sum('total_amount'))['total'] or 0
-        paid_total = bills.aggregate(total=Sum('last_paid'))['total'] or 0
+        # Month totals come from the stored per-customer rollup
+        monthly_sales = get_customer_monthly_sales(customer, year, month)
+        invoice_total = monthly_sales.billed_total
+        paid_total = monthly_sales.paid_total
 
         # Opening due: from first bill in the month or customer.due if no bills
-        opening_due = bills.first().op_due_amount if bills.exists() else customer.due
+        opening_due = monthly_sales.opening_due if monthly_sales.bill_count else customer.due
 
         # Due = opening due + monthly invoices - monthly payments
         due_total = opening_due + invoice_total - paid_total
@@ -341,13 +308,9 @@ def generate_monthly_sales_pdf(request):
         total_sales = invoice_total
 
     # Total items
-    total_items = 0
-    for sale in sales_data:
-        try:
-            items = sale.get_item_list()
-            total_items += sum(item['quantity'] for item in items)
-        except Exception:
-            continue
+    total_items = DailySalesSummaryItem.objects.filter(summary__in=sales_data).aggregate(
+        total=Sum('quantity')
+    )['total'] or 0
 
     # --- your existing bills & items aggregation logic ---
     customer_bills_dict = {}
@@ -361,7 +324,7 @@ def generate_monthly_sales_pdf(request):
             is_deleted=False,
             invoice_date__year=year,
             invoice_date__month=month,
-        ).order_by('invoice_date')
+        ).prefetch_related('items__item').order_by('invoice_date')
 
         aggregated_bills = defaultdict(
             lambda: {
@@ -420,34 +383,18 @@ def generate_monthly_sales_pdf(request):
     start_date = date(year, month, 1)
     end_date = date(year, month, days_in_month)
 
-    # Calculate volumes directly from bills instead of using CustomerMonthlyPurchase
+    # Volumes and commission come from the CustomerMonthlySales rollup
     total_volume = Decimal('0')
     milk_volume = Decimal('0')
     curd_volume = Decimal('0')
-
-    if customer:
-        # Get all bill items for the customer in the selected month
-        bill_items = Bill.objects.filter(
-            customer__retailer_id=customer.retailer_id,
-            is_deleted=False,
-            invoice_date__year=year,
-            invoice_date__month=month,
-        ).prefetch_related('items__item')
-
-        # Calculate total volumes by item category using extract_liters_from_name
-        for bill in bill_items:
-            for bill_item in bill.items.all():
-                category = bill_item.item.category
-                quantity = bill_item.quantity
-                if category and quantity:
-                    category_lower = category.lower()
-                    liters_per_unit = extract_liters_from_name(bill_item.item.name)
-                    total_liters = Decimal(str(liters_per_unit)) * Decimal(str(quantity))
-                    if category_lower == 'milk':
-                        milk_volume += total_liters
-                    elif category_lower == 'curd':
-                        curd_volume += total_liters
-
+    milk_commission = Decimal('0')
+    curd_commission = Decimal('0')
+
+    if monthly_sales:
+        milk_volume = monthly_sales.milk_liters
+        curd_volume = monthly_sales.curd_liters
+        milk_commission = monthly_sales.milk_commission
+        curd_commission = monthly_sales.curd_commission
         total_volume = milk_volume + curd_volume
 
     # Use same average-based commission logic as HTML template
@@ -457,9 +404,6 @@ def generate_monthly_sales_pdf(request):
     avg_curd = curd_volume / days_in_month if curd_volume else Decimal('0')
     avg_volunme = avg_milk + avg_curd
 
-    milk_commission = calculate_milk_commission(avg_milk) * days_in_month
-    curd_commission = calculate_curd_commission(avg_curd) * days_in_month
-
     total_commission = milk_commission + curd_commission
 
     context = {
@@ -0,0 +1,190 @@
+import calendar
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db.models import Sum
+from django.utils.text import get_valid_filename
+
+from .models import Bill, BillItem, Customer, CustomerMonthlySales
+from .monthly_sales_pdf_utils import MonthlySalesPDFGenerator
+from .monthly_sales_rollup import refresh_customer_monthly_sales
+
+
+def statement_customers(year, month, area=None):
+    """Retailers with at least one active bill in the month."""
+    customers = Customer.objects.filter(
+        user_type="retailer",
+        bills__is_deleted=False,
+        bills__invoice_date__year=year,
+        bills__invoice_date__month=month,
+    )
+    if area:
+        customers = customers.filter(area=area)
+    return customers.distinct().order_by("name", "id")
+
+
+def _daily_bill_totals(retailer_ids, start_date, end_date):
+    """{retailer_id: {date_key: totals}} for every active bill under the retailer ids, in date order."""
+    daily = defaultdict(dict)
+    rows = (
+        Bill.objects.filter(
+            customer__retailer_id__in=retailer_ids,
+            is_deleted=False,
+            invoice_date__range=(start_date, end_date),
+        )
+        .order_by("invoice_date", "id")
+        .values_list("customer__retailer_id", "invoice_date", "total_amount", "last_paid", "op_due_amount")
+    )
+    for retailer_id, invoice_date, total_amount, last_paid, op_due_amount in rows:
+        date_key = invoice_date.strftime('%Y-%m-%d')
+        day = daily[retailer_id].get(date_key)
+        if day is None:
+            # Only the first bill of the day carries the opening due
+            day = daily[retailer_id][date_key] = {
+                "invoice_date": invoice_date,
+                "total_amount": Decimal("0"),
+                "last_paid": Decimal("0"),
+                "op_due_amount": op_due_amount or 0,
+            }
+        day["total_amount"] += total_amount or 0
+        day["last_paid"] += last_paid or 0
+    return daily
+
+
+def _daily_item_quantities(retailer_ids, start_date, end_date):
+    """{retailer_id: {item_code: {date_key: quantity}}}, summed in the database."""
+    quantities = defaultdict(lambda: defaultdict(dict))
+    rows = (
+        BillItem.objects.filter(
+            bill__customer__retailer_id__in=retailer_ids,
+            bill__is_deleted=False,
+            bill__invoice_date__range=(start_date, end_date),
+        )
+        .values("bill__customer__retailer_id", "bill__invoice_date", "item__code")
+        .annotate(quantity=Sum("quantity"))
+        .order_by()
+    )
+    for row in rows:
+        date_key = row["bill__invoice_date"].strftime('%Y-%m-%d')
+        quantities[row["bill__customer__retailer_id"]][row["item__code"]][date_key] = row["quantity"] or 0
+    return quantities
+
+
+def _statement_context(customer, year, month, *, area, daily_bills, item_quantities, due_amount, monthly_sales):
+    days_in_month = calendar.monthrange(year, month)[1]
+    start_date = date(year, month, 1)
+    end_date = date(year, month, days_in_month)
+
+    customer_bills = {}
+    for date_key, day in daily_bills.items():
+        customer_bills[date_key] = {
+            "invoice_date": day["invoice_date"],
+            "total_amount": day["total_amount"],
+            "paid_amount": day["last_paid"],
+            "due_amount": day["total_amount"] - day["last_paid"] + day["op_due_amount"],
+        }
+
+    customer_items_data = defaultdict(dict)
+    for code, by_date in item_quantities.items():
+        customer_items_data[code] = dict(by_date)
+    unique_codes = sorted(customer_items_data)
+
+    total_quantity_per_item = {
+        code: sum(customer_items_data[code].values())
+        for code in unique_codes
+    }
+
+    avg_milk = monthly_sales.milk_liters / days_in_month
+    avg_curd = monthly_sales.curd_liters / days_in_month
+
+    return {
+        "date": f"{year}-{month:02d}",
+        "area": area,
+        "selected_date": start_date,
+        "selected_customer_obj": customer,
+        "start_date": start_date,
+        "end_date": end_date,
+        "date_range": [start_date + timedelta(days=i) for i in range(days_in_month)],
+        "customer_bills": customer_bills,
+        "customer_items_data": customer_items_data,
+        "unique_codes": unique_codes,
+        "total_quantity_per_item": total_quantity_per_item,
+        "total_sales": sum(b["total_amount"] for b in customer_bills.values()),
+        "paid_amount": sum(b["paid_amount"] for b in customer_bills.values()),
+        "due_amount": due_amount,
+        "milk_volume": avg_milk,
+        "curd_volume": avg_curd,
+        "avg_volume": avg_milk + avg_curd,
+        "milk_commission": monthly_sales.milk_commission,
+        "curd_commission": monthly_sales.curd_commission,
+        "total_commission": monthly_sales.commission,
+        "remaining_due": due_amount - monthly_sales.commission,
+    }
+
+
+def monthly_statement_contexts(customers, year, month, area=None):
+    """
+    Build the context MonthlySalesPDFGenerator draws each customer's monthly
+    statement from: per-day bill totals and item quantities for every bill
+    under the customer's retailer id, the current due, and volumes and
+    commission from the monthly rollup.
+
+    The whole batch costs a fixed handful of queries, however many customers
+    it covers. Returns one context per customer, in order.
+    """
+    customers = list(customers)
+    if not customers:
+        return []
+
+    start_date = date(year, month, 1)
+    end_date = date(year, month, calendar.monthrange(year, month)[1])
+    customer_ids = [customer.pk for customer in customers]
+    retailer_ids = {customer.retailer_id for customer in customers}
+
+    daily_bills = _daily_bill_totals(retailer_ids, start_date, end_date)
+    item_quantities = _daily_item_quantities(retailer_ids, start_date, end_date)
+    dues = dict(Customer.objects.filter(pk__in=customer_ids).with_actual_due().values_list("pk", "actual_due"))
+    rollups = {
+        rollup.customer_id: rollup
+        for rollup in CustomerMonthlySales.objects.filter(customer_id__in=customer_ids, year=year, month=month)
+    }
+
+    contexts = []
+    for customer in customers:
+        monthly_sales = rollups.get(customer.pk)
+        if monthly_sales is None:
+            monthly_sales = refresh_customer_monthly_sales(customer.pk, year, month)
+
+        contexts.append(_statement_context(
+            customer,
+            year,
+            month,
+            area=area,
+            daily_bills=daily_bills.get(customer.retailer_id, {}),
+            item_quantities=item_quantities.get(customer.retailer_id, {}),
+            due_amount=dues.get(customer.pk, Decimal("0")),
+            monthly_sales=monthly_sales,
+        ))
+    return contexts
+
+
+def monthly_statement_context(customer, year, month, area=None):
+    """The statement context for a single customer; see monthly_statement_contexts()."""
+    return monthly_statement_contexts([customer], year, month, area=area)[0]
+
+
+def write_statement_pdf(context, directory):
+    """
+    Render one statement into ``directory`` and return (path, size).
+
+    Runs in generate_monthly_statements' worker processes, so it only touches
+    the context it is given, never the database.
+    """
+    generator = MonthlySalesPDFGenerator()
+    customer = context["selected_customer_obj"]
+    # Prefixed with the id: two retailers can share a name
+    path = directory / get_valid_filename(f"{customer.pk}_{generator.monthly_sales_pdf_filename(context)}")
+    pdf = generator.render_monthly_sales_pdf(context)
+    path.write_bytes(pdf)
+    return path, len(pdf)
@@ -0,0 +1,90 @@
+import os
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from reportlab import rl_config
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+# Write image streams as binary Flate data. ReportLab's default ASCII85 wrapping
+# makes files a quarter larger, and its pure-Python encoder took most of each render.
+rl_config.useA85 = 0
+
+WATERMARK_FORM = "svd_watermark"
+
+PRELOADED_IMAGES = [
+    "images/SVD.png",
+    "images/SVD1.png",
+    "images/logo.webp",
+    "images/signature.png",
+    "images/N. Ramesh.png",
+]
+
+
+@lru_cache(maxsize=None)
+def static_image_path(*relative_paths):
+    """Resolve the first static image that exists, for ReportLab image loading."""
+    for rel_path in relative_paths:
+        finder_path = finders.find(rel_path)
+        if finder_path:
+            return finder_path
+
+        candidate_paths = [
+            os.path.join(settings.BASE_DIR, "static", rel_path),
+            os.path.join(settings.BASE_DIR, "staticfiles", rel_path),
+        ]
+        for path in candidate_paths:
+            if os.path.exists(path):
+                return path
+    return None
+
+
+@lru_cache(maxsize=None)
+def _decoded_image(path):
+    try:
+        reader = ImageReader(path)
+        # Decode now; ImageReader keeps the pixel and alpha data for every later drawImage
+        reader.getRGBData()
+    except Exception:
+        return None
+    return reader
+
+
+def static_image(*relative_paths):
+    """A decoded ImageReader for the first static image found, or None."""
+    path = static_image_path(*relative_paths)
+    return _decoded_image(path) if path else None
+
+
+@lru_cache(maxsize=4096)
+def string_width(text, font_name, font_size):
+    """pdfmetrics.stringWidth, memoised for the fixed headings and terms text."""
+    return stringWidth(text, font_name, font_size)
+
+
+def draw_watermark(c, image, width, height, size=300, alpha=0.1):
+    """
+    Draw ``image`` faded and centred on the page.
+
+    The image is drawn once per document as a form XObject, and later pages
+    reference the form. The alpha is set on the page around doForm, because
+    a form drawn with beginForm gets no ExtGState resources of its own.
+    """
+    if not c.hasForm(WATERMARK_FORM):
+        c.beginForm(WATERMARK_FORM, lowerx=0, lowery=0, upperx=width, uppery=height)
+        c.drawImage(image, (width - size) / 2, (height - size) / 2, width=size, height=size, mask="auto")
+        c.endForm()
+    c.saveState()
+    c.setFillAlpha(alpha)
+    c.doForm(WATERMARK_FORM)
+    c.restoreState()
+
+
+def preload_pdf_assets():
+    """
+    Decode every image the generators use. Call before starting a process
+    pool so forked workers inherit the decoded images.
+    """
+    for rel_path in PRELOADED_IMAGES:
+        static_image(rel_path)
@@ -0,0 +1,320 @@
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from django.http import FileResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from .invoice_pdfs import invoice_pdf_cache_dir, invoice_pdf_response
+from .models import Bill, Customer, PdfRenderJob
+from .monthly_sales_pdf_utils import MonthlySalesPDFGenerator
+from .monthly_statements import monthly_statement_context, statement_customers
+from .pdf_assets import preload_pdf_assets
+from .push_notifications import queue_customer_push
+
+logger = logging.getLogger(__name__)
+
+# Retry delays grow as PDF_RETRY_BASE_SECONDS * 2 ** (attempt - 1)
+PDF_RETRY_BASE_SECONDS = 30
+PDF_MAX_ATTEMPTS = 3
+
+
+def pdf_job_output_dir():
+    return Path(getattr(settings, "PDF_JOB_OUTPUT_DIR", Path(settings.BASE_DIR) / "pdf_jobs"))
+
+
+def enqueue_pdf_job(kind, params, *, dedupe_key="", requested_by=None):
+    """
+    Queue a PDF render for run_pdf_worker.
+
+    A pending or running job for the same document is returned instead of a
+    duplicate, so repeated clicks and retries share one render. A shared job
+    queued without a requester takes this one, so they still get the ready push.
+    """
+    if dedupe_key:
+        job = (
+            PdfRenderJob.objects.filter(kind=kind, dedupe_key=dedupe_key, status__in=["pending", "running"])
+            .order_by("id")
+            .first()
+        )
+        if job:
+            if requested_by is not None and job.requested_by_id is None:
+                PdfRenderJob.objects.filter(pk=job.pk, requested_by__isnull=True).update(requested_by=requested_by)
+                job.requested_by = requested_by
+            return job
+
+    return PdfRenderJob.objects.create(kind=kind, params=params, dedupe_key=dedupe_key, requested_by=requested_by)
+
+
+def enqueue_invoice_pdf(bill, *, requested_by=None):
+    return enqueue_pdf_job("invoice", {"bill_id": bill.pk}, dedupe_key=str(bill.pk), requested_by=requested_by)
+
+
+def enqueue_sale_pdf(sale, *, requested_by=None):
+    return enqueue_pdf_job("sale_invoice", {"sale_id": sale.pk}, dedupe_key=str(sale.pk), requested_by=requested_by)
+
+
+def enqueue_monthly_statement(customer, year, month, *, area=None, requested_by=None):
+    return enqueue_pdf_job(
+        "monthly_statement",
+        {"customer_id": customer.pk, "year": year, "month": month, "area": area},
+        dedupe_key=f"{customer.pk}:{year}-{month:02d}",
+        requested_by=requested_by,
+    )
+
+
+def _bulk_enqueue(kind, params_by_key):
+    """Queue one job per dedupe key with a single INSERT, skipping keys already queued."""
+    queued = set(
+        PdfRenderJob.objects.filter(
+            kind=kind, dedupe_key__in=list(params_by_key), status__in=["pending", "running"]
+        ).values_list("dedupe_key", flat=True)
+    )
+    return PdfRenderJob.objects.bulk_create(
+        [
+            PdfRenderJob(kind=kind, params=params, dedupe_key=key)
+            for key, params in params_by_key.items()
+            if key not in queued
+        ],
+        batch_size=500,
+    )
+
+
+def queue_invoice_pdfs(bill_ids):
+    """
+    Queue invoice renders for the given bills.
+
+    The jobs are written in the caller's transaction, so they only exist if
+    the bills commit; run_pdf_worker renders them into the invoice PDF store.
+    """
+    return _bulk_enqueue("invoice", {str(bill_id): {"bill_id": bill_id} for bill_id in bill_ids if bill_id})
+
+
+def enqueue_monthly_statements(year, month, *, area=None):
+    """
+    Queue month-end statements for every retailer billed in the month.
+
+    run_pdf_worker spreads the jobs over its worker processes.
+    """
+    customer_ids = statement_customers(year, month, area).values_list("id", flat=True)
+
+    return _bulk_enqueue(
+        "monthly_statement",
+        {
+            f"{customer_id}:{year}-{month:02d}": {"customer_id": customer_id, "year": year, "month": month, "area": area}
+            for customer_id in customer_ids
+        },
+    )
+
+
+def _write_job_file(job, filename, pdf):
+    job_dir = pdf_job_output_dir() / str(job.token)
+    job_dir.mkdir(parents=True, exist_ok=True)
+    path = job_dir / get_valid_filename(filename)
+
+    fd, tmp_path = tempfile.mkstemp(dir=job_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(pdf)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def _render_invoice(job):
+    # Imported here: the generator lives in the api app, which imports milk_agency
+    from api.user_bill_pdf_utils import UserPDFGenerator
+
+    bill = Bill.objects.select_related("customer").get(pk=job.params["bill_id"], is_deleted=False)
+    return UserPDFGenerator().generate_invoice_pdf(bill), f"{bill.invoice_number}.pdf"
+
+
+def _render_sale_invoice(job):
+    from general_store.models import Sale
+    from general_store.pdf_utils import PDFGenerator
+
+    sale = Sale.objects.select_related("customer").get(pk=job.params["sale_id"])
+    generator = PDFGenerator()
+    filename = generator.sale_pdf_filename(sale)
+    return _write_job_file(job, filename, generator.render_sale_pdf(sale)), filename
+
+
+def _render_monthly_statement(job):
+    params = job.params
+    customer = Customer.objects.get(pk=params["customer_id"])
+    context = monthly_statement_context(customer, params["year"], params["month"], area=params.get("area"))
+    generator = MonthlySalesPDFGenerator()
+    filename = generator.monthly_sales_pdf_filename(context)
+    return _write_job_file(job, filename, generator.render_monthly_sales_pdf(context)), filename
+
+
+PDF_RENDERERS = {
+    "invoice": _render_invoice,
+    "sale_invoice": _render_sale_invoice,
+    "monthly_statement": _render_monthly_statement,
+}
+
+
+def pdf_job_payload(job, request=None):
+    """Status of a job for the polling endpoint and the ready push."""
+    urls = {"status_url": reverse("pdf_job_status_api", args=[job.token])}
+    if job.status == "done":
+        urls["download_url"] = reverse("pdf_job_download_api", args=[job.token])
+    if request is not None:
+        urls = {key: request.build_absolute_uri(url) for key, url in urls.items()}
+
+    return {
+        "job": str(job.token),
+        "kind": job.kind,
+        "status": job.status,
+        "ready": job.status == "done",
+        "filename": job.filename,
+        "error": job.last_error if job.status == "failed" else "",
+        **urls,
+    }
+
+
+def _notify_pdf_ready(job):
+    # A requester may have been attached by enqueue_pdf_job while the job was rendering
+    job.refresh_from_db(fields=["requested_by"])
+    if job.requested_by_id is None:
+        return
+    queue_customer_push(
+        job.requested_by,
+        title="Your PDF is ready",
+        body=f"{job.filename} is ready to download.",
+        data={"type": "pdf_ready", **pdf_job_payload(job)},
+        tag=f"pdf-{job.token}",
+    )
+
+
+def claim_pdf_jobs(limit, *, max_attempts=PDF_MAX_ATTEMPTS):
+    """
+    Mark up to ``limit`` due jobs as running and return their ids. Rows are
+    locked with SKIP LOCKED so several workers never claim the same job.
+    """
+    with transaction.atomic():
+        job_ids = list(
+            PdfRenderJob.objects.select_for_update(skip_locked=True)
+            .filter(status="pending", next_attempt_at__lte=timezone.now(), attempts__lt=max_attempts)
+            .order_by("next_attempt_at", "id")
+            .values_list("id", flat=True)[:limit]
+        )
+        if job_ids:
+            PdfRenderJob.objects.filter(id__in=job_ids).update(
+                status="running",
+                started_at=timezone.now(),
+                attempts=F("attempts") + 1,
+            )
+    return job_ids
+
+
+def run_pdf_job(job_id, max_attempts=PDF_MAX_ATTEMPTS):
+    """Render one claimed job and record the outcome. Returns the job's new status."""
+    job = PdfRenderJob.objects.select_related("requested_by").get(pk=job_id)
+
+    try:
+        path, filename = PDF_RENDERERS[job.kind](job)
+    except Exception as exc:
+        logger.exception("PDF render job %s (%s) failed", job.pk, job.kind)
+        job.last_error = str(exc) or exc.__class__.__name__
+        if job.attempts >= max_attempts:
+            job.status = "failed"
+            job.finished_at = timezone.now()
+        else:
+            job.status = "pending"
+            job.next_attempt_at = timezone.now() + timedelta(seconds=PDF_RETRY_BASE_SECONDS * 2 ** (job.attempts - 1))
+        job.save(update_fields=["status", "last_error", "next_attempt_at", "finished_at"])
+        return job.status
+
+    job.status = "done"
+    job.file_path = str(path)
+    job.filename = filename
+    job.last_error = ""
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "file_path", "filename", "last_error", "finished_at"])
+    _notify_pdf_ready(job)
+    return job.status
+
+
+def _close_inherited_connections():
+    # A forked worker must not reuse the parent's database sockets
+    for conn in connections.all(initialized_only=True):
+        conn.connection = None
+
+
+def pdf_process_pool(processes):
+    """
+    A process pool for rendering; ReportLab is CPU-bound, so each process
+    renders on its own core. Call connections.close_all() before submitting,
+    so the workers fork without an open database connection.
+    """
+    context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+    if context is None:
+        # Spawned processes would import models before django.setup(); render in-process instead
+        return None
+    preload_pdf_assets()
+    return ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=_close_inherited_connections)
+
+
+def run_pdf_jobs(job_ids, *, pool=None, max_attempts=PDF_MAX_ATTEMPTS):
+    """Run claimed jobs, across ``pool`` when given. Returns a {status: count} summary."""
+    summary = {"done": 0, "pending": 0, "failed": 0}
+    if pool is None:
+        statuses = [run_pdf_job(job_id, max_attempts) for job_id in job_ids]
+    else:
+        connections.close_all()
+        statuses = list(pool.map(run_pdf_job, job_ids, [max_attempts] * len(job_ids)))
+
+    for status in statuses:
+        summary[status] = summary.get(status, 0) + 1
+    return summary
+
+
+def requeue_stale_pdf_jobs(minutes, *, max_attempts=PDF_MAX_ATTEMPTS):
+    """
+    Return jobs left running by a worker that died to the queue, or fail them
+    once they have used up their attempts. Returns the number requeued.
+    """
+    now = timezone.now()
+    stale = PdfRenderJob.objects.filter(status="running", started_at__lt=now - timedelta(minutes=minutes))
+    stale.filter(attempts__gte=max_attempts).update(
+        status="failed",
+        last_error="Worker stopped while rendering.",
+        finished_at=now,
+    )
+    return stale.update(status="pending", next_attempt_at=now)
+
+
+def purge_pdf_jobs(keep_days):
+    """Delete finished jobs older than ``keep_days`` and their output files."""
+    cutoff = timezone.now() - timedelta(days=keep_days)
+    jobs = PdfRenderJob.objects.filter(status__in=["done", "failed"], finished_at__lt=cutoff)
+
+    output_dir = pdf_job_output_dir()
+    for token in jobs.values_list("token", flat=True):
+        # Invoice jobs point into the invoice PDF store, which evict_invoice_pdfs manages
+        shutil.rmtree(output_dir / str(token), ignore_errors=True)
+
+    deleted, _ = jobs.delete()
+    return deleted
+
+
+def pdf_job_response(job):
+    path = Path(job.file_path)
+    if invoice_pdf_cache_dir() in path.parents:
+        return invoice_pdf_response(path, job.filename)
+    return FileResponse(open(path, "rb"), as_attachment=True, filename=job.filename, content_type="application/pdf")
@@ -1,11 +1,14 @@
 import logging
+from datetime import timedelta
 from typing import Iterable
 
 from django.conf import settings
+from django.db import transaction
+from django.db.models import F
 from django.urls import reverse
 from django.utils import timezone
 
-from .models import Customer, PushDevice
+from .models import Customer, PushDevice, PushNotificationOutbox
 
 logger = logging.getLogger(__name__)
 
@@ -66,6 +69,35 @@ def _should_disable_token(exc: Exception) -> bool:
     )
 
 
+# FCM accepts at most 500 tokens per multicast request
+FCM_MULTICAST_LIMIT = 500
+
+
+def _platform_config(messaging, device_type, *, title, body, tag):
+    if device_type == "android":
+        return {
+            "android": messaging.AndroidConfig(
+                priority="high",
+                notification=messaging.AndroidNotification(
+                    title=title,
+                    body=body,
+                    channel_id="default",
+                ),
+            )
+        }
+    return {
+        "webpush": messaging.WebpushConfig(
+            notification=messaging.WebpushNotification(
+                title=title,
+                body=body,
+                icon="/static/android-chrome-192x192.png",
+                badge="/static/favicon-32x32.png",
+                tag=tag,
+            ),
+        )
+    }
+
+
 def send_push_to_devices(
     devices: Iterable[PushDevice],
     *,
@@ -74,57 +106,86 @@ def send_push_to_devices(
     data=None,
     tag: str = "svd-update",
 ):
+    """
+    Send one notification to many devices using FCM multicast batches.
+
+    Devices are grouped by type because Android and web payloads differ.
+    Returns sent/failed counts plus one result dict per device token.
+    """
     app, messaging, _firebase_admin = _firebase_components()
     if not app or not messaging:
-        return {"sent": 0, "failed": 0}
+        return {"sent": 0, "failed": 0, "results": []}
 
     payload = _normalize_payload(data)
-    sent = 0
-    failed = 0
-
+    devices_by_type = {}
     for device in devices:
-        try:
-            message_kwargs = {
-                "token": device.token,
-                "notification": messaging.Notification(title=title, body=body),
-                "data": payload,
-            }
-
-            if device.device_type == "android":
-                message_kwargs["android"] = messaging.AndroidConfig(
-                    priority="high",
-                    notification=messaging.AndroidNotification(
-                        title=title,
-                        body=body,
-                        channel_id="default",
-                    ),
-                )
-            else:
-                message_kwargs["webpush"] = messaging.WebpushConfig(
-                    notification=messaging.WebpushNotification(
-                        title=title,
-                        body=body,
-                        icon="/static/android-chrome-192x192.png",
-                        badge="/static/favicon-32x32.png",
-                        tag=tag,
-                    ),
-                )
-
-            message = messaging.Message(
-                **message_kwargs,
+        device_type = "android" if device.device_type == "android" else "web"
+        devices_by_type.setdefault(device_type, []).append(device)
+
+    results = []
+    delivered_ids = []
+    disabled_ids = []
+
+    for device_type, typed_devices in devices_by_type.items():
+        platform_config = _platform_config(messaging, device_type, title=title, body=body, tag=tag)
+
+        for start in range(0, len(typed_devices), FCM_MULTICAST_LIMIT):
+            batch = typed_devices[start:start + FCM_MULTICAST_LIMIT]
+            message = messaging.MulticastMessage(
+                tokens=[device.token for device in batch],
+                notification=messaging.Notification(title=title, body=body),
+                data=payload,
+                **platform_config,
             )
-            messaging.send(message, app=app)
-            sent += 1
-            device.last_seen_at = timezone.now()
-            device.save(update_fields=["last_seen_at", "updated_at"])
-        except Exception as exc:
-            failed += 1
-            logger.warning("Failed to send push notification to device %s: %s", device.id, exc)
-            if _should_disable_token(exc):
-                device.is_active = False
-                device.save(update_fields=["is_active", "updated_at"])
 
-    return {"sent": sent, "failed": failed}
+            try:
+                responses = messaging.send_each_for_multicast(message, app=app).responses
+            except Exception as exc:
+                logger.warning("Failed to send push notification batch of %s %s device(s): %s", len(batch), device_type, exc)
+                responses = [None] * len(batch)
+                batch_error = exc
+            else:
+                batch_error = None
+
+            for device, response in zip(batch, responses):
+                if response is not None and response.success:
+                    delivered_ids.append(device.id)
+                    results.append({
+                        "device_id": device.id,
+                        "token": device.token,
+                        "success": True,
+                        "message_id": response.message_id,
+                        "error": "",
+                        "deactivated": False,
+                    })
+                    continue
+
+                exc = response.exception if response is not None else batch_error
+                deactivated = response is not None and _should_disable_token(exc)
+                if deactivated:
+                    disabled_ids.append(device.id)
+                if response is not None:
+                    logger.warning("Failed to send push notification to device %s: %s", device.id, exc)
+                results.append({
+                    "device_id": device.id,
+                    "token": device.token,
+                    "success": False,
+                    "message_id": None,
+                    "error": str(exc),
+                    "deactivated": deactivated,
+                })
+
+    now = timezone.now()
+    if delivered_ids:
+        PushDevice.objects.filter(id__in=delivered_ids).update(last_seen_at=now, updated_at=now)
+    if disabled_ids:
+        PushDevice.objects.filter(id__in=disabled_ids).update(is_active=False, updated_at=now)
+
+    return {
+        "sent": len(delivered_ids),
+        "failed": len(results) - len(delivered_ids),
+        "results": results,
+    }
 
 
 def send_customer_push(customer, *, title: str, body: str, data=None, tag: str = "svd-update"):
@@ -135,7 +196,7 @@ def send_customer_push(customer, *, title: str, body: str, data=None, tag: str =
         )
     )
     if not devices:
-        return {"sent": 0, "failed": 0}
+        return {"sent": 0, "failed": 0, "results": []}
     return send_push_to_devices(devices, title=title, body=body, data=data, tag=tag)
 
 
@@ -147,10 +208,156 @@ def send_admin_push(*, title: str, body: str, data=None, tag: str = "admin-updat
     admin_ids = list(_admin_queryset().values_list("id", flat=True).distinct())
     devices = list(PushDevice.objects.filter(customer_id__in=admin_ids, is_active=True))
     if not devices:
-        return {"sent": 0, "failed": 0}
+        return {"sent": 0, "failed": 0, "results": []}
     return send_push_to_devices(devices, title=title, body=body, data=data, tag=tag)
 
 
+# Retry delays grow as PUSH_RETRY_BASE_SECONDS * 2 ** (attempt - 1)
+PUSH_RETRY_BASE_SECONDS = 30
+PUSH_MAX_ATTEMPTS = 5
+
+
+def queue_push(*, audience: str, title: str, body: str, data=None, tag: str = "", customer=None):
+    """
+    Write a push to the outbox for run_push_worker to deliver.
+
+    Called inside the caller's transaction so the push only exists if the change commits.
+    A still-pending push for the same recipient and tag is replaced rather than duplicated.
+    """
+    payload = _normalize_payload(data)
+    if tag:
+        entry = (
+            PushNotificationOutbox.objects.filter(status="pending", audience=audience, customer=customer, tag=tag)
+            .order_by("id")
+            .first()
+        )
+        if entry:
+            entry.title = title
+            entry.body = body
+            entry.data = payload
+            entry.save(update_fields=["title", "body", "data"])
+            return entry
+
+    return PushNotificationOutbox.objects.create(
+        audience=audience,
+        customer=customer,
+        title=title,
+        body=body,
+        data=payload,
+        tag=tag,
+    )
+
+
+def queue_customer_push(customer, *, title: str, body: str, data=None, tag: str = "svd-update"):
+    return queue_push(audience="customer", customer=customer, title=title, body=body, data=data, tag=tag)
+
+
+def queue_admin_push(*, title: str, body: str, data=None, tag: str = "admin-update"):
+    return queue_push(audience="admin", title=title, body=body, data=data, tag=tag)
+
+
+def push_delivery_available():
+    app, messaging, _firebase_admin = _firebase_components()
+    return bool(app and messaging)
+
+
+def _deliver_outbox_entry(entry):
+    if entry.audience == "admin":
+        return send_admin_push(title=entry.title, body=entry.body, data=entry.data, tag=entry.tag)
+    return send_customer_push(entry.customer, title=entry.title, body=entry.body, data=entry.data, tag=entry.tag)
+
+
+def claim_push_outbox(limit, *, max_attempts: int = PUSH_MAX_ATTEMPTS):
+    """
+    Mark up to ``limit`` due outbox rows as sending and return their ids. Rows
+    are locked with SKIP LOCKED so several workers never claim the same push.
+    """
+    with transaction.atomic():
+        entry_ids = list(
+            PushNotificationOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status="pending", next_attempt_at__lte=timezone.now(), attempts__lt=max_attempts)
+            .order_by("next_attempt_at", "id")
+            .values_list("id", flat=True)[:limit]
+        )
+        if entry_ids:
+            PushNotificationOutbox.objects.filter(id__in=entry_ids).update(
+                status="sending",
+                claimed_at=timezone.now(),
+                attempts=F("attempts") + 1,
+            )
+    return entry_ids
+
+
+def send_outbox_entry(entry_id, *, max_attempts: int = PUSH_MAX_ATTEMPTS):
+    """Send one claimed outbox row and record the outcome. Returns the row's new status."""
+    entry = PushNotificationOutbox.objects.select_related("customer").get(pk=entry_id)
+
+    try:
+        result = _deliver_outbox_entry(entry)
+    except Exception as exc:
+        logger.warning("Push outbox entry %s could not be delivered: %s", entry.id, exc)
+        result = None
+        error = str(exc)
+    else:
+        # A push that reached some devices is not retried, to avoid duplicates
+        failures = [row["error"] for row in result["results"] if not row["success"]]
+        error = failures[0] if failures and not result["sent"] else ""
+
+    now = timezone.now()
+    if result is not None:
+        entry.sent_count = result["sent"]
+        entry.failed_count = result["failed"]
+
+    if not error:
+        entry.status = "sent"
+        entry.sent_at = now
+        entry.last_error = ""
+    else:
+        entry.last_error = error
+        if entry.attempts >= max_attempts:
+            entry.status = "failed"
+        else:
+            entry.status = "pending"
+            entry.next_attempt_at = now + timedelta(seconds=PUSH_RETRY_BASE_SECONDS * 2 ** (entry.attempts - 1))
+
+    entry.save(update_fields=[
+        "status", "next_attempt_at", "last_error",
+        "sent_count", "failed_count", "sent_at",
+    ])
+    return entry.status
+
+
+def process_push_outbox(*, batch_size: int = 50, max_attempts: int = PUSH_MAX_ATTEMPTS):
+    """
+    Deliver one batch of due outbox rows.
+
+    The batch is claimed in a short transaction and sent outside it, so no
+    row lock or transaction is held across FCM calls, and each result is
+    saved on its own; a crash mid-batch leaves the unsent rows in "sending"
+    for fail_stalled_pushes rather than rolling back pushes already sent.
+    """
+    summary = {"processed": 0, "sent": 0, "retried": 0, "failed": 0}
+    outcomes = {"sent": "sent", "pending": "retried", "failed": "failed"}
+
+    for entry_id in claim_push_outbox(batch_size, max_attempts=max_attempts):
+        summary["processed"] += 1
+        summary[outcomes[send_outbox_entry(entry_id, max_attempts=max_attempts)]] += 1
+
+    return summary
+
+
+def fail_stalled_pushes(minutes):
+    """
+    Fail rows left sending this long by a worker that stopped. They are not
+    retried: the push may already have gone out. Returns the number failed.
+    """
+    now = timezone.now()
+    return PushNotificationOutbox.objects.filter(
+        status="sending",
+        claimed_at__lt=now - timedelta(minutes=minutes),
+    ).update(status="failed", last_error="Worker stopped while sending; not retried to avoid a duplicate push.")
+
+
 def _order_detail_url(order):
     if getattr(order.customer, "user_type", "").lower() == "user":
         return reverse("users:order_detail", args=[order.id])
@@ -164,7 +371,7 @@ def _subscription_url(subscription_order):
 
 
 def notify_order_confirmed(order):
-    return send_customer_push(
+    return queue_customer_push(
         order.customer,
         title="Order Confirmed",
         body=f"Your order {order.order_number} has been confirmed.",
@@ -180,7 +387,7 @@ def notify_order_confirmed(order):
 
 
 def notify_order_rejected(order):
-    return send_customer_push(
+    return queue_customer_push(
         order.customer,
         title="Order Update",
         body=f"Your order {order.order_number} was rejected. Please contact support if needed.",
@@ -197,7 +404,7 @@ def notify_order_rejected(order):
 
 def notify_order_delivery_status(order, status):
     readable_status = str(status or "pending").replace("_", " ").title()
-    return send_customer_push(
+    return queue_customer_push(
         order.customer,
         title="Delivery Update",
         body=f"Order {order.order_number} is now {readable_status}.",
@@ -216,7 +423,7 @@ def notify_subscription_delivery_status(subscription_delivery, status):
     subscription_order = subscription_delivery.subscription_order
     item_name = getattr(getattr(subscription_order, "item", None), "name", "subscription item")
     readable_status = str(status or "pending").replace("_", " ").title()
-    return send_customer_push(
+    return queue_customer_push(
         subscription_order.customer,
         title="Subscription Delivery Update",
         body=f"{item_name} is now {readable_status}.",
@@ -232,7 +439,7 @@ def notify_subscription_delivery_status(subscription_delivery, status):
 
 def notify_admin_order_placed(order):
     actor_type = "User" if getattr(order.customer, "user_type", "").lower() == "user" else "Retailer"
-    return send_admin_push(
+    return queue_admin_push(
         title="New Order Placed",
         body=f"{actor_type} {order.customer.name} placed order {order.order_number}.",
         data={
@@ -249,7 +456,7 @@ def notify_admin_order_placed(order):
 
 def notify_admin_order_updated(order):
     actor_type = "User" if getattr(order.customer, "user_type", "").lower() == "user" else "Retailer"
-    return send_admin_push(
+    return queue_admin_push(
         title="Order Updated",
         body=f"{actor_type} {order.customer.name} updated order {order.order_number}.",
         data={
@@ -266,7 +473,7 @@ def notify_admin_order_updated(order):
 
 def notify_admin_order_deleted(customer, order_id):
     actor_type = "User" if getattr(customer, "user_type", "").lower() == "user" else "Retailer"
-    return send_admin_push(
+    return queue_admin_push(
         title="Order Deleted",
         body=f"{actor_type} {customer.name} deleted order #{order_id}.",
         data={
@@ -281,7 +488,7 @@ def notify_admin_order_deleted(customer, order_id):
 
 
 def notify_admin_enquiry_created(contact):
-    return send_admin_push(
+    return queue_admin_push(
         title="New Enquiry",
         body=f"{contact.name} submitted an enquiry: {contact.subject}.",
         data={
@@ -296,7 +503,7 @@ def notify_admin_enquiry_created(contact):
 
 
 def notify_admin_payment_recorded(payment):
-    return send_admin_push(
+    return queue_admin_push(
         title="Customer Payment Recorded",
         body=f"{payment.customer.name} recorded a payment of Rs. {payment.amount}.",
         data={
@@ -312,7 +519,7 @@ def notify_admin_payment_recorded(payment):
 
 def notify_admin_profile_updated(customer):
     portal_url = reverse("customer_portal:update_profile") if getattr(customer, "user_type", "").lower() != "user" else reverse("users:dashboard")
-    return send_admin_push(
+    return queue_admin_push(
         title="Profile Updated",
         body=f"{customer.name} updated profile details.",
         data={
@@ -330,7 +537,7 @@ def notify_admin_subscription_action(customer, action, reason=""):
     body = f"{customer.name} {readable.lower()} their subscription."
     if reason:
         body = f"{body} Reason: {reason}"
-    return send_admin_push(
+    return queue_admin_push(
         title=f"Subscription {readable}",
         body=body,
         data={
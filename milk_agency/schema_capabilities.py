@@ -0,0 +1,73 @@
+import logging
+import threading
+import time
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+# A table found missing is looked for again after this long, so a process that
+# started before a migration ran picks the table up without a restart
+MISSING_RECHECK_SECONDS = 300
+
+_lock = threading.Lock()
+_table_names = {}
+_queryable = {}
+
+
+def _introspect(model, using):
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if using not in _table_names:
+            _table_names[using] = set(connection.introspection.table_names(cursor))
+        if model._meta.db_table not in _table_names[using]:
+            return False
+        description = connection.introspection.get_table_description(cursor, model._meta.db_table)
+
+    db_columns = {column.name for column in description}
+    model_columns = {
+        field.column
+        for field in model._meta.local_concrete_fields
+        if getattr(field, "column", None)
+    }
+    return model_columns.issubset(db_columns)
+
+
+def model_is_queryable(model, using=DEFAULT_DB_ALIAS):
+    """
+    Whether ``model``'s table exists with every column the model declares.
+
+    The schema is introspected once per process, not on each request. A
+    model that is present stays cached until refresh_schema_capabilities()
+    runs after migrate. A missing model is checked again after
+    MISSING_RECHECK_SECONDS.
+    """
+    key = (using, model._meta.label_lower)
+    cached = _queryable.get(key)
+    if cached is not None and (cached[0] or time.monotonic() - cached[1] < MISSING_RECHECK_SECONDS):
+        return cached[0]
+
+    with _lock:
+        if cached is not None:
+            # Re-read the table list for a recheck; other models keep their answers
+            _table_names.pop(using, None)
+        try:
+            result = _introspect(model, using)
+        except Exception as exc:
+            # Not cached: a database that is briefly unreachable should not disable features
+            logger.warning("Could not introspect the table for %s: %s", model._meta.label, exc)
+            return False
+        _queryable[key] = (result, time.monotonic())
+    return result
+
+
+def refresh_schema_capabilities(using=None):
+    """Forget cached answers, for one database alias or all of them."""
+    with _lock:
+        if using is None:
+            _table_names.clear()
+            _queryable.clear()
+            return
+        _table_names.pop(using, None)
+        for key in [key for key in _queryable if key[0] == using]:
+            del _queryable[key]
@@ -0,0 +1,84 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+
+from .models import BillItem, Item, StockMovement
+
+
+def stock_movement(item_id, quantity, reason, *, bill=None, stock_entry=None, leakage=None, note=''):
+    """Build an unsaved StockMovement for apply_stock_movements."""
+    return StockMovement(
+        item_id=item_id,
+        quantity=int(quantity),
+        reason=reason,
+        bill=bill,
+        stock_entry=stock_entry,
+        leakage=leakage,
+        note=note[:255],
+    )
+
+
+def apply_stock_movements(movements):
+    """
+    Record movements and apply them to Item.stock_quantity.
+
+    Rows are bulk inserted and every touched item is moved by a single
+    ``UPDATE ... SET stock_quantity = stock_quantity + CASE ...`` statement,
+    so concurrent writers never overwrite each other's changes.
+    Returns {item_id: net change}.
+    """
+    movements = [movement for movement in movements if movement.quantity]
+    if not movements:
+        return {}
+
+    deltas = defaultdict(int)
+    for movement in movements:
+        deltas[movement.item_id] += movement.quantity
+
+    with transaction.atomic():
+        StockMovement.objects.bulk_create(movements, batch_size=500)
+        changed = {item_id: delta for item_id, delta in deltas.items() if delta}
+        if changed:
+            Item.objects.filter(pk__in=changed).update(
+                stock_quantity=F('stock_quantity') + Case(
+                    *[When(pk=item_id, then=Value(delta)) for item_id, delta in changed.items()],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                )
+            )
+
+    return dict(deltas)
+
+
+def record_stock_movement(item, quantity, reason, **kwargs):
+    """Apply one movement and keep ``item.stock_quantity`` in step with the database."""
+    deltas = apply_stock_movements([stock_movement(item.pk, quantity, reason, **kwargs)])
+    if deltas:
+        item.refresh_from_db(fields=['stock_quantity'])
+    return item
+
+
+def set_stock_quantity(item, quantity, note=''):
+    """Move an item to an absolute stock level by recording the difference as an adjustment."""
+    with transaction.atomic():
+        current = Item.objects.select_for_update().values_list('stock_quantity', flat=True).get(pk=item.pk)
+        record_stock_movement(item, int(quantity) - current, 'adjustment', note=note)
+    item.stock_quantity = int(quantity)
+    return item
+
+
+def restore_bill_stock(bill):
+    """Put a bill's quantities back into stock before its items are replaced or deleted."""
+    return apply_stock_movements(
+        stock_movement(item_id, quantity, 'bill_restore', bill=bill)
+        for item_id, quantity in BillItem.objects.filter(bill=bill).values_list('item_id', 'quantity')
+    )
+
+
+def ledger_stock_quantities(item_ids=None):
+    """Return {item_id: sum of movements} for the given items (all items when omitted)."""
+    movements = StockMovement.objects.all()
+    if item_ids is not None:
+        movements = movements.filter(item_id__in=item_ids)
+    return dict(movements.order_by().values('item_id').annotate(total=Sum('quantity')).values_list('item_id', 'total'))
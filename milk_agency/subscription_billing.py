@@ -3,37 +3,34 @@ from collections import defaultdict
 from decimal import Decimal
 
 from django.db import transaction
+from django.db.models import Prefetch
 from django.utils import timezone
 
 from milk_agency.models import (
     Bill,
     BillItem,
     CustomerSubscription,
+    DeliveryTask,
     SubscriptionDelivery,
     SubscriptionItem,
     SubscriptionOrder,
+    SubscriptionPause,
 )
-
-
-def _build_invoice_number():
-    base = timezone.now().strftime("INV-%Y%m%d%H%M%S")
-    invoice_number = base
-    suffix = 1
-    while Bill.objects.filter(invoice_number=invoice_number).exists():
-        invoice_number = f"{base}-{suffix}"
-        suffix += 1
-    return invoice_number
+from milk_agency.bill_builder import refresh_cached_due
+from milk_agency.invoice_numbers import allocate_invoice_numbers
+from milk_agency.stock_ledger import apply_stock_movements, stock_movement
 
 
 def _is_subscription_paused(subscription, target_date):
-    return subscription.pauses.filter(
-        pause_date__lte=target_date,
-        is_resumed=False,
-    ).exists() or subscription.pauses.filter(
-        pause_date__lte=target_date,
-        is_resumed=True,
-        resume_date__gt=target_date,
-    ).exists()
+    """Check pause windows against the prefetched ``pauses`` without extra queries."""
+    for pause in subscription.pauses.all():
+        if pause.pause_date > target_date:
+            continue
+        if not pause.is_resumed:
+            return True
+        if pause.resume_date and pause.resume_date > target_date:
+            return True
+    return False
 
 
 def _is_plan_item_due(subscription, plan_item, target_date):
@@ -56,73 +53,124 @@ def _is_plan_item_due(subscription, plan_item, target_date):
 
 
 def generate_daily_subscription_orders(target_date=None):
+    """
+    Create the SubscriptionOrder (and SubscriptionDelivery) rows due on target_date.
+
+    Pauses and due-ness are evaluated in memory from prefetched data and rows are
+    inserted in bulk, so the run costs a fixed number of queries. Returns the
+    number of orders created.
+    """
     target_date = target_date or timezone.localdate()
 
-    subscriptions = (
+    subscriptions = list(
         CustomerSubscription.objects.filter(
             is_active=True,
             start_date__lte=target_date,
             end_date__gte=target_date,
         )
-        .select_related("customer", "subscription_plan")
-        .prefetch_related("subscription_plan__items", "pauses")
+        .select_related("subscription_plan")
+        .prefetch_related(
+            "subscription_plan__items",
+            Prefetch("pauses", queryset=SubscriptionPause.objects.filter(pause_date__lte=target_date)),
+        )
     )
 
-    created_orders = 0
+    existing = set(
+        SubscriptionOrder.objects.filter(
+            date=target_date,
+            subscription_id__in=[subscription.id for subscription in subscriptions],
+        ).values_list("subscription_id", "item_id")
+    )
 
+    new_orders = []
     for subscription in subscriptions:
         if _is_subscription_paused(subscription, target_date):
             continue
 
-        for plan_item in subscription.subscription_plan.items.select_related("item").all():
+        for plan_item in subscription.subscription_plan.items.all():
+            if (subscription.id, plan_item.item_id) in existing:
+                continue
             if not _is_plan_item_due(subscription, plan_item, target_date):
                 continue
 
-            _, created = SubscriptionOrder.objects.get_or_create(
-                subscription=subscription,
-                customer=subscription.customer,
-                item=plan_item.item,
-                date=target_date,
-                defaults={"quantity": plan_item.quantity},
+            existing.add((subscription.id, plan_item.item_id))
+            new_orders.append(
+                SubscriptionOrder(
+                    subscription=subscription,
+                    customer_id=subscription.customer_id,
+                    item_id=plan_item.item_id,
+                    date=target_date,
+                    quantity=plan_item.quantity,
+                )
             )
-            if created:
-                created_orders += 1
 
-    return created_orders
+    with transaction.atomic():
+        # ignore_conflicts covers a concurrent run racing on (subscription, item, date)
+        SubscriptionOrder.objects.bulk_create(new_orders, batch_size=500, ignore_conflicts=True)
+
+        # bulk_create skips the post_save signal that normally creates the delivery row
+        missing_delivery_ids = SubscriptionOrder.objects.filter(
+            date=target_date,
+            delivery_tracking__isnull=True,
+        ).values_list("id", flat=True)
+        SubscriptionDelivery.objects.bulk_create(
+            [SubscriptionDelivery(subscription_order_id=order_id) for order_id in missing_delivery_ids],
+            batch_size=500,
+            ignore_conflicts=True,
+        )
+        # The same goes for the signals that keep DeliveryTask in step
+        DeliveryTask.sync_subscription_orders(
+            SubscriptionOrder.objects.filter(date=target_date, delivery_task__isnull=True).values_list("id", flat=True)
+        )
 
+    return len(new_orders)
 
-def _get_subscription_item(order):
-    return SubscriptionItem.objects.get(
-        subscription_plan=order.subscription.subscription_plan,
-        item=order.item,
-    )
+
+def _plan_prices(plan_ids):
+    """Return {(plan_id, item_id): price} for the given subscription plans."""
+    return {
+        (plan_id, item_id): Decimal(price or 0)
+        for plan_id, item_id, price in SubscriptionItem.objects.filter(
+            subscription_plan_id__in=plan_ids,
+        ).values_list("subscription_plan_id", "item_id", "price")
+    }
 
 
-def _get_existing_bill_for_customer(customer, target_date):
-    delivery = (
+def _existing_bills_by_customer(customer_ids, target_date):
+    """Return {customer_id: Bill} for subscription bills already created on target_date."""
+    bills = {}
+    deliveries = (
         SubscriptionDelivery.objects.select_related("bill")
         .filter(
-            subscription_order__customer=customer,
+            subscription_order__customer_id__in=customer_ids,
             subscription_order__date=target_date,
             bill__isnull=False,
         )
         .order_by("bill_id")
-        .first()
     )
-    return delivery.bill if delivery else None
+    for delivery in deliveries:
+        bills.setdefault(delivery.subscription_order.customer_id, delivery.bill)
+    return bills
 
 
 def generate_subscription_delivery_bills(target_date=None):
+    """
+    Bill every unbilled subscription delivery on target_date, one bill per customer.
+
+    Plan prices and existing bills are preloaded, bill lines are bulk-created, stock
+    is decremented with one aggregated UPDATE per item and delivery links are
+    bulk-updated.
+    """
     target_date = target_date or timezone.localdate()
     generate_daily_subscription_orders(target_date)
 
     deliveries = (
         SubscriptionDelivery.objects.select_related(
             "subscription_order__customer",
-            "subscription_order__subscription__subscription_plan",
+            "subscription_order__subscription",
             "subscription_order__item",
         )
-        .filter(subscription_order__date=target_date)
+        .filter(subscription_order__date=target_date, bill__isnull=True)
         .order_by("subscription_order__customer__name", "subscription_order__id")
     )
 
@@ -130,22 +178,56 @@ def generate_subscription_delivery_bills(target_date=None):
     for delivery in deliveries:
         deliveries_by_customer[delivery.subscription_order.customer_id].append(delivery)
 
+    if not deliveries_by_customer:
+        return {"date": target_date, "created_bills": 0, "linked_deliveries": 0}
+
+    prices = _plan_prices({
+        delivery.subscription_order.subscription.subscription_plan_id
+        for customer_deliveries in deliveries_by_customer.values()
+        for delivery in customer_deliveries
+    })
+
     created_bills = 0
-    linked_deliveries = 0
+    linked_deliveries = []
+    bill_items = []
+    stock_movements = []
+
+    billable = []
+    for customer_id, customer_deliveries in deliveries_by_customer.items():
+        lines = []
+        total_increment = Decimal("0.00")
+        profit_increment = Decimal("0.00")
+
+        for delivery in customer_deliveries:
+            order = delivery.subscription_order
+            price = prices.get((order.subscription.subscription_plan_id, order.item_id))
+            if price is None:
+                # Item is no longer part of the plan; leave the delivery unbilled
+                continue
 
-    for customer_deliveries in deliveries_by_customer.values():
-        unbilled_deliveries = [delivery for delivery in customer_deliveries if delivery.bill_id is None]
-        if not unbilled_deliveries:
-            continue
+            qty = Decimal(order.quantity or 0)
+            line_total = price * qty
+            total_increment += line_total
+            profit_increment += (Decimal(order.item.selling_price) - Decimal(order.item.buying_price)) * qty
+            lines.append((delivery, price, line_total))
+
+        if lines:
+            billable.append((customer_id, lines, total_increment, profit_increment))
 
-        customer = customer_deliveries[0].subscription_order.customer
+    with transaction.atomic():
+        existing_bills = _existing_bills_by_customer(deliveries_by_customer.keys(), target_date)
+        # Reserve one block of invoice numbers for every bill this run creates
+        invoice_numbers = iter(allocate_invoice_numbers(
+            sum(1 for row in billable if row[0] not in existing_bills)
+        ))
 
-        with transaction.atomic():
-            bill = _get_existing_bill_for_customer(customer, target_date)
+        for customer_id, lines, total_increment, profit_increment in billable:
+            bill = existing_bills.get(customer_id)
             if bill is None:
-                bill = Bill.objects.create(
+                customer = lines[0][0].subscription_order.customer
+                bill = Bill(
                     customer=customer,
-                    invoice_number=_build_invoice_number(),
+                    invoice_number=next(invoice_numbers),
                     invoice_date=target_date,
                     total_amount=Decimal("0.00"),
                     op_due_amount=customer.due,
@@ -154,45 +236,42 @@ def generate_subscription_delivery_bills(target_date=None):
                 )
                 created_bills += 1
 
-            total_increment = Decimal("0.00")
-            profit_increment = Decimal("0.00")
+            bill.total_amount = (bill.total_amount or Decimal("0.00")) + total_increment
+            bill.profit = (bill.profit or Decimal("0.00")) + profit_increment
+            if bill.pk:
+                bill.save(update_fields=["total_amount", "profit"])
+            else:
+                bill.save()
 
-            for delivery in unbilled_deliveries:
+            for delivery, price, line_total in lines:
                 order = delivery.subscription_order
-                plan_item = _get_subscription_item(order)
-                price = Decimal(plan_item.price or 0)
-                qty = Decimal(order.quantity or 0)
-                line_total = price * qty
-                line_profit = (Decimal(order.item.selling_price) - Decimal(order.item.buying_price)) * qty
-
-                BillItem.objects.create(
-                    bill=bill,
-                    item=order.item,
-                    price_per_unit=price,
-                    discount=Decimal("0.00"),
-                    quantity=order.quantity,
-                    total_amount=line_total,
+                bill_items.append(
+                    BillItem(
+                        bill=bill,
+                        item_id=order.item_id,
+                        price_per_unit=price,
+                        discount=Decimal("0.00"),
+                        quantity=order.quantity,
+                        total_amount=line_total,
+                    )
                 )
-
-                order.item.stock_quantity -= order.quantity
-                order.item.save(update_fields=["stock_quantity"])
-
+                stock_movements.append(stock_movement(order.item_id, -(order.quantity or 0), "bill", bill=bill))
                 delivery.bill = bill
-                delivery.save(update_fields=["bill"])
+                linked_deliveries.append(delivery)
 
-                total_increment += line_total
-                profit_increment += line_profit
-                linked_deliveries += 1
+        BillItem.objects.bulk_create(bill_items, batch_size=500)
 
-            bill.total_amount = (bill.total_amount or Decimal("0.00")) + total_increment
-            bill.profit = (bill.profit or Decimal("0.00")) + profit_increment
-            bill.save(update_fields=["total_amount", "profit"])
+        apply_stock_movements(stock_movements)
+
+        SubscriptionDelivery.objects.bulk_update(linked_deliveries, ["bill"], batch_size=500)
 
-            customer.due = customer.get_actual_due()
-            customer.save(update_fields=["due"])
+        # Bill saves keep CustomerLedger current; copy its balance into the cached due
+        billed_customer_ids = {delivery.subscription_order.customer_id for delivery in linked_deliveries}
+        # The monthly rollups queued by the bill saves are rebuilt on commit, after these items
+        refresh_cached_due(billed_customer_ids)
 
     return {
         "date": target_date,
         "created_bills": created_bills,
-        "linked_deliveries": linked_deliveries,
+        "linked_deliveries": len(linked_deliveries),
     }
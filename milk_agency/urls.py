@@ -51,7 +51,9 @@ urlpatterns = [
 
     # Bills URLs
     path('bills/', views_bills.bills_dashboard, name='bills_dashboard'),
+    path('bills/export/', views_bills.export_bills, name='export_bills'),
     path('generate-bill/', views_bills.generate_bill, name='generate_bill'),
+    path('route-billing/', views_bills.route_billing, name='route_billing'),
     path('generate-invoice-pdf/<int:bill_id>/', views_bills.generate_invoice_pdf, name='generate_invoice_pdf'),
 
     # Bills Modification URLs
@@ -3,36 +3,39 @@ from datetime import datetime
 from calendar import month_name
 from django.conf import settings
 from django.db import transaction
-from django.db.models import Sum
+from django.db.models import Q, Sum
 from django.utils import timezone
 
 from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
-from django.contrib import messages
-from .models import Item, BillItem, Customer, DailyPayment, MonthlyPaymentSummary, StockInEntry
+from .item_units import bill_item_liters
+from .models import BillItem, Customer, CustomerMonthlyCommission, DailyPayment, MonthlyPaymentSummary, StockInEntry
+from .bill_builder import parse_bill_rows, price_bill_lines, save_bill_lines
+from .stock_ledger import record_stock_movement
 
 class InvoicePDFUtils:
     """
-    Utility class for managing invoice PDF directory structure
+    Utility class for managing invoice PDF directory structure.
+
+    Paths follow the bill's invoice date (falling back to today), so a PDF
+    saved on one day can still be found on another.
     """
 
     @staticmethod
-    def get_invoice_pdf_directory():
+    def _date_parts(invoice_date=None):
+        day = invoice_date or datetime.now()
+        year_str = day.strftime('%Y')
+        month_name_str = month_name[day.month]  # Full month name
+        date_str = day.strftime('%d-%m-%Y')  # Full date format
+        return year_str, month_name_str, date_str
+
+    @staticmethod
+    def get_invoice_pdf_directory(invoice_date=None):
         """
-        Get the directory path for saving invoice PDFs based on current date
+        Get the directory path for saving invoice PDFs
         Structure: media/year/full month/full date/
         """
-        today = datetime.now()
-        year_str = today.strftime('%Y')
-        month_name_str = month_name[today.month]  # Full month name
-        today_date_str = today.strftime('%d-%m-%Y')  # Full date format
-
         # Create directory path: year/full month/full date
-        pdf_dir = os.path.join(
-            settings.MEDIA_ROOT,
-            year_str,
-            month_name_str,
-            today_date_str
-        )
+        pdf_dir = os.path.join(settings.MEDIA_ROOT, *InvoicePDFUtils._date_parts(invoice_date))
 
         # Ensure directory exists
         if not os.path.exists(pdf_dir):
@@ -41,84 +44,33 @@ class InvoicePDFUtils:
         return pdf_dir
 
     @staticmethod
-    def get_invoice_pdf_path(invoice_number):
+    def get_invoice_pdf_path(invoice_number, invoice_date=None):
         """
         Get the full file path for an invoice PDF
         """
-        directory = InvoicePDFUtils.get_invoice_pdf_directory()
+        directory = InvoicePDFUtils.get_invoice_pdf_directory(invoice_date)
         filename = f"{invoice_number}.pdf"
         return os.path.join(directory, filename)
 
     @staticmethod
-    def get_invoice_pdf_url(invoice_number):
+    def get_invoice_pdf_url(invoice_number, invoice_date=None):
         """
         Get the URL path for an invoice PDF
         """
-        today = datetime.now()
-        year_str = today.strftime('%Y')
-        month_name_str = month_name[today.month]  # Full month name
-        today_date_str = today.strftime('%d-%m-%Y')  # Full date format
-
-        return f"/media/{year_str}/{month_name_str}/{today_date_str}/{invoice_number}.pdf"
+        return f"{settings.MEDIA_URL}{InvoicePDFUtils.get_invoice_pdf_relative_path(invoice_number, invoice_date)}"
 
     @staticmethod
-    def get_invoice_pdf_relative_path(invoice_number):
+    def get_invoice_pdf_relative_path(invoice_number, invoice_date=None):
         """
         Get the relative path for an invoice PDF
         """
-        today = datetime.now()
-        year_str = today.strftime('%Y')
-        month_name_str = month_name[today.month]  # Full month name
-        today_date_str = today.strftime('%d-%m-%Y')  # Full date format
-
-        return f"{year_str}/{month_name_str}/{today_date_str}/{invoice_number}.pdf"
+        year_str, month_name_str, date_str = InvoicePDFUtils._date_parts(invoice_date)
+        return f"{year_str}/{month_name_str}/{date_str}/{invoice_number}.pdf"
 
 def process_bill_items(bill, item_ids, quantities, discounts):
-    total_bill = Decimal(0)
-    total_profit = Decimal(0)
-
-    for i, item_id in enumerate(item_ids):
-        if item_id and quantities[i]:
-            try:
-                item = Item.objects.get(id=item_id)
-                quantity = int(quantities[i])
-
-                if quantity > 0:
-                    price = item.selling_price
-
-                    discount = 0
-                    if i < len(discounts) and discounts[i]:
-                        try:
-                            discount = float(discounts[i])
-                        except ValueError:
-                            discount = 0
-
-                    total_item_amount = (Decimal(quantity) * price) - (Decimal(discount) * quantity)
-                    item_profit = (Decimal(price) - Decimal(item.buying_price)) * Decimal(quantity) - (Decimal(discount) * Decimal(quantity))
-                    total_profit += item_profit
-
-                    # Update stock quantity by subtracting the bill quantity (allow negative stock)
-                    item.stock_quantity -= quantity
-                    item.save()
-
-                    BillItem.objects.create(
-                        bill=bill,
-                        item=item,
-                        quantity=quantity,
-                        price_per_unit=price,
-                        discount=discount,
-                        total_amount=total_item_amount
-                    )
-
-                    total_bill += total_item_amount
-            except Item.DoesNotExist:
-                messages.error(None, f'Item with ID {item_id} not found.')
-                raise
-            except ValueError:
-                messages.error(None, 'Invalid quantity or price.')
-                raise
-
-    return total_bill, total_profit
+    # Negative stock is allowed, as before
+    lines = price_bill_lines(parse_bill_rows(item_ids, quantities, discounts))
+    return save_bill_lines(bill, lines)
 
 
 def refresh_monthly_payment_summary(target_date):
@@ -224,10 +176,7 @@ def apply_stock_updates(stock_updates, *, entry_date=None):
                 continue
 
             old_quantity = item.stock_quantity
-            item.stock_quantity += quantity_to_stock_units(added_qty)
-            item.save(update_fields=["stock_quantity"])
-
-            StockInEntry.objects.create(
+            entry = StockInEntry.objects.create(
                 item=item,
                 company=item.company,
                 date=target_date,
@@ -235,6 +184,7 @@ def apply_stock_updates(stock_updates, *, entry_date=None):
                 quantity=added_qty,
                 value=stock_value,
             )
+            record_stock_movement(item, quantity_to_stock_units(added_qty), "stock_in", stock_entry=entry)
 
             impacted_changes.append((item.company_id, target_date))
 
@@ -262,8 +212,7 @@ def update_stock_entry(entry, *, crates, discount, date_value):
     quantity_delta = quantity_to_stock_units(added_quantity) - quantity_to_stock_units(entry.quantity)
 
     with transaction.atomic():
-        entry.item.stock_quantity += quantity_delta
-        entry.item.save(update_fields=["stock_quantity"])
+        record_stock_movement(entry.item, quantity_delta, "stock_in_edit", stock_entry=entry)
 
         entry.date = date_value
         entry.company = entry.item.company
@@ -286,8 +235,9 @@ def delete_stock_entry(entry):
     quantity = quantity_to_stock_units(entry.quantity)
 
     with transaction.atomic():
-        entry.item.stock_quantity -= quantity
-        entry.item.save(update_fields=["stock_quantity"])
+        record_stock_movement(
+            entry.item, -quantity, "stock_in_delete", stock_entry=entry, note=f"Stock in entry dated {impacted_date}"
+        )
         entry.delete()
         sync_stock_entry_totals([(impacted_company_id, impacted_date)])
 
@@ -313,27 +263,17 @@ def calculate_monthly_commissions(year, month):
             continue
 
         # Calculate volumes from bills in the specified month
-        bills = Bill.objects.filter(
-            customer=customer,
-            invoice_date__year=year,
-            invoice_date__month=month,
-        ).prefetch_related('items__item')
-
-        milk_volume = Decimal('0')
-        curd_volume = Decimal('0')
-
-        for bill in bills:
-            for bill_item in bill.items.all():
-                category = bill_item.item.category
-                quantity = bill_item.quantity
-                if category and quantity:
-                    category_lower = category.lower()
-                    liters_per_unit = extract_liters_from_name(bill_item.item.name)
-                    total_liters = Decimal(str(liters_per_unit)) * Decimal(str(quantity))
-                    if category_lower == 'milk':
-                        milk_volume += total_liters
-                    elif category_lower == 'curd':
-                        curd_volume += total_liters
+        volumes = BillItem.objects.filter(
+            bill__customer=customer,
+            bill__invoice_date__year=year,
+            bill__invoice_date__month=month,
+        ).aggregate(
+            milk=Sum(bill_item_liters(), filter=Q(item__category__iexact='milk')),
+            curd=Sum(bill_item_liters(), filter=Q(item__category__iexact='curd')),
+        )
+
+        milk_volume = volumes['milk'] or Decimal('0')
+        curd_volume = volumes['curd'] or Decimal('0')
 
         total_volume = milk_volume + curd_volume
 
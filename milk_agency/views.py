@@ -1,7 +1,6 @@
 from django.shortcuts import render
 from urllib.parse import quote
 from django.db.models import Sum, F, Case, When, Value, IntegerField
-from django.db import transaction
 from django.utils import timezone
 from itertools import groupby
 from django.contrib.auth.decorators import login_required
@@ -202,7 +201,7 @@ def contact_form_submit(request):
                 subject=subject,
                 message=message
             )
-            transaction.on_commit(lambda contact_id=contact.id: notify_admin_enquiry_created(Contact.objects.get(pk=contact_id)))
+            notify_admin_enquiry_created(contact)
 
             whatsapp_message = f"""
 New Contact Form Inquiry - SVD Milk Agencies
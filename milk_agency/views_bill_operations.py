@@ -10,8 +10,10 @@ from django.core import signing
 from django.core.signing import BadSignature
 from django.urls import reverse
 
+from .bill_builder import refresh_cached_due
 from .models import Bill, BillItem, Item, Customer
 from .order_pricing import DELIVERY_ITEM_CODE
+from .stock_ledger import restore_bill_stock
 from .utils import process_bill_items
 from customer_portal.models import CustomerOrder
 
@@ -186,9 +188,7 @@ def edit_bill(request, bill_id):
         try:
             with transaction.atomic():
                 # -------- RESTORE STOCK --------
-                for bi in bill_items.select_related('item'):
-                    bi.item.stock_quantity += bi.quantity
-                    bi.item.save(update_fields=['stock_quantity'])
+                restore_bill_stock(bill)
 
                 # Remove old items
                 bill_items.delete()
@@ -197,12 +197,12 @@ def edit_bill(request, bill_id):
                 bill.customer = customer
 
                 # Preserve the bill's original opening due when editing the same bill.
-                # Replacing it with customer.get_actual_due() double-counts the old bill
+                # Replacing it with the customer's current due double-counts the old bill
                 # and makes the invoice summary incorrect after edits.
                 if previous_customer and previous_customer.id == customer.id:
                     bill.op_due_amount = original_opening_due
                 else:
-                    bill.op_due_amount = customer.get_actual_due()
+                    bill.op_due_amount = customer.due
 
                 total_bill, total_profit = process_bill_items(bill, item_ids, quantities, discounts)
 
@@ -211,12 +211,7 @@ def edit_bill(request, bill_id):
                 bill.save()
 
                 # -------- RECALCULATE DUE SAFELY --------
-                if previous_customer and previous_customer.id != customer.id:
-                    previous_customer.due = previous_customer.get_actual_due()
-                    previous_customer.save(update_fields=['due'])
-
-                customer.due = customer.get_actual_due()
-                customer.save(update_fields=['due'])
+                refresh_cached_due([previous_customer.id if previous_customer else None, customer.id])
         except Exception:
             messages.error(request, 'Invalid items or quantities.')
             return redirect('milk_agency:edit_bill', bill_id=bill_id)
@@ -248,9 +243,7 @@ def delete_bill(request, bill_id):
 
         with transaction.atomic():
             # -------- RESTORE STOCK --------
-            for bi in bill_items.select_related('item'):
-                bi.item.stock_quantity += bi.quantity
-                bi.item.save(update_fields=['stock_quantity'])
+            restore_bill_stock(bill)
 
             # -------- HANDLE LINKED ORDER --------
             order = _find_linked_customer_order(bill)
@@ -258,7 +251,7 @@ def delete_bill(request, bill_id):
             if order:
                 order.status = "cancelled"
                 order.approved_total_amount = 0
-                order.save(update_fields=['status', 'approved_total_amount'])
+                order.save(update_fields=['status', 'approved_total_amount', 'updated_at'])
 
             bill_items.delete()
             bill.is_deleted = True
@@ -266,8 +259,7 @@ def delete_bill(request, bill_id):
 
             # -------- RECALCULATE CUSTOMER DUE --------
             if customer:
-                customer.due = customer.get_actual_due()
-                customer.save(update_fields=['due'])
+                refresh_cached_due([customer.id])
 
         messages.success(request, "Bill deleted. Stock restored & due recalculated.")
         return redirect('milk_agency:bills_dashboard')
@@ -1,16 +1,32 @@
 import os
 import json
-from decimal import Decimal, ROUND_UP
+from collections import defaultdict
+from decimal import Decimal
 from datetime import datetime
 
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import StreamingHttpResponse
 from django.contrib import messages
 from django.db import transaction
 from django.utils import timezone
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-
-from .models import Bill, BillItem, Customer, Item, Company, CustomerMonthlyCommission
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from .bill_exports import BILL_EXPORT_FORMATS, bill_export_filename, bill_export_rows
+from .bill_builder import (
+    bill_line_totals,
+    create_route_bills,
+    finalize_bill,
+    parse_bill_rows,
+    price_bill_lines,
+    refresh_cached_due,
+    save_bill_lines,
+)
+from .invoice_numbers import allocate_invoice_number
+from .keyset_pagination import BILL_ORDERING, InvalidCursor, keyset_page
+from .media_index import resolve_image_urls
+from .models import Bill, Customer, Item, Company, CustomerMonthlyCommission
 from .order_pricing import (
     DELIVERY_CHARGE_AMOUNT,
     get_customer_unit_price,
@@ -26,6 +42,7 @@ from api.user_bill_pdf_utils import UserPDFGenerator
 @login_required
 def bills_dashboard(request):
     customer_id = request.GET.get('customer', '')
+    area = request.GET.get('area', '')
     start_date = request.GET.get('start_date', '')
     end_date = request.GET.get('end_date', '')
 
@@ -37,6 +54,9 @@ def bills_dashboard(request):
         except ValueError:
             pass
 
+    if area:
+        bills = bills.filter(customer__area=area)
+
     if start_date:
         try:
             start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
@@ -51,29 +71,59 @@ def bills_dashboard(request):
         except ValueError:
             pass
 
-    bills = bills.order_by('-invoice_date')
-
-    paginator = Paginator(bills, 25)
-    page = request.GET.get('page', 1)
-
     try:
-        bills = paginator.page(page)
-    except PageNotAnInteger:
-        bills = paginator.page(1)
-    except EmptyPage:
-        bills = paginator.page(paginator.num_pages)
+        bills = keyset_page(bills, request.GET.get('cursor'), ordering=BILL_ORDERING, per_page=25)
+    except InvalidCursor:
+        bills = keyset_page(bills, ordering=BILL_ORDERING, per_page=25)
 
     customers = Customer.objects.filter(frozen=False).order_by('name')
+    areas = Customer.objects.exclude(area__exact='').values_list('area', flat=True).distinct().order_by('area')
 
     return render(request, 'milk_agency/bills/bills_dashboard.html', {
         'bills': bills,
         'customers': customers,
+        'areas': areas,
         'selected_customer': int(customer_id) if customer_id else None,
+        'selected_area': area,
         'start_date': start_date,
         'end_date': end_date,
+        'filter_query': urlencode({
+            key: value for key, value in (
+                ('customer', customer_id), ('area', area), ('start_date', start_date), ('end_date', end_date)
+            ) if value
+        }),
     })
 
 
+# =========================================================
+# BILLS EXPORT (CSV / XLSX)
+# =========================================================
+@login_required
+def export_bills(request):
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in BILL_EXPORT_FORMATS:
+        export_format = 'csv'
+
+    filters = {'area': request.GET.get('area', '')}
+
+    try:
+        filters['customer_id'] = int(request.GET.get('customer', ''))
+    except ValueError:
+        pass
+
+    for key in ('start_date', 'end_date'):
+        try:
+            filters[key] = datetime.strptime(request.GET.get(key, ''), '%Y-%m-%d').date()
+        except ValueError:
+            pass
+
+    encode, content_type = BILL_EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(encode(bill_export_rows(**filters)), content_type=content_type)
+    filename = bill_export_filename(export_format, filters.get('start_date'), filters.get('end_date'))
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
 # =========================================================
 # GENERATE BILL (FINAL SAFE VERSION)
 # =========================================================
@@ -114,17 +164,14 @@ def generate_bill(request):
                 customer=customer, status=False
             ).first()
 
-        # ---------- SAFE UNIQUE INVOICE ----------
-        now = timezone.now()
-        prefix = now.strftime('%Y%m%d%H%M%S')
-        last_bill = Bill.objects.filter(invoice_number__startswith=f"INV{prefix}").order_by('-invoice_number').first()
-        invoice_number = f"INV{prefix}"
-
-        updated_items = []
-
         try:
             with transaction.atomic():
+                lines = price_bill_lines(parse_bill_rows(item_ids, quantities, discounts))
+                total_amount, total_profit = bill_line_totals(lines)
+                if total_amount <= 0:
+                    raise Exception("No valid items in bill.")
 
+                invoice_number = allocate_invoice_number()
                 bill = Bill.objects.create(
                     customer=customer,
                     invoice_number=invoice_number,
@@ -135,79 +182,21 @@ def generate_bill(request):
                     profit=Decimal("0")
                 )
 
-                total_amount = Decimal("0")
-                total_profit = Decimal("0")
-
-                for i, item_id in enumerate(item_ids):
-                    if not item_id:
-                        continue
-
-                    qty = int(quantities[i]) if quantities[i] else 0
-                    if qty <= 0:
-                        continue
-
-                    item = get_object_or_404(Item, id=item_id)
-                    discount = Decimal(discounts[i]) if discounts[i] else Decimal("0")
-
-                    price = Decimal(str(item.selling_price))
-                    item_total = (price * qty) - (discount * qty)
-                    profit = ((price - Decimal(str(item.buying_price))) * qty) - (discount * qty)
-
-                    BillItem.objects.create(
-                        bill=bill,
-                        item=item,
-                        price_per_unit=price,
-                        discount=discount,
-                        quantity=qty,
-                        total_amount=item_total
-                    )
-
-                    item.stock_quantity -= qty
-                    item.save()
-                    updated_items.append((item, qty))
-
-                    total_amount += item_total
-                    total_profit += profit
-
-                if total_amount <= 0:
-                    raise Exception("No valid items in bill.")
-
-                rounded_total = total_amount.quantize(Decimal('1'), rounding=ROUND_UP)
-
-                if commission_to_deduct and rounded_total > 0:
-                    commission_amt = commission_to_deduct.commission_amount
-                    adjusted_total = rounded_total - commission_amt
-                    if adjusted_total < 0:
-                        adjusted_total = Decimal("0")
-
-                    bill.total_amount = adjusted_total
-                    bill.commission_deducted = commission_amt
-                    bill.commission_month = commission_to_deduct.month
-                    bill.commission_year = commission_to_deduct.year
-
-                    commission_to_deduct.status = True
-                    commission_to_deduct.save()
-                else:
-                    bill.total_amount = rounded_total
-
-                bill.profit = total_profit
-                bill.save()
+                save_bill_lines(bill, lines)
+                finalize_bill(bill, total_amount, total_profit, commission_to_deduct)
 
                 if customer:
-                    customer.due = customer.get_actual_due()
-                    customer.save()
+                    refresh_cached_due([customer.pk])
 
             messages.success(request, f'Bill {invoice_number} generated successfully!')
             return redirect('milk_agency:view_bill', bill_id=bill.id)
 
         except Exception as e:
-            for item, qty in updated_items:
-                item.stock_quantity += qty
-                item.save()
-
+            # The atomic block has already rolled back the bill and its stock movements
             messages.error(request, f'Error generating bill: {str(e)}')
             return redirect('milk_agency:generate_bill')
 
+    resolve_image_urls(items)
     return render(request, 'milk_agency/bills/generate_bill.html', {
         'customers': customers,
         'items': items,
@@ -219,6 +208,71 @@ def generate_bill(request):
     })
 
 
+# =========================================================
+# ROUTE BILLING (whole area in one submit)
+# =========================================================
+@login_required
+def route_billing(request):
+    selected_area = request.GET.get('area', '') or request.POST.get('area', '')
+    selected_category = request.GET.get('category', '') or request.POST.get('category', '')
+
+    areas = Customer.objects.exclude(area__exact='').values_list('area', flat=True).distinct().order_by('area')
+    categories = Item.objects.exclude(category__exact='').values_list('category', flat=True).distinct().order_by('category')
+
+    customers = Customer.objects.filter(area=selected_area, frozen=False).order_by('name') if selected_area else Customer.objects.none()
+    items = Item.objects.filter(frozen=False).order_by('category', 'name')
+    if selected_category:
+        items = items.filter(category=selected_category)
+
+    results = None
+    if request.method == 'POST':
+        bill_date = request.POST.get('bill_date')
+        try:
+            bill_date_obj = datetime.strptime(bill_date, '%Y-%m-%d').date() if bill_date else timezone.localdate()
+        except ValueError:
+            messages.error(request, 'Invalid date format.')
+            return redirect(f"{reverse('milk_agency:route_billing')}?area={selected_area}")
+
+        entries = []
+        try:
+            # Inputs are named qty_<customer id>_<item id>
+            quantities = defaultdict(list)
+            for key, value in request.POST.items():
+                if key.startswith('qty_') and value.strip():
+                    _, customer_id, item_id = key.split('_', 2)
+                    quantities[customer_id].append((item_id, value.strip()))
+
+            for customer_id, cells in quantities.items():
+                rows = parse_bill_rows([item_id for item_id, _ in cells], [qty for _, qty in cells])
+                if rows:
+                    entries.append({'customer_id': int(customer_id), 'rows': rows})
+        except ValueError:
+            messages.error(request, 'Quantities must be whole numbers.')
+            return redirect(f"{reverse('milk_agency:route_billing')}?area={selected_area}")
+
+        if not entries:
+            messages.error(request, 'Enter at least one quantity.')
+            return redirect(f"{reverse('milk_agency:route_billing')}?area={selected_area}")
+
+        results = create_route_bills(entries, invoice_date=bill_date_obj)
+        created = sum(1 for result in results if result['success'])
+        if created:
+            messages.success(request, f'{created} bill(s) generated for {selected_area or "the route"}.')
+        if created < len(results):
+            messages.error(request, f'{len(results) - created} bill(s) could not be generated.')
+
+    return render(request, 'milk_agency/bills/route_billing.html', {
+        'areas': areas,
+        'categories': categories,
+        'selected_area': selected_area,
+        'selected_category': selected_category,
+        'customers': customers,
+        'items': items,
+        'results': results,
+        'current_date': timezone.localdate(),
+    })
+
+
 # =========================================================
 # GENERATE BILL FROM ORDER
 # =========================================================
@@ -228,13 +282,9 @@ def generate_bill_from_order(order):
         # order_date is a DateField already; no .date() attribute on datetime.date
         bill_date_obj = order.order_date if order.order_date else timezone.now().date()
 
-        now = timezone.now()
-        prefix = now.strftime('%Y%m%d%H%M%S')
-        invoice_number = f"INV{prefix}"
-
         bill = Bill.objects.create(
             customer=customer,
-            invoice_number=invoice_number,
+            invoice_number=allocate_invoice_number(),
             invoice_date=bill_date_obj,
             total_amount=Decimal("0"),
             op_due_amount=customer.due,
@@ -242,32 +292,23 @@ def generate_bill_from_order(order):
             profit=Decimal("0")
         )
 
-        total_amount = Decimal("0")
-        total_profit = Decimal("0")
-
-        for oi in order.items.all():
+        lines = []
+        for oi in order.items.select_related('item'):
             item = oi.item
             qty = oi.requested_quantity
             price = get_customer_unit_price(item, customer)
             discount_total = getattr(oi, 'discount_total', Decimal("0"))
 
-            item_total = (price * qty) - discount_total
-            profit = ((Decimal(item.selling_price) - Decimal(item.buying_price)) * qty) - discount_total
-
-            BillItem.objects.create(
-                bill=bill,
-                item=item,
-                price_per_unit=price,
-                discount=oi.discount,
-                quantity=qty,
-                total_amount=item_total
-            )
+            lines.append({
+                "item": item,
+                "quantity": qty,
+                "price": price,
+                "discount": oi.discount,
+                "total": (price * qty) - discount_total,
+                "profit": ((Decimal(item.selling_price) - Decimal(item.buying_price)) * qty) - discount_total,
+            })
 
-            item.stock_quantity -= qty
-            item.save()
-
-            total_amount += item_total
-            total_profit += profit
+        total_amount, total_profit = bill_line_totals(lines)
 
         delivery_charge = get_delivery_charge_amount(customer=customer, address=order.delivery_address)
         if order.delivery_charge != delivery_charge:
@@ -281,12 +322,13 @@ def generate_bill_from_order(order):
         if total_amount <= 0:
             raise Exception("Invalid order amount")
 
+        save_bill_lines(bill, lines)
+
         bill.total_amount = total_amount
         bill.profit = total_profit
         bill.save()
 
-        customer.due = customer.get_actual_due()
-        customer.save()
+        refresh_cached_due([customer.pk])
 
         return bill
 
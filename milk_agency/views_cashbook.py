@@ -13,6 +13,7 @@ from .models import (
     MonthlyPaymentSummary, DailyPayment,
     Customer, Bill, Item, Company, LeakageEntry, CustomerPayment
 )
+from .stock_ledger import record_stock_movement
 
 DELIVERY_DUE_EXPENSE_CATEGORIES = {"Fuel", "Food", "Repair"}
 
@@ -381,16 +382,14 @@ def save_leakage(request):
                 )
                 return _safe_redirect_target(next_url, 'milk_agency:cashbook')
 
-            item.stock_quantity -= quantity
-            item.save(update_fields=['stock_quantity'])
-
-            LeakageEntry.objects.create(
+            leakage = LeakageEntry.objects.create(
                 item=item,
                 date=leakage_date_obj,
                 quantity=quantity,
                 unit_cost=item.buying_price,
                 notes=notes,
             )
+            record_stock_movement(item, -quantity, 'leakage', leakage=leakage)
 
         messages.success(request, f"Leakage recorded for {item.name}. Stock reduced by {quantity}.")
 
@@ -408,8 +407,9 @@ def delete_leakage(request, pk):
         next_url = request.POST.get('next')
         with transaction.atomic():
             item = Item.objects.select_for_update().get(pk=leakage.item_id)
-            item.stock_quantity += leakage.quantity
-            item.save(update_fields=['stock_quantity'])
+            record_stock_movement(
+                item, leakage.quantity, 'leakage_restore', leakage=leakage, note=f"Leakage dated {leakage.date}"
+            )
             item_name = item.name
             restored_qty = leakage.quantity
             leakage.delete()
@@ -120,7 +120,7 @@ def customer_data(request):
     if customer_type not in ['retailer', 'user']:
         customer_type = 'retailer'
 
-    customers = Customer.objects.filter(user_type=customer_type).order_by('id')
+    customers = Customer.objects.filter(user_type=customer_type).with_actual_due().order_by('id')
 
     if area_filter and area_filter != "All":
         customers = customers.filter(area__icontains=area_filter)
@@ -133,7 +133,7 @@ def customer_data(request):
 
     # SAFE: show real due
     for c in customers:
-        c.total_balance = c.get_actual_due()
+        c.total_balance = c.actual_due
 
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
         return JsonResponse({
@@ -143,7 +143,7 @@ def customer_data(request):
                 'shop_name': c.shop_name or '-',
                 'retailer_id': c.retailer_id or '-',
                 'phone': c.phone,
-                'balance': float(c.get_actual_due()),
+                'balance': float(c.actual_due),
                 'frozen': c.frozen,
                 'user_type': c.user_type,
             } for c in customers]
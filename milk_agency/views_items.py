@@ -1,8 +1,11 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 from django.http import JsonResponse
+from .media_index import resolve_image_urls
 from .models import Item, Company
+from .stock_ledger import set_stock_quantity
 
 @login_required
 def items_dashboard(request):
@@ -22,6 +25,8 @@ def items_dashboard(request):
     else:
         items = Item.objects.all().order_by('category', 'name')
 
+    resolve_image_urls(items)
+
     # Calculations
     for item in items:
         item.stock_value = item.stock_quantity * item.buying_price
@@ -88,11 +93,13 @@ def add_item(request, item_id=None):
             item.buying_price = buying_price
             item.selling_price = selling_price
             item.mrp = mrp
-            item.stock_quantity = stock_quantity
             item.pcs_count = pcs_count
             if image:
                 item.image = image
-            item.save()
+            with transaction.atomic():
+                # Locks the row, so the save below cannot overwrite a concurrent stock change
+                set_stock_quantity(item, stock_quantity, note='Edited from items dashboard')
+                item.save()
             messages.success(request, f'Item {item.name} updated successfully!')
         else:
             # Create
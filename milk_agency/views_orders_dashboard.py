@@ -1,16 +1,26 @@
 import json
 from datetime import datetime
 from decimal import Decimal
-from django.db import connection, transaction
-from django.db.models import Q
+from urllib.parse import urlencode
+from django.core.paginator import Paginator
+from django.db import transaction
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.cache import never_cache
 from django.http import JsonResponse
 from django.utils import timezone
-from milk_agency.models import Customer, OrderDelivery, SubscriptionDelivery, SubscriptionOrder
+from milk_agency.models import Customer, DeliveryTask
 from milk_agency.push_notifications import notify_order_rejected
+from milk_agency.schema_capabilities import model_is_queryable
+from milk_agency.delivery_filters import (
+    DELIVERY_DASHBOARD_PAGE_SIZE,
+    delivered_orders_q,
+    delivered_subscriptions_q,
+    filter_delivery_tasks,
+    pending_orders_q,
+    pending_subscriptions_q,
+)
 from milk_agency.order_pricing import get_customer_unit_price
 from customer_portal.models import CustomerOrder, CustomerOrderItem
 from customer_portal.order_workflow import finalize_order_after_payment
@@ -19,48 +29,27 @@ from api.user_api_helpers import find_linked_order_for_bill, get_delivery_charge
 from milk_agency.models import Bill
 
 
-class SubscriptionDeliveryFallback:
-    def __init__(self, subscription_order, status, delivered_at=None, bill=None):
-        self.subscription_order = subscription_order
-        self.status = status
-        self.delivered_at = delivered_at
-        self.bill = bill
+def _section_page(request, section, rows):
+    """One page of a dashboard section; each section pages with its own ?<section>_page= parameter."""
+    return Paginator(rows, DELIVERY_DASHBOARD_PAGE_SIZE).get_page(request.GET.get(f"{section}_page"))
 
-    def get_status_display(self):
-        return self.status.replace("_", " ").title()
 
+def _order_task_page(page):
+    """Swap a page of order tasks for their orders, carrying the status the dashboard shows."""
+    orders = []
+    for task in page.object_list:
+        order = task.order
+        order.display_delivery_status = _present_order_status(task.status)
+        order.display_delivery_status_label = _present_order_status_label(task.status)
+        orders.append(order)
+    page.object_list = orders
+    return page
 
-def _table_exists(model):
-    try:
-        return model._meta.db_table in connection.introspection.table_names()
-    except Exception:
-        return False
-
-
-def _model_is_queryable(model):
-    try:
-        table_names = connection.introspection.table_names()
-        if model._meta.db_table not in table_names:
-            return False
-
-        with connection.cursor() as cursor:
-            description = connection.introspection.get_table_description(cursor, model._meta.db_table)
-        db_columns = {col.name for col in description}
-        model_columns = {
-            field.column
-            for field in model._meta.local_concrete_fields
-            if getattr(field, "column", None)
-        }
-        return model_columns.issubset(db_columns)
-    except Exception:
-        return False
 
-
-def _safe_len_or_count(value):
-    try:
-        return value.count()
-    except TypeError:
-        return len(value)
+def _subscription_task_page(page):
+    """Swap a page of subscription tasks for their SubscriptionDelivery rows."""
+    page.object_list = [task.subscription_order.delivery_tracking for task in page.object_list]
+    return page
 
 
 def _order_grand_total(order):
@@ -105,61 +94,9 @@ def _admin_order_detail_context(order):
     }
 
 
-def _resolve_order_status(order, has_order_delivery_table):
-    delivery_tracking = getattr(order, "delivery_tracking", None) if has_order_delivery_table else None
-    raw_status = (
-        getattr(delivery_tracking, "status", None)
-        or getattr(order, "status", None)
-        or "pending"
-    )
-    return _present_order_status(raw_status)
-
-
-def _matches_order(order, filters, has_order_delivery_table):
-    if filters["kind"] not in ("all", "order"):
-        return False
-    if filters["stage"] == "pending" and _resolve_order_status(order, has_order_delivery_table) == "delivered":
-        return False
-    if filters["stage"] == "delivered" and _resolve_order_status(order, has_order_delivery_table) != "delivered":
-        return False
-    if filters["status"] != "all" and _resolve_order_status(order, has_order_delivery_table) != filters["status"]:
-        return False
-    if filters["date"] and getattr(order, "delivery_date", None) != filters["date"]:
-        return False
-    if filters["q"]:
-        haystack = " ".join([
-            getattr(order, "order_number", ""),
-            getattr(getattr(order, "customer", None), "name", ""),
-            getattr(getattr(order, "customer", None), "phone", ""),
-            getattr(order, "delivery_address", ""),
-        ]).lower()
-        if filters["q"] not in haystack:
-            return False
-    return True
-
-
-def _matches_subscription(delivery, filters, delivered_status):
-    if filters["kind"] not in ("all", "subscription"):
-        return False
-    if filters["stage"] == "pending" and delivered_status == "delivered":
-        return False
-    if filters["stage"] == "delivered" and delivered_status != "delivered":
-        return False
-    if filters["status"] != "all" and delivery.status != filters["status"]:
-        return False
-
-    sub_order = delivery.subscription_order
-    if filters["date"] and getattr(sub_order, "date", None) != filters["date"]:
-        return False
-    if filters["q"]:
-        haystack = " ".join([
-            getattr(getattr(sub_order, "customer", None), "name", ""),
-            getattr(getattr(sub_order, "customer", None), "phone", ""),
-            getattr(getattr(sub_order, "item", None), "name", ""),
-        ]).lower()
-        if filters["q"] not in haystack:
-            return False
-    return True
+# Matched case-insensitively by the dashboard's q filter
+ORDER_SEARCH_FIELDS = ("order__order_number", "customer__name", "customer__phone", "order__delivery_address")
+SUBSCRIPTION_SEARCH_FIELDS = ("customer__name", "customer__phone", "subscription_order__item__name")
 
 
 def _get_delivery_filters(request):
@@ -294,104 +231,62 @@ def delete_order_history_entry(request, order_id):
 def admin_delivery_dashboard(request):
     today = timezone.localdate()
     filters = _get_delivery_filters(request)
-    has_order_delivery_table = _model_is_queryable(OrderDelivery)
-    has_subscription_delivery_table = _model_is_queryable(SubscriptionDelivery)
-
-    if has_order_delivery_table:
-        pending_orders = (
-            CustomerOrder.objects
-            .select_related("customer")
-            .filter(
-                Q(status__in=["pending", "confirmed", "processing", "ready"]) |
-                Q(delivery_tracking__status__in=["pending", "out_for_delivery", "failed"])
-            )
-            .exclude(status__in=["rejected", "cancelled", "delivered"])
-            .distinct()
-            .order_by("delivery_date", "-order_date")
-        )
-        delivered_orders = (
-            CustomerOrder.objects
-            .select_related("customer", "approved_by", "delivery_tracking__delivered_by")
-            .filter(Q(status="delivered") | Q(delivery_tracking__status="delivered"))
-            .distinct()
-            .order_by("-delivery_date", "-updated_at")
-        )
+    has_delivery_tasks = model_is_queryable(DeliveryTask)
+    if has_delivery_tasks:
+        tasks = DeliveryTask.objects.all()
     else:
-        pending_orders = (
-            CustomerOrder.objects
-            .select_related("customer")
-            .filter(status__in=["pending", "confirmed", "processing", "ready"])
-            .exclude(status__in=["rejected", "cancelled", "delivered"])
-            .order_by("delivery_date", "-order_date")
-        )
-        delivered_orders = (
-            CustomerOrder.objects
-            .select_related("customer", "approved_by")
-            .filter(status="delivered")
-            .order_by("-delivery_date", "-updated_at")
-        )
+        messages.warning(request, "Delivery tracking is not available until the database is migrated.")
+        tasks = DeliveryTask.objects.none()
 
-    if has_subscription_delivery_table:
-        pending_subscriptions = (
-            SubscriptionDelivery.objects
-            .select_related("subscription_order__customer", "subscription_order__item", "bill")
-            .filter(status__in=["pending", "out_for_delivery"])
-            .order_by("subscription_order__date", "subscription_order__customer__name")
-        )
+    pending_orders = (
+        tasks.select_related("order__customer", "order__delivery_tracking")
+        .filter(pending_orders_q())
+        .order_by("date", "-order__order_date", "-order_id")
+    )
+    delivered_orders = (
+        tasks.select_related("order__customer", "order__approved_by", "order__delivery_tracking__delivered_by")
+        .filter(delivered_orders_q())
+        .order_by("-date", "-order__updated_at", "-order_id")
+    )
+    order_filters = {"kind": "order", "present_status": _present_order_status, "search_fields": ORDER_SEARCH_FIELDS}
+    pending_orders = _order_task_page(
+        _section_page(request, "pending_orders", filter_delivery_tasks(pending_orders, filters, **order_filters))
+    )
+    delivered_orders = _order_task_page(
+        _section_page(request, "delivered_orders", filter_delivery_tasks(delivered_orders, filters, **order_filters))
+    )
 
-        delivered_subscriptions = (
-            SubscriptionDelivery.objects
-            .select_related(
-                "subscription_order__customer",
-                "subscription_order__item",
-                "delivered_by",
-                "bill",
-            )
-            .filter(status="delivered")
-            .order_by("-subscription_order__date", "-delivered_at", "-updated_at")
+    pending_subscriptions = (
+        tasks.select_related(
+            "subscription_order__customer",
+            "subscription_order__item",
+            "subscription_order__delivery_tracking__bill",
         )
-    else:
-        pending_subscriptions = [
-            SubscriptionDeliveryFallback(subscription_order=obj, status="pending")
-            for obj in SubscriptionOrder.objects
-            .select_related("customer", "item")
-            .filter(delivered=False)
-            .order_by("date", "customer__name")
-        ]
-        delivered_subscriptions = [
-            SubscriptionDeliveryFallback(subscription_order=obj, status="delivered")
-            for obj in SubscriptionOrder.objects
-            .select_related("customer", "item")
-            .filter(delivered=True)
-            .order_by("-date", "customer__name")
-        ]
-
-    pending_orders = [
-        order for order in pending_orders
-        if _matches_order(order, filters, has_order_delivery_table)
-    ]
-    delivered_orders = [
-        order for order in delivered_orders
-        if _matches_order(order, filters, has_order_delivery_table)
-    ]
-    pending_subscriptions = [
-        delivery for delivery in pending_subscriptions
-        if _matches_subscription(delivery, filters, "pending")
-    ]
-    delivered_subscriptions = [
-        delivery for delivery in delivered_subscriptions
-        if _matches_subscription(delivery, filters, "delivered")
-    ]
-
-    for order in pending_orders + delivered_orders:
-        raw_status = getattr(getattr(order, "delivery_tracking", None), "status", None) or getattr(order, "status", "pending")
-        order.display_delivery_status = _present_order_status(raw_status)
-        order.display_delivery_status_label = _present_order_status_label(raw_status)
-
-    pending_orders_count = _safe_len_or_count(pending_orders)
-    delivered_orders_count = _safe_len_or_count(delivered_orders)
-    pending_subscriptions_count = _safe_len_or_count(pending_subscriptions)
-    delivered_subscriptions_count = _safe_len_or_count(delivered_subscriptions)
+        .filter(pending_subscriptions_q())
+        .order_by("date", "subscription_order__customer__name", "id")
+    )
+    delivered_subscriptions = (
+        tasks.select_related(
+            "subscription_order__customer",
+            "subscription_order__item",
+            "subscription_order__delivery_tracking__delivered_by",
+            "subscription_order__delivery_tracking__bill",
+        )
+        .filter(delivered_subscriptions_q())
+        .order_by("-date", "-delivered_at", "-updated_at", "-id")
+    )
+    subscription_filters = {"kind": "subscription", "search_fields": SUBSCRIPTION_SEARCH_FIELDS}
+    pending_subscriptions = _subscription_task_page(_section_page(
+        request, "pending_subscriptions", filter_delivery_tasks(pending_subscriptions, filters, **subscription_filters)
+    ))
+    delivered_subscriptions = _subscription_task_page(_section_page(
+        request, "delivered_subscriptions", filter_delivery_tasks(delivered_subscriptions, filters, **subscription_filters)
+    ))
+
+    pending_orders_count = pending_orders.paginator.count
+    delivered_orders_count = delivered_orders.paginator.count
+    pending_subscriptions_count = pending_subscriptions.paginator.count
+    delivered_subscriptions_count = delivered_subscriptions.paginator.count
 
     context = {
         "today": today,
@@ -399,8 +294,8 @@ def admin_delivery_dashboard(request):
         "delivered_orders": delivered_orders,
         "pending_subscriptions": pending_subscriptions,
         "delivered_subscriptions": delivered_subscriptions,
-        "has_order_delivery_table": has_order_delivery_table,
-        "has_subscription_delivery_table": has_subscription_delivery_table,
+        "has_order_delivery_table": has_delivery_tasks,
+        "has_subscription_delivery_table": has_delivery_tasks,
         "pending_orders_count": pending_orders_count,
         "delivered_orders_count": delivered_orders_count,
         "pending_subscriptions_count": pending_subscriptions_count,
@@ -408,6 +303,12 @@ def admin_delivery_dashboard(request):
         "pending_total": pending_orders_count + pending_subscriptions_count,
         "delivered_total": delivered_orders_count + delivered_subscriptions_count,
         "filters": filters,
+        "filter_query": urlencode({
+            key: value for key, value in (
+                ("q", filters["q"]), ("date", filters["date_raw"]), ("kind", filters["kind"]),
+                ("stage", filters["stage"]), ("status", filters["status"]),
+            ) if value and value != "all"
+        }),
     }
     return render(request, "milk_agency/dashboards_other/admin_delivery_dashboard.html", context)
 
@@ -514,6 +415,6 @@ def reject_order(request, order_id):
     order.status = 'rejected'
     order.approved_by = request.user
     order.save()
-    transaction.on_commit(lambda order_id=order.id: notify_order_rejected(CustomerOrder.objects.select_related("customer").get(pk=order_id)))
+    notify_order_rejected(order)
 
     return JsonResponse({'success': True, 'message': 'Order rejected successfully.'})
@@ -1,4 +1,3 @@
-import re
 import json
 from collections import defaultdict, OrderedDict
 from datetime import timedelta, date
@@ -8,52 +7,23 @@ from django.utils import timezone
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.cache import never_cache
 from .models import Bill, BillItem, Item, Customer
+from .item_units import bill_item_liters
 
-# Helper: derive liters per single unit from Item.name
-def extract_liters_from_name(item_name, fallback_unit_liters=None):
-    """
-    Tries to parse strings like:
-      - "FCM500" -> 500 -> treated as ml -> 0.5 L
-      - "Curd450g" -> 450 g -> treated as 0.45 L (assume g ~ ml for dairy)
-      - "UHT1L" -> 1 L
-      - "Paneer200g" -> 0.2 L (approx, may be non-liquid but we treat g/ml -> /1000)
-      - "Bottle 2L" -> 2 L
 
-    Rules (conservative):
-      - If unit explicitly 'l' or 'L' => liters = number
-      - If unit 'ml' or 'g' => liters = number / 1000
-      - If unit 'kg' => treat as liters = number (approx 1kg ~ 1L for dairy)
-      - If no unit but a number exists:
-          * if number < 10 -> treat as liters (e.g., "1" -> 1L)
-          * else -> treat as ml and divide by 1000 (e.g., 500 -> 0.5L)
-      - If parse fails -> fallback_unit_liters (if provided) else 0.0
-    """
-    if not item_name:
-        return float(fallback_unit_liters or 0.0)
-
-    s = item_name.strip()
-    # Find number and optional unit
-    m = re.search(r'(?i)(\d+(?:\.\d+)?)(?:\s?)(ml|l|kg|g)?', s)
-    if not m:
-        return float(fallback_unit_liters or 0.0)
-
-    num = float(m.group(1))
-    unit = (m.group(2) or '').lower()
-
-    if unit == 'l':
-        return float(num)
-    if unit in ('ml', 'g'):
-        return float(num) / 1000.0
-    if unit == 'kg':
-        # approximate: 1 kg = 1 L for dairy / milk-like items
-        return float(num)
-
-    # no unit found, apply heuristic
-    if num < 10:
-        # often means liters: "1L" may be written "1"
-        return float(num)
-    # likely milliliters / grams
-    return float(num) / 1000.0
+def category_volume_totals(billitems_qs):
+    """Return ({category: liters}, {category: amount}) for a BillItem queryset, summed in SQL."""
+    volumes = defaultdict(float)
+    amounts = defaultdict(float)
+    rows = (
+        billitems_qs.values('item__category')
+        .annotate(liters=Sum(bill_item_liters()), amount=Sum('total_amount'))
+        .order_by()
+    )
+    for row in rows:
+        cat = (row['item__category'] or '').strip() or 'Others'
+        volumes[cat] += float(row['liters'] or 0)
+        amounts[cat] += float(row['amount'] or 0)
+    return volumes, amounts
 
 
 @login_required
@@ -104,14 +74,14 @@ def sales_summary_by_category(request):
         compare_bill_filter['customer_id'] = customer_id
 
     # BillItem base query for main period
-    billitems_qs = BillItem.objects.select_related('bill', 'item').all()
+    billitems_qs = BillItem.objects.all()
     if start_date and end_date:
         billitems_qs = billitems_qs.filter(bill__invoice_date__range=(start_date, end_date), **({'bill__customer_id': customer_id} if customer_id else {}))
     elif customer_id:
         billitems_qs = billitems_qs.filter(bill__customer_id=customer_id)
 
     # BillItem for compare period
-    compare_billitems_qs = BillItem.objects.select_related('bill', 'item').all()
+    compare_billitems_qs = BillItem.objects.all()
     if compare_start and compare_end:
         compare_billitems_qs = compare_billitems_qs.filter(bill__invoice_date__range=(compare_start, compare_end), **({'bill__customer_id': customer_id} if customer_id else {}))
     elif customer_id:
@@ -137,34 +107,16 @@ def sales_summary_by_category(request):
     compare_amount_by_category = {cat: 0.0 for cat in categories}
 
     # --- Aggregate main period volumes & amounts ---
-    for bi in billitems_qs:
-        item = bi.item
-        cat = (item.category.strip() if item and item.category else '') or 'Others'
-        if cat not in data_by_category:
-            # if new category appears at runtime (should be rare), add it
-            data_by_category.setdefault(cat, 0.0)
-            amount_by_category.setdefault(cat, 0.0)
-
-        # liters per single unit
-        liters_per_unit = extract_liters_from_name(item.name if item else '', fallback_unit_liters=0.0)
-        total_liters = liters_per_unit * (bi.quantity or 0)
-
-        data_by_category[cat] = data_by_category.get(cat, 0.0) + float(total_liters)
-        amount_by_category[cat] = amount_by_category.get(cat, 0.0) + float(bi.total_amount or 0.0)
+    volumes, amounts = category_volume_totals(billitems_qs)
+    for cat, liters in volumes.items():
+        data_by_category[cat] = data_by_category.get(cat, 0.0) + liters
+        amount_by_category[cat] = amount_by_category.get(cat, 0.0) + amounts[cat]
 
     # --- Aggregate compare period volumes & amounts ---
-    for bi in compare_billitems_qs:
-        item = bi.item
-        cat = (item.category.strip() if item and item.category else '') or 'Others'
-        if cat not in compare_data_by_category:
-            compare_data_by_category.setdefault(cat, 0.0)
-            compare_amount_by_category.setdefault(cat, 0.0)
-
-        liters_per_unit = extract_liters_from_name(item.name if item else '', fallback_unit_liters=0.0)
-        total_liters = liters_per_unit * (bi.quantity or 0)
-
-        compare_data_by_category[cat] = compare_data_by_category.get(cat, 0.0) + float(total_liters)
-        compare_amount_by_category[cat] = compare_amount_by_category.get(cat, 0.0) + float(bi.total_amount or 0.0)
+    volumes, amounts = category_volume_totals(compare_billitems_qs)
+    for cat, liters in volumes.items():
+        compare_data_by_category[cat] = compare_data_by_category.get(cat, 0.0) + liters
+        compare_amount_by_category[cat] = compare_amount_by_category.get(cat, 0.0) + amounts[cat]
 
     # Ensure all categories keys exist
     for c in categories:
@@ -183,13 +135,11 @@ def sales_summary_by_category(request):
         dates = [d0, today]
         for d in dates:
             per_cat = {c: 0.0 for c in categories}
-            items_on_day = BillItem.objects.select_related('item','bill').filter(bill__invoice_date=d)
+            items_on_day = BillItem.objects.filter(bill__invoice_date=d)
             if customer_id:
                 items_on_day = items_on_day.filter(bill__customer_id=customer_id)
-            for bi in items_on_day:
-                cat = (bi.item.category.strip() if bi.item and bi.item.category else '') or 'Others'
-                liters = extract_liters_from_name(bi.item.name) * (bi.quantity or 0)
-                per_cat[cat] = per_cat.get(cat, 0.0) + float(liters)
+            for cat, liters in category_volume_totals(items_on_day)[0].items():
+                per_cat[cat] = per_cat.get(cat, 0.0) + liters
             for c in categories:
                 trend_by_category[c].append({'date': d.isoformat(), 'volume': round(per_cat[c], 3)})
     elif period == 'week':
@@ -202,13 +152,11 @@ def sales_summary_by_category(request):
             weeks.append((ws, we))
         for (ws, we) in weeks:
             per_cat = {c: 0.0 for c in categories}
-            items_in_week = BillItem.objects.select_related('item','bill').filter(bill__invoice_date__range=(ws, we))
+            items_in_week = BillItem.objects.filter(bill__invoice_date__range=(ws, we))
             if customer_id:
                 items_in_week = items_in_week.filter(bill__customer_id=customer_id)
-            for bi in items_in_week:
-                cat = (bi.item.category.strip() if bi.item and bi.item.category else '') or 'Others'
-                liters = extract_liters_from_name(bi.item.name) * (bi.quantity or 0)
-                per_cat[cat] = per_cat.get(cat, 0.0) + float(liters)
+            for cat, liters in category_volume_totals(items_in_week)[0].items():
+                per_cat[cat] = per_cat.get(cat, 0.0) + liters
             label = ws.isoformat()
             for c in categories:
                 trend_by_category[c].append({'date': label, 'volume': round(per_cat[c], 3)})
@@ -223,13 +171,11 @@ def sales_summary_by_category(request):
             month_start = date(y, m, 1)
             month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
             per_cat = {c: 0.0 for c in categories}
-            items_in_month = BillItem.objects.select_related('item','bill').filter(bill__invoice_date__range=(month_start, month_end))
+            items_in_month = BillItem.objects.filter(bill__invoice_date__range=(month_start, month_end))
             if customer_id:
                 items_in_month = items_in_month.filter(bill__customer_id=customer_id)
-            for bi in items_in_month:
-                cat = (bi.item.category.strip() if bi.item and bi.item.category else '') or 'Others'
-                liters = extract_liters_from_name(bi.item.name) * (bi.quantity or 0)
-                per_cat[cat] = per_cat.get(cat, 0.0) + float(liters)
+            for cat, liters in category_volume_totals(items_in_month)[0].items():
+                per_cat[cat] = per_cat.get(cat, 0.0) + liters
             label = month_start.isoformat()
             for c in categories:
                 trend_by_category[c].append({'date': label, 'volume': round(per_cat[c], 3)})
@@ -252,13 +198,11 @@ def sales_summary_by_category(request):
             month_start = date(y, m, 1)
             month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
             per_cat = {c: 0.0 for c in categories}
-            items_in_month = BillItem.objects.select_related('item','bill').filter(bill__invoice_date__range=(month_start, month_end))
+            items_in_month = BillItem.objects.filter(bill__invoice_date__range=(month_start, month_end))
             if customer_id:
                 items_in_month = items_in_month.filter(bill__customer_id=customer_id)
-            for bi in items_in_month:
-                cat = (bi.item.category.strip() if bi.item and bi.item.category else '') or 'Others'
-                liters = extract_liters_from_name(bi.item.name) * (bi.quantity or 0)
-                per_cat[cat] = per_cat.get(cat, 0.0) + float(liters)
+            for cat, liters in category_volume_totals(items_in_month)[0].items():
+                per_cat[cat] = per_cat.get(cat, 0.0) + liters
             label = month_start.isoformat()
             for c in categories:
                 trend_by_category[c].append({'date': label, 'volume': round(per_cat[c], 3)})
@@ -290,15 +234,16 @@ def sales_summary_by_category(request):
     else:
         years_list = sorted({d.year for d in years})
 
+    bi_qs = BillItem.objects.filter(bill__invoice_date__year__in=years_list)
+    if customer_id:
+        bi_qs = bi_qs.filter(bill__customer_id=customer_id)
+    liters_by_year = dict(
+        bi_qs.values_list('bill__invoice_date__year')
+        .annotate(liters=Sum(bill_item_liters()))
+        .order_by()
+    )
     for y in years_list:
-        # items in that year
-        bi_qs = BillItem.objects.select_related('bill', 'item').filter(bill__invoice_date__year=y)
-        if customer_id:
-            bi_qs = bi_qs.filter(bill__customer_id=customer_id)
-        total_l = 0.0
-        for bi in bi_qs:
-            total_l += float(extract_liters_from_name(bi.item.name) * (bi.quantity or 0))
-        year_totals[str(y)] = round(total_l, 3)
+        year_totals[str(y)] = round(float(liters_by_year.get(y) or 0), 3)
 
     # --- Prepare serializable JSON structures for JS/Chart.js ---
     context = {
@@ -21,7 +21,7 @@ def user_data(request):
     area_filter = request.GET.get('area', '').strip()
     id_filter = request.GET.get('id', '').strip()
 
-    customers = Customer.objects.filter(user_type="user").order_by('id')
+    customers = Customer.objects.filter(user_type="user").with_actual_due().order_by('id')
 
     if area_filter and area_filter != "All":
         customers = customers.filter(area__icontains=area_filter)
@@ -34,7 +34,7 @@ def user_data(request):
 
     # SAFE: show real due
     for c in customers:
-        c.total_balance = c.get_actual_due()
+        c.total_balance = c.actual_due
 
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
         return JsonResponse({
@@ -44,7 +44,7 @@ def user_data(request):
                 'shop_name': c.shop_name or '-',
                 'retailer_id': c.retailer_id or '-',
                 'phone': c.phone,
-                'balance': float(c.get_actual_due()),
+                'balance': float(c.actual_due),
                 'frozen': c.frozen,
             } for c in customers]
         })
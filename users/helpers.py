@@ -14,6 +14,7 @@ from django.utils import timezone
 from api.order_creator import ACTIVE_ORDER_STATUSES, create_or_replace_order
 from api.user_api_helpers import get_active_offers, get_latest_subscription
 
+from milk_agency.media_index import resolve_image_urls
 from milk_agency.models import Bill, Item, SubscriptionItem
 from milk_agency.order_pricing import get_customer_unit_price
 
@@ -49,7 +50,9 @@ def user_catalog_queryset(*, include_out_of_stock=False):
 
 def grouped_catalog(customer, *, include_out_of_stock=False):
     grouped = OrderedDict()
-    for item in user_catalog_queryset(include_out_of_stock=include_out_of_stock):
+    items = list(user_catalog_queryset(include_out_of_stock=include_out_of_stock))
+    resolve_image_urls(items)
+    for item in items:
         item.display_price = get_customer_unit_price(item, customer)
         item.in_stock = item.stock_quantity > 0
         category = item.category or "Other"